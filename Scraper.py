@@ -1,60 +1,160 @@
-# Scraper.py
-import time
-import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
-
-def get_driver():
-    options = webdriver.ChromeOptions()
-    options.add_argument("--headless=new")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--no-sandbox")
-    return webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-
-def parse_html(html: str):
-    soup = BeautifulSoup(html, "html.parser")
-    table = soup.find("table", {"id": "main-table"})  
-    if not table:
-        raise ValueError("Table not found on the page")
-
-    data = []
-    rows = table.find("tbody").find_all("tr")
-    for row in rows:
-        sym_td = row.find("td", {"class": "sym svelte-1ro3niy"})
-        if not sym_td:
-            continue
-        a = sym_td.find("a")
-        if not a:
-            continue
-        symbol = a.text.strip()
-        if symbol:
-            data.append([symbol])
-
-    return data
-
-def scrape_symbols(url: str):
-    driver = get_driver()
-    try:
-        driver.get(url)
-        time.sleep(3) 
-        html = driver.page_source
-        return parse_html(html)
-    finally:
-        driver.quit()
-
-def main() -> pd.DataFrame:
-    large_cap_url = "https://stockanalysis.com/list/large-cap-stocks/"
-    mega_cap_url  = "https://stockanalysis.com/list/mega-cap-stocks/"
-
-    large_cap_data = scrape_symbols(large_cap_url)
-    mega_cap_data  = scrape_symbols(mega_cap_url)
-
-    combined_data = mega_cap_data + large_cap_data
-    df = pd.DataFrame(combined_data, columns=["Symbol"])
-    return df
-
-if __name__ == "__main__":
-    print(main())
+# Scraper.py
+import time
+import urllib.request
+from html.parser import HTMLParser
+import pandas as pd
+
+try:
+    import lxml.html
+except ImportError:  # optional; falls back to the stdlib scanner below
+    lxml = None
+
+LARGE_CAP_URL = "https://stockanalysis.com/list/large-cap-stocks/"
+MEGA_CAP_URL  = "https://stockanalysis.com/list/mega-cap-stocks/"
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
+
+SYMBOL_XPATH = (
+    '//table[@id="main-table"]//tbody//tr'
+    '/td[contains(concat(" ", normalize-space(@class), " "), " sym ")]/a'
+)
+
+def get_driver():
+    # Selenium is only needed for the browser fallback, so it is imported on demand
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    return webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+
+class _SymbolTableParser(HTMLParser):
+    """
+    Streaming scanner that collects the link text of <td class="sym ..."> cells inside
+    the <tbody> of table#main-table, without building a document tree.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.found_table = False
+        self.table_depth = 0
+        self.in_tbody = False
+        self.in_sym = False
+        self.in_link = False
+        self.text = []
+        self.symbols = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            if self.table_depth:
+                self.table_depth += 1
+            elif dict(attrs).get("id") == "main-table":
+                self.found_table = True
+                self.table_depth = 1
+        elif not self.table_depth:
+            return
+        elif tag == "tbody":
+            self.in_tbody = True
+        elif tag == "td" and self.in_tbody:
+            self.in_sym = "sym" in (dict(attrs).get("class") or "").split()
+        elif tag == "a" and self.in_sym:
+            self.in_link = True
+            self.text = []
+
+    def handle_endtag(self, tag):
+        if not self.table_depth:
+            return
+        if tag == "table":
+            self.table_depth -= 1
+        elif tag == "tbody":
+            self.in_tbody = False
+        elif tag == "td":
+            self.in_sym = False
+        elif tag == "a" and self.in_link:
+            self.in_link = False
+            self.symbols.append("".join(self.text))
+
+    def handle_data(self, data):
+        if self.in_link:
+            self.text.append(data)
+
+def parse_html(html: str):
+    """
+    Extracts the ticker symbols from a stockanalysis.com list page.
+
+    Uses lxml when it is installed and a stdlib streaming scanner otherwise; both are
+    considerably faster than building a BeautifulSoup tree with `html.parser`.
+
+    Returns:
+        list[list[str]]: One [symbol] row per table row, in page order.
+
+    Raises:
+        ValueError: If the page has no table#main-table.
+    """
+    if lxml is not None:
+        doc = lxml.html.fromstring(html)
+        if not doc.xpath('//table[@id="main-table"]'):
+            raise ValueError("Table not found on the page")
+        symbols = [a.text_content() for a in doc.xpath(SYMBOL_XPATH)]
+    else:
+        parser = _SymbolTableParser()
+        parser.feed(html)
+        parser.close()
+        if not parser.found_table:
+            raise ValueError("Table not found on the page")
+        symbols = parser.symbols
+
+    return [[s.strip()] for s in symbols if s.strip()]
+
+def fetch_html(url: str, timeout=15):
+    """
+    Downloads a page over plain HTTP(S), without a browser.
+    """
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        charset = response.headers.get_content_charset() or "utf-8"
+        return response.read().decode(charset, errors="replace")
+
+def scrape_symbols_with_browser(url: str):
+    driver = get_driver()
+    try:
+        driver.get(url)
+        time.sleep(3)
+        html = driver.page_source
+        return parse_html(html)
+    finally:
+        driver.quit()
+
+def scrape_symbols(url: str):
+    """
+    Scrapes the symbol table at `url`.
+
+    The server-rendered page is fetched over plain HTTP first; headless Chrome is only
+    started if that request fails or the page comes back without the symbol table.
+    """
+    try:
+        data = parse_html(fetch_html(url))
+        if data:
+            return data
+        print(f"No symbols in HTTP response for {url}; falling back to browser")
+    except Exception as e:
+        print(f"HTTP scrape failed for {url} ({e}); falling back to browser")
+    return scrape_symbols_with_browser(url)
+
+def main() -> pd.DataFrame:
+    large_cap_data = scrape_symbols(LARGE_CAP_URL)
+    mega_cap_data  = scrape_symbols(MEGA_CAP_URL)
+
+    # Mega caps come first; symbols listed on both pages are kept once
+    combined_data = mega_cap_data + large_cap_data
+    df = pd.DataFrame(combined_data, columns=["Symbol"]).drop_duplicates(ignore_index=True)
+    return df
+
+if __name__ == "__main__":
+    print(main())
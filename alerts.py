@@ -0,0 +1,111 @@
+# alerts.py
+import numpy as np
+import pandas as pd
+
+from analytics import DETAIL_RANKS
+from rules import default_ruleset
+
+ALERT_COLUMNS = ["symbol", "sector", "alert_type", "detail", "vs_sector", "rank", "sector_z"]
+
+
+def _column(df, name, default):
+    if name in df.columns:
+        return df[name]
+    return pd.Series(default, index=df.index)
+
+
+def threshold_overrides(drop_threshold=None, streak_min=None):
+    """
+    Maps the long-standing drop_threshold / streak_min arguments onto rule thresholds.
+    """
+    return {"pct_drop_5plus": drop_threshold, "down_streak_5plus": streak_min}
+
+
+def alert_masks(df, drop_threshold=-5, streak_min=5, rules=None):
+    """
+    Evaluates every enabled rule over the whole metrics frame at once.
+
+    Returns:
+        dict: alert_type -> boolean np.ndarray aligned with `df` rows, in report order.
+    """
+    rules = rules or default_ruleset()
+    return rules.evaluate(df, threshold_overrides(drop_threshold, streak_min))
+
+
+def select_alert_rows(info, rules=None, overrides=None):
+    """
+    Returns the rows of a metrics frame that triggered at least one rule.
+
+    `overrides` (rule name -> threshold) selects at other thresholds than the rules'
+    own, e.g. the loosest any subscriber uses (see `delivery.alert_thresholds`).
+    """
+    if info.empty:
+        return info
+    rules = rules or default_ruleset()
+    masks = rules.evaluate(info, overrides)
+    return info[np.logical_or.reduce(list(masks.values()))] if masks else info.iloc[:0]
+
+
+def classify_alerts(df, drop_threshold=-5, streak_min=5, rules=None):
+    """
+    Turns a metrics frame (one row per symbol with flag/metric columns) into a long
+    table with one row per triggered alert.
+
+    Parameters:
+        df (pd.DataFrame): Output of `fetch.get_price_data`, optionally with a 'sector' column.
+        drop_threshold (float): Daily % change at or below which pct_drop_5plus fires (default: -5).
+        streak_min (int): Down-streak length at or above which down_streak_5plus fires (default: 5).
+        rules (RuleSet or None): Rules to evaluate (default: `rules.default_ruleset()`).
+
+    Returns:
+        pd.DataFrame: Columns symbol, sector, alert_type, detail, vs_sector, rank, sector_z,
+                      ordered by rule and then by the row order of `df`. `detail` holds the
+                      streak length or % move for alert types that display one and NaN
+                      otherwise; `vs_sector` is the symbol's pct_drop_vs_sector (see
+                      `market.add_relative_to_sector`); `rank` is the detail's percentile in
+                      the universe where the cross-section ranks it (`analytics.DETAIL_RANKS`)
+                      and `sector_z` the symbol's daily move standardized within its sector.
+    """
+    rules = rules or default_ruleset()
+    masks = alert_masks(df, drop_threshold=drop_threshold, streak_min=streak_min, rules=rules)
+    symbols = df["symbol"].to_numpy(dtype=object) if "symbol" in df.columns else np.array([], dtype=object)
+    sectors = _column(df, "sector", "Unknown").fillna("Unknown").to_numpy(dtype=object)
+    vs_sector = pd.to_numeric(_column(df, "pct_drop_vs_sector", np.nan), errors="coerce").to_numpy(dtype=float)
+    sector_z = pd.to_numeric(_column(df, "sector_z", np.nan), errors="coerce").to_numpy(dtype=float)
+
+    frames = []
+    for rule in rules.rules:
+        alert_type, detail_column = rule.name, rule.detail
+        mask = masks[alert_type]
+        if not mask.any():
+            continue
+        detail = (
+            pd.to_numeric(_column(df, detail_column, np.nan), errors="coerce").to_numpy(dtype=float)[mask]
+            if detail_column else np.full(mask.sum(), np.nan)
+        )
+        rank_column = DETAIL_RANKS.get(detail_column)
+        rank = (
+            pd.to_numeric(_column(df, rank_column, np.nan), errors="coerce").to_numpy(dtype=float)[mask]
+            if rank_column else np.full(mask.sum(), np.nan)
+        )
+        frames.append(pd.DataFrame({
+            "symbol": symbols[mask],
+            "sector": sectors[mask],
+            "alert_type": alert_type,
+            "detail": detail,
+            "vs_sector": vs_sector[mask],
+            "rank": rank,
+            "sector_z": sector_z[mask],
+        }))
+
+    if not frames:
+        return pd.DataFrame({c: pd.Series(dtype=float if c in ("detail", "vs_sector", "rank", "sector_z") else object) for c in ALERT_COLUMNS})
+    return pd.concat(frames, ignore_index=True)
+
+
+def section_labels(streak_min=5, drop_threshold=-5, rules=None):
+    """
+    Returns alert_type -> report section heading, in report order.
+    """
+    rules = rules or default_ruleset()
+    return rules.labels(threshold_overrides(drop_threshold, streak_min))
@@ -0,0 +1,210 @@
+# analytics.py
+# Cross-sectional statistics over the whole scanned universe, not just the alerted rows:
+# where each symbol's move ranks, how unusual it is within its sector, which sectors are
+# over-represented among the day's worst names and the most oversold names per sector.
+# Everything is a handful of sorts and bincounts over flat arrays, so tens of thousands
+# of symbols take milliseconds.
+import numpy as np
+import pandas as pd
+
+# The per-symbol columns kept from every scanned batch for the cross-section
+ANALYTICS_COLUMNS = ["symbol", "pct_drop_from_prev_close", "drop_from_52w_high"]
+
+# Alert detail metric -> the cross-section's percentile rank of it, shown next to the detail
+DETAIL_RANKS = {"pct_drop_from_prev_close": "pct_rank_daily", "drop_from_52w_high": "pct_rank_from_high"}
+
+TOP_N = 5
+
+# Sectors with fewer known members get no z-scores
+MIN_SECTOR_SIZE = 5
+
+# A sector is under pressure when at least PRESSURE_MIN_NAMES of its members, and
+# PRESSURE_RATIO times its fair share, fall in the universe's worst PRESSURE_DECILE of daily moves
+PRESSURE_DECILE = 10
+PRESSURE_RATIO = 2.0
+PRESSURE_MIN_NAMES = 3
+
+# Sector pressure is only meaningful once most of the universe has a known sector: the
+# sector cache fills up with symbols that alerted first, so a thinly covered universe
+# makes every sector look over-represented among the day's worst names
+MIN_SECTOR_COVERAGE = 0.9
+
+
+def compact(info):
+    """
+    Returns the slice of a metrics batch that `cross_section` needs.
+    """
+    return info[ANALYTICS_COLUMNS]
+
+
+def percentile_ranks(values):
+    """
+    Returns, for each value, the percentage (0-100] of non-NaN values at or below it.
+    Ties share the highest rank; NaN stays NaN. One sort plus a binary search.
+    """
+    values = np.asarray(values, dtype=float)
+    out = np.full(values.shape, np.nan)
+    valid = ~np.isnan(values)
+    ranked = np.sort(values[valid])
+    if ranked.size:
+        out[valid] = 100.0 * np.searchsorted(ranked, values[valid], side="right") / ranked.size
+    return out
+
+
+def group_zscores(values, codes, n_groups, min_size=MIN_SECTOR_SIZE):
+    """
+    Standardizes `values` within groups.
+
+    Parameters:
+        values (np.ndarray): Float values; NaN is ignored.
+        codes (np.ndarray): Group code per value in [0, n_groups), or -1 for no group.
+
+    Returns:
+        tuple: (z-scores per value, group means, group standard deviations, group sizes).
+               Groups smaller than `min_size` or without spread get NaN z-scores.
+    """
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values) & (codes >= 0)
+    members = codes[valid]
+    count = np.bincount(members, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.bincount(members, weights=values[valid], minlength=n_groups) / count
+        # Two passes (mean, then squared deviations) to avoid cancellation in sum(x^2) - n*mean^2
+        deviation = values[valid] - mean[members]
+        std = np.sqrt(np.bincount(members, weights=deviation ** 2, minlength=n_groups) / (count - 1))
+        usable = (count >= min_size) & (std > 0)
+        z = np.full(values.shape, np.nan)
+        z[valid] = np.where(usable[members], deviation / std[members], np.nan)
+    return z, mean, std, count
+
+
+def lowest_per_group(scores, codes, n_groups, n=TOP_N):
+    """
+    Returns {group: indices of the `n` lowest scores in the group, lowest first}.
+
+    Rows are bucketed by group with one stable sort of the codes; within each group only
+    the n smallest are found with `np.argpartition` and only those n are sorted.
+    """
+    scores = np.asarray(scores, dtype=float)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(n_groups + 1))
+    lowest = {}
+    for group in range(n_groups):
+        idx = order[bounds[group]:bounds[group + 1]]
+        idx = idx[~np.isnan(scores[idx])]
+        if len(idx) > n:
+            idx = idx[np.argpartition(scores[idx], n - 1)[:n]]
+        lowest[group] = idx[np.argsort(scores[idx], kind="stable")]
+    return lowest
+
+
+class CrossSection:
+    """
+    Cross-sectional view of one day's universe.
+
+    Attributes:
+        table (pd.DataFrame): One row per symbol: symbol, sector, the ANALYTICS_COLUMNS
+            values, pct_rank_daily and pct_rank_from_high (percentile within the universe;
+            low = weak), oversold_score (mean of the two ranks) and sector_z (daily move
+            standardized within the sector).
+        sectors (pd.DataFrame): Per sector (index): members, mean_daily, mean_from_high,
+            worst_decile (members in the universe's worst PRESSURE_DECILE % of daily moves)
+            and pressure (worst_decile relative to the sector's fair share).
+        oversold (dict): sector -> the TOP_N rows of `table` with the lowest oversold_score.
+        coverage (float): Fraction of the universe whose sector is known.
+    """
+
+    def __init__(self, table, sectors, oversold, coverage=1.0):
+        self.table = table
+        self.sectors = sectors
+        self.oversold = oversold
+        self.coverage = coverage
+
+    @property
+    def empty(self):
+        return self.table.empty
+
+    @property
+    def covered(self):
+        # Whether enough sectors are known for `pressured` to mean anything
+        return not self.empty and self.coverage >= MIN_SECTOR_COVERAGE
+
+    def pressured(self, ratio=PRESSURE_RATIO, min_names=PRESSURE_MIN_NAMES):
+        """
+        Returns the rows of `sectors` under pressure, most pressured first. Check
+        `covered` first: with few sectors known the result is biased towards the
+        sectors of symbols that alerted before.
+        """
+        hit = (self.sectors["pressure"] >= ratio) & (self.sectors["worst_decile"] >= min_names)
+        return self.sectors[hit].sort_values("pressure", ascending=False, kind="stable")
+
+    def for_symbols(self, symbols):
+        """
+        Returns pct_rank_daily, pct_rank_from_high and sector_z aligned with `symbols`
+        (NaN for symbols outside the cross-section).
+        """
+        positions = pd.Index(self.table["symbol"]).get_indexer(symbols)
+        columns = ["pct_rank_daily", "pct_rank_from_high", "sector_z"]
+        values = self.table[columns].to_numpy(dtype=float)
+        picked = np.where((positions >= 0)[:, None], values[positions], np.nan)
+        return pd.DataFrame(picked, columns=columns)
+
+
+def cross_section(universe, sectors, top_n=TOP_N):
+    """
+    Computes the cross-section of the scanned universe.
+
+    Parameters:
+        universe (pd.DataFrame): ANALYTICS_COLUMNS for every scanned symbol (see `compact`).
+        sectors (dict): symbol -> sector; missing or "Unknown" symbols are ranked but left
+                        out of the sector statistics. Symbols present, even as "Unknown",
+                        count towards `CrossSection.coverage`.
+        top_n (int): Oversold names kept per sector.
+
+    Returns:
+        CrossSection
+    """
+    universe = universe.drop_duplicates("symbol").reset_index(drop=True)
+    daily = pd.to_numeric(universe["pct_drop_from_prev_close"], errors="coerce").to_numpy(dtype=float)
+    from_high = pd.to_numeric(universe["drop_from_52w_high"], errors="coerce").to_numpy(dtype=float)
+    known = universe["symbol"].isin(sectors.keys())
+    sector = universe["symbol"].map(sectors).fillna("Unknown")
+
+    codes, names = pd.factorize(sector.where(sector != "Unknown"))
+    n_groups = len(names)
+
+    rank_daily = percentile_ranks(daily)
+    rank_from_high = percentile_ranks(from_high)
+    oversold_score = (rank_daily + rank_from_high) / 2
+    sector_z, mean_daily, _, members = group_zscores(daily, codes, n_groups)
+    _, mean_from_high, _, _ = group_zscores(from_high, codes, n_groups)
+
+    table = pd.DataFrame({
+        "symbol": universe["symbol"].to_numpy(),
+        "sector": sector.to_numpy(),
+        "pct_drop_from_prev_close": daily,
+        "drop_from_52w_high": from_high,
+        "pct_rank_daily": rank_daily,
+        "pct_rank_from_high": rank_from_high,
+        "oversold_score": oversold_score,
+        "sector_z": sector_z,
+    })
+
+    worst = np.bincount(codes[(codes >= 0) & (rank_daily <= PRESSURE_DECILE)], minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pressure = worst / (members * PRESSURE_DECILE / 100)
+    sector_table = pd.DataFrame({
+        "members": members,
+        "mean_daily": mean_daily,
+        "mean_from_high": mean_from_high,
+        "worst_decile": worst,
+        "pressure": pressure,
+    }, index=pd.Index(names, name="sector"))
+
+    oversold = {
+        names[group]: table.iloc[idx].reset_index(drop=True)
+        for group, idx in lowest_per_group(oversold_score, codes, n_groups, top_n).items()
+        if len(idx)
+    }
+    coverage = float(known.mean()) if len(universe) else 0.0
+    return CrossSection(table, sector_table, oversold, coverage)
@@ -0,0 +1,302 @@
+# backtest.py
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import instrument
+from alerts import alert_masks
+from cache import DEFAULT_CACHE_DIR, CachedProvider, OHLCCache
+from metrics import EPS, SMA_BARS, WINDOWS
+from panel import PricePanel
+from providers import FIELDS, YahooProvider, period_to_offset
+from rules import default_ruleset
+
+# Separate from the daily cache so the long histories are not trimmed back to two years
+BACKTEST_CACHE_DIR = DEFAULT_CACHE_DIR / "backtest"
+
+# Forward-return horizons in trading days
+HORIZONS = (1, 5, 20, 60)
+
+
+def rolling_alert_metrics(panel):
+    """
+    Evaluates the daily alert metrics at every date of a wide OHLC panel at once.
+
+    Each (date, ticker) cell gets the value `metrics.compute_alert_metrics` would report
+    if the panel ended on that date: prior windows cover the WINDOWS calendar days
+    before the date, the 52W high includes the date itself, and bars with any missing
+    OHLC field are ignored.
+
+    Returns:
+        dict: metric name -> (dates x tickers) DataFrame, plus "valid" (complete bar) and
+              "close" (complete-bar close) used for forward returns.
+    """
+    fields = {f: panel[f] for f in FIELDS}
+    valid = fields["Open"].notna() & fields["High"].notna() & fields["Low"].notna() & fields["Close"].notna()
+    open_, high, low, close = (fields[f].where(valid) for f in FIELDS)
+
+    out = {"valid": valid, "close": close}
+    for name, days in WINDOWS.items():
+        out[f"{name}_low"] = low.rolling(f"{days}D", closed="left").min()
+    high_52w = high.rolling(f"{WINDOWS['52w']}D", closed="both").max()
+
+    prev_close = close.ffill().shift(1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["pct_drop_from_prev_close"] = (close / prev_close - 1) * 100
+        out["pct_drop_from_open_to_close"] = (close / open_ - 1) * 100
+        out["drop_from_52w_high"] = (100.0 * (close - high_52w) / high_52w).where(high_52w > 0)
+    for name in WINDOWS:
+        level = out[f"{name}_low"]
+        out[f"below_{name}_low"] = valid & level.notna() & (close <= level + EPS)
+
+    # Down streak: complete bars since the last complete bar that did not close lower
+    is_valid = valid.to_numpy()
+    rows = np.arange(len(panel))[:, None]
+    down = is_valid & (close.to_numpy() < prev_close.to_numpy())
+    breaks = np.maximum.accumulate(np.where(is_valid & ~down, rows, 0), axis=0)
+    cum_valid = np.cumsum(is_valid, axis=0)
+    streak = cum_valid - np.take_along_axis(cum_valid, breaks, axis=0)
+    streak = np.where(is_valid, streak, np.nan)
+    out["down_streak"] = pd.DataFrame(streak, index=panel.index, columns=close.columns)
+
+    # Moving average over the last SMA_BARS complete bars, one ticker at a time (each vectorized over dates)
+    sma = np.full(close.shape, np.nan)
+    values = close.to_numpy()
+    for j in range(values.shape[1]):
+        rows_j = np.flatnonzero(is_valid[:, j])
+        if len(rows_j) >= SMA_BARS:
+            sums = np.cumsum(values[rows_j, j])
+            sums[SMA_BARS:] = sums[SMA_BARS:] - sums[:-SMA_BARS]
+            sma[rows_j[SMA_BARS - 1:], j] = sums[SMA_BARS - 1:] / SMA_BARS
+    out["sma_200"] = pd.DataFrame(sma, index=panel.index, columns=close.columns)
+    out["latest_price"] = close
+    return out
+
+
+def forward_returns(close, horizons=HORIZONS):
+    """
+    Returns {horizon: (dates x tickers) % return from each close to the close `horizon` rows later}.
+    """
+    return {h: (close.shift(-h) / close - 1) * 100 for h in horizons}
+
+
+def evaluate_panel(panel, drop_threshold=-5, streak_min=5, horizons=HORIZONS, warmup_days=WINDOWS["52w"], rules=None):
+    """
+    Runs every alert rule over every date of `panel`.
+
+    Dates less than `warmup_days` after a ticker's first complete bar are skipped, since
+    their windows would be shorter than in a live run.
+
+    Returns:
+        tuple: (alerts, baseline)
+            alerts (pd.DataFrame): One row per (date, symbol, alert_type) that fired, with the
+                                   alert's detail value and fwd_<h>d forward returns.
+            baseline (pd.DataFrame): Per horizon, the number of evaluated dates and the count,
+                                     sum and count of positive forward returns over every
+                                     evaluated (date, ticker) cell.
+    """
+    rules = rules or default_ruleset()
+    metrics = rolling_alert_metrics(panel)
+    valid = metrics["valid"]
+    first = valid.idxmax().where(valid.any())
+    evaluated = valid & (valid.index.values[:, None] >= (first + pd.Timedelta(days=warmup_days)).values[None, :])
+
+    # Long frame of evaluated cells only, with the metrics columns the rules refer to
+    mask = evaluated.to_numpy()
+    row_idx, col_idx = np.nonzero(mask)
+    long = pd.DataFrame({
+        "date": panel.index.values[row_idx],
+        "symbol": valid.columns.to_numpy(dtype=object)[col_idx],
+    })
+    details = [r.detail for r in rules.rules if r.detail]
+    for name in dict.fromkeys(rules.columns + details):
+        if name in metrics:
+            long[name] = metrics[name].to_numpy()[mask]
+    returns = forward_returns(metrics["close"], horizons)
+    for h in horizons:
+        long[f"fwd_{h}d"] = returns[h].to_numpy()[mask]
+
+    baseline = pd.DataFrame({
+        "horizon": list(horizons),
+        "days": int(evaluated.any(axis=1).sum()),
+        "n": [long[f"fwd_{h}d"].notna().sum() for h in horizons],
+        "sum": [long[f"fwd_{h}d"].sum() for h in horizons],
+        "positive": [(long[f"fwd_{h}d"] > 0).sum() for h in horizons],
+    })
+
+    masks = alert_masks(long, drop_threshold=drop_threshold, streak_min=streak_min, rules=rules)
+    frames = []
+    for rule in rules.rules:
+        alert_type, detail_column = rule.name, rule.detail
+        hit = masks[alert_type]
+        if not hit.any():
+            continue
+        frame = long.loc[hit, ["date", "symbol"] + [f"fwd_{h}d" for h in horizons]]
+        frame.insert(2, "alert_type", alert_type)
+        frame.insert(3, "detail", long.loc[hit, detail_column].to_numpy() if detail_column in long else np.nan)
+        frames.append(frame)
+
+    columns = ["date", "symbol", "alert_type", "detail"] + [f"fwd_{h}d" for h in horizons]
+    alerts = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+    return alerts, baseline
+
+
+def summarize(alerts, baseline, horizons=HORIZONS, rules=None):
+    """
+    Per alert type: number of signals and tickers, signals per evaluated trading day, and mean,
+    median and hit rate (share positive) of each forward return; an "all" row gives the
+    unconditional mean and hit rate for comparison.
+    """
+    days = baseline["days"].max() if len(baseline) else 0
+    rows = []
+    for alert_type in (rules or default_ruleset()).names:
+        fired = alerts[alerts["alert_type"] == alert_type]
+        row = {
+            "alert_type": alert_type,
+            "signals": len(fired),
+            "tickers": fired["symbol"].nunique(),
+            "per_day": round(len(fired) / days, 3) if days else np.nan,
+        }
+        for h in horizons:
+            fwd = fired[f"fwd_{h}d"].dropna()
+            row[f"mean_{h}d"] = fwd.mean() if len(fwd) else np.nan
+            row[f"median_{h}d"] = fwd.median() if len(fwd) else np.nan
+            row[f"hit_{h}d"] = (fwd > 0).mean() if len(fwd) else np.nan
+        rows.append(row)
+
+    totals = baseline.groupby("horizon")[["n", "sum", "positive"]].sum()
+    row = {"alert_type": "all", "signals": np.nan, "tickers": np.nan, "per_day": np.nan}
+    for h in horizons:
+        n = totals.at[h, "n"] if h in totals.index else 0
+        row[f"mean_{h}d"] = totals.at[h, "sum"] / n if n else np.nan
+        row[f"median_{h}d"] = np.nan
+        row[f"hit_{h}d"] = totals.at[h, "positive"] / n if n else np.nan
+    rows.append(row)
+    return pd.DataFrame(rows).set_index("alert_type").round(4)
+
+
+def _default_cache(period):
+    return OHLCCache(BACKTEST_CACHE_DIR, max_bytes=4 * 1024 ** 3, max_history=period)
+
+
+def build_panel(tickers, directory, period="5y", provider=None, cache=None, batch_size=250):
+    """
+    Downloads `period` of history for `tickers` into the OHLC cache, then packs it into a
+    memory-mapped PricePanel in `directory` for repeated backtests.
+    """
+    cache = cache or _default_cache(period)
+    provider = provider or CachedProvider(YahooProvider(), cache=cache)
+    tickers = list(dict.fromkeys(tickers))
+    for i in range(0, len(tickers), batch_size):
+        _, failures = provider.download(tickers[i:i + batch_size], period=period)
+        for ticker, reason in failures.items():
+            print(f"{ticker}: {reason}")
+    return PricePanel.from_cache(cache, tickers, directory=directory)
+
+
+def _panel_batches(panel, period, batch_size):
+    offset = period_to_offset(period)
+    if offset is not None and offset != "ytd" and len(panel.dates):
+        panel = panel.window(start=panel.dates[-1] - offset)
+    for i in range(0, len(panel.tickers), batch_size):
+        view = panel.slice(i, i + batch_size)
+        yield view.tickers, view.to_frame(), {}
+
+
+def _provider_batches(tickers, provider, period, batch_size):
+    for i in range(0, len(tickers), batch_size):
+        batch = tickers[i:i + batch_size]
+        frame, failures = provider.download(batch, period=period)
+        yield batch, frame, failures
+
+
+def run_backtest(tickers, period="5y", provider=None, batch_size=250, drop_threshold=-5, streak_min=5,
+                 horizons=HORIZONS, panel=None):
+    """
+    Backtests the alert rules over `period` of daily history for `tickers`.
+
+    Tickers are processed in batches of `batch_size`, so memory stays bounded by one
+    batch's (dates x tickers) arrays however large the universe is. Prices come from
+    `panel` (a PricePanel, typically memory-mapped by `build_panel`) when given, where
+    each batch is a view of the file, and otherwise from `provider`, by default a
+    dedicated on-disk cache (price_cache/backtest/) so only the first run downloads the
+    full history.
+
+    Returns:
+        tuple: (alerts, summary) - see `evaluate_panel` and `summarize`.
+    """
+    if panel is not None:
+        if tickers is not None:
+            panel = panel.select(tickers)
+        total = len(panel.tickers)
+        batches = _panel_batches(panel, period, batch_size)
+    else:
+        provider = provider or CachedProvider(YahooProvider(), cache=_default_cache(period))
+        tickers = list(dict.fromkeys(tickers))
+        total = len(tickers)
+        batches = _provider_batches(tickers, provider, period, batch_size)
+
+    alert_parts, baseline_parts = [], []
+    done = 0
+    while True:
+        with instrument.stage("backtest.fetch"):
+            batch, frame, failures = next(batches, (None, None, None))
+        if batch is None:
+            break
+        done += len(batch)
+        for ticker, reason in failures.items():
+            print(f"{ticker}: {reason}")
+        if frame.empty:
+            continue
+        with instrument.stage("backtest.evaluate"):
+            alerts, baseline = evaluate_panel(frame, drop_threshold=drop_threshold, streak_min=streak_min, horizons=horizons)
+        alert_parts.append(alerts)
+        baseline_parts.append(baseline)
+        print(f"Backtested {done}/{total} tickers")
+
+    columns = ["date", "symbol", "alert_type", "detail"] + [f"fwd_{h}d" for h in horizons]
+    alerts = pd.concat(alert_parts, ignore_index=True) if alert_parts else pd.DataFrame(columns=columns)
+    alerts = alerts.sort_values(["date", "alert_type", "symbol"], kind="stable", ignore_index=True)
+    baseline = pd.concat(baseline_parts) if baseline_parts else pd.DataFrame(columns=["horizon", "days", "n", "sum", "positive"])
+    return alerts, summarize(alerts, baseline, horizons)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest the daily alert rules over historical prices.")
+    parser.add_argument("tickers", nargs="*", help="Tickers to backtest (default: the cached universe)")
+    parser.add_argument("--period", default="5y", help="History to evaluate, e.g. 2y, 10y, max (default: 5y)")
+    parser.add_argument("--batch-size", type=int, default=250)
+    parser.add_argument("--drop-threshold", type=float, default=-5)
+    parser.add_argument("--streak-min", type=int, default=5)
+    parser.add_argument("--out", default="backtest_results", help="Directory for alerts.csv and summary.csv")
+    parser.add_argument("--panel", metavar="DIR", help="Memory-mapped price panel to read (built from the cache if missing)")
+    args = parser.parse_args(argv)
+
+    tickers = args.tickers
+    if not tickers:
+        from universe import load_universe
+        tickers = load_universe()
+
+    panel = None
+    if args.panel:
+        if (Path(args.panel) / "data.npy").exists():
+            panel = PricePanel.open(args.panel)
+        else:
+            panel = build_panel(tickers, args.panel, period=args.period, batch_size=args.batch_size)
+
+    alerts, summary = run_backtest(
+        tickers, period=args.period, batch_size=args.batch_size,
+        drop_threshold=args.drop_threshold, streak_min=args.streak_min, panel=panel,
+    )
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    alerts.to_csv(out / "alerts.csv", index=False)
+    summary.to_csv(out / "summary.csv")
+    print(summary.to_string())
+    print(f"{len(alerts)} historical alerts written to {out / 'alerts.csv'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+# bench.py
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+import fakes
+import instrument
+from alerts import classify_alerts
+from delivery import deliver, render_for_subscribers
+from history import AlertHistory
+from logger import log_alerts
+from pipeline import run_scan
+from sectors import SectorCache
+from universe import load_universe
+
+DEFAULT_RESULTS_PATH = Path(__file__).resolve().parent / "bench_results" / "results.jsonl"
+
+# fetch_compute and sector_tagging are the parts of "scan" (see `scan_breakdown`)
+STAGES = ["startup", "startup_check", "scrape", "scan", "fetch_compute", "sector_tagging", "classify", "logging",
+          "rendering", "sending"]
+
+# Fresh-interpreter commands whose wall time is the CLI's startup cost: argument parsing
+# alone, and a subcommand that loads the price/metrics stack (offline, so no network)
+STARTUP_COMMANDS = {
+    "startup": ["cli.py", "--help"],
+    "startup_check": ["cli.py", "check", "SPY", "--offline"],
+}
+
+
+class StageTimer:
+    """
+    Runs stages one after another, recording wall time and (optionally) peak traced memory of each.
+    """
+
+    def __init__(self, track_memory=True):
+        self.track_memory = track_memory
+        self.stages = {}
+
+    def run(self, name, func, *args, **kwargs):
+        if self.track_memory:
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - started
+            peak_mb = None
+            if self.track_memory:
+                peak_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+                tracemalloc.stop()
+            self.stages[name] = {"seconds": round(seconds, 4), "peak_mb": None if peak_mb is None else round(peak_mb, 2)}
+
+
+def time_startup(args, repeat=3):
+    """
+    Returns the best wall time, in seconds, of `repeat` fresh `python <args>` processes.
+    """
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=Path(__file__).resolve().parent, capture_output=True)
+        seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    return {"seconds": round(best, 4), "peak_mb": None}
+
+
+def scan_breakdown(report):
+    """
+    Returns the fetch_compute and sector_tagging timings `pipeline.run_scan` recorded.
+
+    Sector tagging runs on a worker thread while later batches are fetched, so its
+    seconds are the worker's total time per batch, not wall time after the fetch.
+    """
+    tagging = report["observations"].get("sector_tagging.batch_seconds")
+    return {
+        "fetch_compute": {"seconds": report["stages"].get("fetch_compute", {}).get("seconds"), "peak_mb": None},
+        "sector_tagging": {
+            "seconds": round(tagging["count"] * tagging["mean"], 4) if tagging else 0.0, "peak_mb": None,
+        },
+    }
+
+
+def run_pipeline(n_tickers, workdir, latency=0.0, chunk_size=100, workers=1, selloff=0.05, seed=0, track_memory=True,
+                 subscribers=1):
+    """
+    Runs every stage of the daily notifier against the fakes and returns per-stage metrics.
+    """
+    workdir = Path(workdir)
+    timer = StageTimer(track_memory)
+    fakes.FakeSMTP.reset()
+    instrument.RUN.reset()
+
+    for name, args in STARTUP_COMMANDS.items():
+        timer.stages[name] = time_startup(args)
+
+    tickers = timer.run(
+        "scrape", load_universe,
+        path=workdir / "universe.json", force=True, scrape=fakes.fake_universe(n_tickers),
+    )
+
+    provider = fakes.SyntheticProvider(chunk_size=chunk_size, latency=latency, workers=workers, seed=seed, selloff=selloff)
+    alerts, overview, rows = timer.run(
+        "scan", run_scan, tickers, provider=provider,
+        sector_cache=SectorCache(workdir / "sectors.json"), fetch_sector=fakes.fake_sector_lookup(),
+    )
+    timer.stages.update(scan_breakdown(instrument.RUN.report()))
+
+    classified = timer.run("classify", classify_alerts, alerts)
+    history = AlertHistory(workdir / "alert_history.db")
+    timer.run("logging", log_alerts, classified, log_dir=workdir, history=history)
+
+    bodies = timer.run(
+        "rendering", render_for_subscribers, alerts, fakes.fake_subscribers(subscribers, tickers, seed=seed),
+        log_dir=workdir, market_overview=overview, history=history, classified=classified,
+    )
+    timer.run(
+        "sending", deliver, bodies, "Benchmark", "bench@example.com", "x",
+        html=True, smtp_factory=fakes.FakeSMTP,
+    )
+    history.close()
+
+    return {
+        "stages": timer.stages,
+        "rows": rows,
+        "alerts": len(alerts),
+        "html_kb": round(sum(len(body.encode()) for body in bodies.values()) / 1024, 1),
+        "counters": instrument.RUN.report()["counters"],
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=Path(__file__).resolve().parent, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_results(path=DEFAULT_RESULTS_PATH):
+    path = Path(path)
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text().splitlines() if line.strip()]
+
+
+def save_result(result, path=DEFAULT_RESULTS_PATH):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a") as f:
+        f.write(json.dumps(result) + "\n")
+
+
+def compare(result, previous):
+    """
+    Returns a per-stage table of this run against the latest earlier run with the same settings.
+    """
+    rows = []
+    for stage in STAGES:
+        now = result["stages"].get(stage, {})
+        before = (previous or {}).get("stages", {}).get(stage, {})
+        change = None
+        if before.get("seconds"):
+            change = round(100 * (now["seconds"] / before["seconds"] - 1), 1)
+        rows.append({
+            "stage": stage,
+            "seconds": now.get("seconds"),
+            "peak_mb": now.get("peak_mb"),
+            "prev_seconds": before.get("seconds"),
+            "change_%": change,
+        })
+    return pd.DataFrame(rows).set_index("stage")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every notifier stage against synthetic data and fake services.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 5000], help="Universe sizes (e.g. 500 5000 50000)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated seconds per price request")
+    parser.add_argument("--chunk-size", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=1, help="Concurrent price requests")
+    parser.add_argument("--selloff", type=float, default=0.05, help="Fraction of tickers dropping 6-12%% on the last day")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--subscribers", type=int, default=1, help="Personalized reports to render and send")
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc (faster, timings only)")
+    parser.add_argument("--results", default=str(DEFAULT_RESULTS_PATH), help="JSONL file results are appended to")
+    parser.add_argument("--label", default="", help="Free-form note stored with the results")
+    args = parser.parse_args(argv)
+
+    history = load_results(args.results)
+    for n in args.sizes:
+        settings = {
+            "n_tickers": n, "latency": args.latency, "chunk_size": args.chunk_size,
+            "workers": args.workers, "selloff": args.selloff, "seed": args.seed,
+            "track_memory": not args.no_memory, "subscribers": args.subscribers,
+        }
+        with tempfile.TemporaryDirectory() as workdir:
+            metrics = run_pipeline(
+                n, workdir, latency=args.latency, chunk_size=args.chunk_size, workers=args.workers,
+                selloff=args.selloff, seed=args.seed, track_memory=not args.no_memory,
+                subscribers=args.subscribers,
+            )
+
+        result = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "label": args.label,
+            "settings": settings,
+            **metrics,
+        }
+        previous = next((r for r in reversed(history) if r.get("settings") == settings), None)
+        save_result(result, args.results)
+        history.append(result)
+
+        print(f"\n=== {n} tickers: {metrics['rows']} rows, {metrics['alerts']} alerts, {metrics['html_kb']} KB email "
+              f"(rev {result['revision']}, vs {previous['revision'] if previous else 'no previous run'})")
+        print(compare(result, previous).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+# cache.py
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import instrument
+from providers import FIELDS, PriceProvider, empty_panel, period_to_offset, trim_to_period
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent / "price_cache"
+
+# covered_from of a history downloaded with period="max", i.e. complete back to the first bar
+SINCE_LISTING = pd.Timestamp("1900-01-01")
+
+BAR_DTYPE = np.dtype([("Date", "datetime64[D]")] + [(f, "f8") for f in FIELDS])
+
+
+class OHLCCache:
+    """
+    On-disk store of daily OHLC history, one memory-mappable .npy file per symbol.
+
+    Each <TICKER>.npy holds a structured array of (Date, Open, High, Low, Close) rows and
+    a small <TICKER>.json sidecar records the first date the history is known to cover.
+    The sidecar's mtime doubles as a last-access stamp for least-recently-used eviction
+    once the directory grows past `max_bytes`.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=256 * 1024 * 1024, max_history="2y"):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_history = max_history
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, ticker):
+        return self.directory / f"{ticker}.npy", self.directory / f"{ticker}.json"
+
+    def load(self, ticker):
+        """
+        Returns (history, covered_from) for `ticker`, or (None, None) if it is not cached.
+
+        `history` is a Date-indexed OHLC DataFrame backed by a read-only memory map.
+        """
+        data_path, meta_path = self._paths(ticker)
+        if not data_path.exists() or not meta_path.exists():
+            return None, None
+        try:
+            bars = np.load(data_path, mmap_mode="r")
+            meta = json.loads(meta_path.read_text())
+        except (OSError, ValueError):
+            self.invalidate(ticker)
+            return None, None
+        os.utime(meta_path)
+
+        hist = pd.DataFrame({f: bars[f] for f in FIELDS}, index=pd.DatetimeIndex(bars["Date"], name="Date"))
+        return hist, pd.Timestamp(meta["start"])
+
+    def store(self, ticker, hist, covered_from):
+        """
+        Replaces the cached history of `ticker` with `hist` (trimmed to `max_history`).
+        """
+        hist = hist.dropna().sort_index()
+        trimmed = trim_to_period(hist, self.max_history)
+        if len(trimmed) < len(hist):
+            covered_from = max(pd.Timestamp(covered_from), trimmed.index[0])
+        hist = trimmed
+        bars = np.empty(len(hist), dtype=BAR_DTYPE)
+        bars["Date"] = hist.index.values.astype("datetime64[D]")
+        for field in FIELDS:
+            bars[field] = hist[field].to_numpy(dtype=float)
+
+        data_path, meta_path = self._paths(ticker)
+        tmp_path = data_path.with_suffix(".tmp.npy")
+        np.save(tmp_path, bars)
+        os.replace(tmp_path, data_path)
+        meta_path.write_text(json.dumps({"start": pd.Timestamp(covered_from).strftime("%Y-%m-%d")}))
+
+    def invalidate(self, ticker):
+        for path in self._paths(ticker):
+            path.unlink(missing_ok=True)
+
+    def enforce_size_cap(self):
+        """
+        Evicts least-recently-used symbols until the cache fits in `max_bytes`.
+        """
+        entries = []
+        total = 0
+        for data_path in self.directory.glob("*.npy"):
+            meta_path = data_path.with_suffix(".json")
+            try:
+                size = data_path.stat().st_size
+                accessed = meta_path.stat().st_mtime if meta_path.exists() else 0
+            except FileNotFoundError:
+                continue  # evicted by another process scanning a different shard
+            entries.append((accessed, size, data_path.stem))
+            total += size
+
+        for _, size, ticker in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self.invalidate(ticker)
+            instrument.incr("price_cache.evictions")
+            total -= size
+
+
+class CachedProvider(PriceProvider):
+    """
+    Wraps another provider with an incremental OHLCCache.
+
+    Cached symbols are refreshed by requesting only the bars from their second-to-last
+    cached date onwards: the last cached bar may have been captured mid-session and is
+    always replaced, while the settled bar before it is compared with the fresh download.
+    If it moved (split, dividend adjustment or a vendor backfill), the symbol's cache is
+    dropped and its full period is downloaded again. A cached history serves any period
+    it covers, including "ytd" and, if it was itself downloaded with period="max", "max".
+
+    A symbol whose refresh failed, or whose history ends before the latest session the
+    upstream returned for other symbols, is reported as a failure rather than served
+    from the cache, so stale bars are never evaluated as today's. With an `offline`
+    upstream the cache is served as it is.
+    """
+
+    def __init__(self, upstream, cache=None, tolerance=1e-6):
+        self.upstream = upstream
+        self.cache = cache or OHLCCache()
+        self.tolerance = tolerance
+        self.chunk_size = upstream.chunk_size
+        # Batches are fetched as concurrently as the upstream allows (see `fetch.iter_price_data`)
+        self.workers = upstream.workers
+
+    def download(self, tickers, period="1y", interval="1d", start=None):
+        if interval != "1d" or start is not None:
+            return self.upstream.download(tickers, period=period, interval=interval, start=start)
+
+        tickers = list(dict.fromkeys(tickers))
+        offset = period_to_offset(period)
+        today = pd.Timestamp.today().normalize()
+        if offset is None:
+            needed_from = SINCE_LISTING
+        elif offset == "ytd":
+            needed_from = pd.Timestamp(year=today.year, month=1, day=1)
+        else:
+            needed_from = today - offset
+
+        histories, covered, failures = {}, {}, {}
+        full, refresh = [], {}
+        for ticker in tickers:
+            hist, covered_from = self.cache.load(ticker)
+            if hist is None or len(hist) < 2 or covered_from > needed_from:
+                instrument.incr("price_cache.misses")
+                full.append(ticker)
+                continue
+            instrument.incr("price_cache.hits")
+            histories[ticker] = hist
+            covered[ticker] = covered_from
+            refresh.setdefault(hist.index[-2], []).append(ticker)
+
+        if self.upstream.offline:
+            failures.update({t: "not cached" for t in full})
+            return self._panel(tickers, histories, period), failures
+
+        # Incremental refresh, one batched request per distinct resume date
+        latest = None
+        for resume_date, group in refresh.items():
+            fresh, refresh_failures = self.upstream.download(group, period=period, interval=interval, start=resume_date)
+            if not fresh.empty:
+                latest = max(latest or fresh.index[-1], fresh.index[-1])
+            for ticker in group:
+                cached = histories[ticker]
+                new = _ticker_history(fresh, ticker)
+                if new.empty:
+                    # The refresh starts at a bar already cached, so nothing back means the request failed
+                    del histories[ticker]
+                    failures[ticker] = f"refresh failed ({refresh_failures.get(ticker, 'no data')})"
+                    continue
+                if resume_date in new.index and not np.isclose(
+                    new.at[resume_date, "Close"], cached.at[resume_date, "Close"], rtol=self.tolerance, atol=0
+                ):
+                    del histories[ticker]
+                    instrument.incr("price_cache.invalidations")
+                    self.cache.invalidate(ticker)
+                    full.append(ticker)
+                    continue
+                merged = pd.concat([cached[cached.index < resume_date], new])
+                merged = merged[~merged.index.duplicated(keep="last")]
+                # The older cached bars are kept, so the history still covers what it did
+                self.cache.store(ticker, merged, covered_from=covered[ticker])
+                histories[ticker] = merged
+
+        if full:
+            fresh, full_failures = self.upstream.download(full, period=period, interval=interval)
+            failures.update(full_failures)
+            if not fresh.empty:
+                latest = max(latest or fresh.index[-1], fresh.index[-1])
+            for ticker in full:
+                new = _ticker_history(fresh, ticker)
+                if new.empty:
+                    continue
+                self.cache.store(ticker, new, covered_from=needed_from)
+                histories[ticker] = new
+
+        self.cache.enforce_size_cap()
+
+        # Symbols the upstream served, but only up to an earlier session than the others (e.g. halted)
+        if latest is not None:
+            for ticker in [t for t, hist in histories.items() if hist.index[-1] < latest]:
+                failures[ticker] = f"stale: bars end {histories.pop(ticker).index[-1]:%Y-%m-%d}, latest session {latest:%Y-%m-%d}"
+                instrument.incr("price_cache.stale")
+        return self._panel(tickers, histories, period), failures
+
+    @staticmethod
+    def _panel(tickers, histories, period):
+        if not histories:
+            return empty_panel()
+        panel = pd.concat(
+            {t: histories[t] for t in tickers if t in histories}, axis=1, names=["Ticker", "Price"], sort=True
+        ).swaplevel(axis=1)
+        return trim_to_period(panel, period).sort_index(axis=1, level=0, sort_remaining=False)
+
+
+def _ticker_history(panel, ticker):
+    if panel.empty or ticker not in panel.columns.get_level_values(1):
+        return pd.DataFrame(columns=FIELDS, dtype=float)
+    return panel.xs(ticker, axis=1, level=1)[FIELDS].dropna()
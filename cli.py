@@ -0,0 +1,227 @@
+# cli.py
+# Command-line entry point: python cli.py {scan,render,send,history,sectors,check} ...
+# Subcommands import what they use when they run, so `--help`, `history` or `check`
+# never load the scraper, yfinance, SMTP or the credentials in config.py.
+import argparse
+import sys
+from pathlib import Path
+
+
+def _log_dir(args):
+    if args.log_dir:
+        return Path(args.log_dir)
+    from run_notifier import LOG_DIR
+    return LOG_DIR
+
+
+def _journal_root(args):
+    if args.log_dir:
+        return Path(args.log_dir) / "journal"
+    from run_notifier import JOURNAL_DIR
+    return JOURNAL_DIR
+
+
+def _print_market(context):
+    if context is None:
+        return
+    changes = [f"{symbol} {change:+.2f}%" for symbol, change in context.benchmarks.items() if change is not None]
+    if changes:
+        print("Market: " + ", ".join(changes))
+    breadth = context.breadth
+    if breadth and breadth["symbols"]:
+        print(f"Breadth: {breadth['advancers']} up / {breadth['decliners']} down "
+              f"({breadth['pct_down']}% down), {breadth['new_52w_lows']} at 52W lows")
+
+
+def cmd_scan(args):
+    from alerts import classify_alerts
+    from delivery import alert_thresholds, load_subscribers
+    from pipeline import run_scan, run_sharded_scan
+    from run_notifier import offline_provider, offline_universe
+
+    if args.offline:
+        from sectors import offline_lookup
+        tickers = offline_universe()
+        options = {"fetch_sector": offline_lookup}
+    else:
+        from universe import load_universe
+        tickers = load_universe()
+        options = {}
+    # A saved scan is reused by `send`, so it keeps the rows any subscriber's thresholds need
+    options["overrides"] = alert_thresholds(load_subscribers())
+
+    if args.processes:
+        if args.offline:
+            options["provider_factory"] = offline_provider
+        alerts, context, rows = run_sharded_scan(tickers, processes=args.processes, shard_size=args.shard_size, **options)
+    else:
+        if args.offline:
+            options["provider"] = offline_provider()
+        alerts, context, rows = run_scan(tickers, **options)
+
+    classified = classify_alerts(alerts)
+    print(f"Scanned {rows} of {len(tickers)} tickers: {len(classified)} alerts on {alerts['symbol'].nunique()} symbols")
+    if not classified.empty:
+        print(classified["alert_type"].value_counts(sort=False).to_string())
+    _print_market(context)
+
+    if args.save:
+        # Checkpoint the scan so `render` (and a later `send` today) reuse it
+        from journal import RunJournal
+        journal = RunJournal(_journal_root(args))
+        journal.save("universe", tickers)
+        journal.save("scan", (alerts, context))
+        print(f"Saved scan for {journal.day}")
+    if args.out:
+        alerts.to_csv(args.out, index=False)
+        print(f"Alert rows written to {args.out}")
+
+
+def cmd_render(args):
+    from emailer import generate_html_email
+    from history import DB_NAME, AlertHistory
+    from journal import RunJournal, trading_day
+
+    root = _journal_root(args)
+    day = args.day or trading_day()
+    if not (root / day).is_dir():
+        days = sorted(p.name for p in root.iterdir() if p.is_dir()) if root.is_dir() else []
+        if args.day or not days:
+            print(f"No journal for {day} in {root}")
+            return 1
+        day = days[-1]
+
+    scan = RunJournal(root, day=day).load("scan")
+    if scan is None:
+        print(f"No completed scan for {day}; run `python cli.py scan --save` or `python cli.py send` first")
+        return 1
+    alerts, context = scan
+
+    # Repeat counts come from the log directory's history if there is one; none is created
+    log_dir = _log_dir(args)
+    history = AlertHistory.in_dir(log_dir) if (log_dir / DB_NAME).exists() else AlertHistory(":memory:")
+    body = generate_html_email(
+        alerts, drop_threshold=args.drop_threshold, streak_min=args.streak_min,
+        market_overview=context, history=history,
+    )
+    out = Path(args.out or f"report_{day}.html")
+    out.write_text(body, encoding="utf-8")
+    print(f"Rendered the {day} report ({len(alerts)} alert rows) to {out}")
+
+
+def cmd_send(args):
+    import run_notifier
+    run_notifier.main(args)
+
+
+def cmd_history(args):
+    from datetime import date, timedelta
+
+    from history import AlertHistory
+
+    history = AlertHistory.in_dir(_log_dir(args))
+    start = date.today() - timedelta(days=args.days)
+    rows = history.query(
+        start=start, symbols=[s.upper() for s in args.symbols] or None,
+        alert_types=args.type or None, sectors=args.sector or None,
+    )
+    if rows.empty:
+        print(f"No alerts since {start}")
+        return
+    if args.by_sector:
+        print(rows.groupby(["sector", "alert_type"], dropna=False).size().unstack(fill_value=0).to_string())
+    else:
+        print(rows.tail(args.limit).to_string(index=False))
+        if len(rows) > args.limit:
+            print(f"... {len(rows) - args.limit} earlier rows (use --limit)")
+
+
+def cmd_check(args):
+    from fetch import get_price_data
+    from rules import default_ruleset
+
+    ticker = args.ticker.upper()
+    if args.offline:
+        from run_notifier import offline_provider
+        provider = offline_provider()
+    else:
+        provider = None
+    info = get_price_data([ticker], period=args.period, provider=provider)
+    if info.empty:
+        print(f"No price data for {ticker}")
+        return 1
+
+    row = info.iloc[0]
+    print(row.drop("symbol").to_string())
+    rules = default_ruleset()
+    masks = rules.evaluate(info)
+    fired = [rule for rule in rules.rules if masks[rule.name][0]]
+    print()
+    if fired:
+        for rule in fired:
+            print(f"[{rule.severity.upper()}] {rules.labels()[rule.name]}")
+    else:
+        print(f"{ticker}: no alerts")
+
+
+def cmd_sectors(args):
+    from sectors import backfill_sectors
+    from universe import load_universe
+
+    found = backfill_sectors(load_universe(), limit=args.limit)
+    print(f"Looked up {found} new sectors")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Stock alert notifier.")
+    parser.add_argument("--log-dir", help="Alert history and journals for scan/render/history (default: LOG_DIR in run_notifier.py)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scan = commands.add_parser("scan", help="Fetch prices and evaluate alerts; log and send nothing")
+    scan.add_argument("--offline", action="store_true", help="Use only the cached universe, prices and sectors")
+    scan.add_argument("--processes", type=int, metavar="N", help="Scan in N worker processes")
+    scan.add_argument("--shard-size", type=int, default=500)
+    scan.add_argument("--save", action="store_true", help="Checkpoint the result in today's journal for `render`")
+    scan.add_argument("--out", metavar="CSV", help="Write the alert rows to CSV")
+    scan.set_defaults(func=cmd_scan)
+
+    render = commands.add_parser("render", help="Render a report from a checkpointed scan")
+    render.add_argument("--day", help="Trading day YYYY-MM-DD (default: today's, else the latest journal)")
+    render.add_argument("--out", metavar="HTML", help="Output file (default: report_<day>.html)")
+    render.add_argument("--drop-threshold", type=float, default=-5)
+    render.add_argument("--streak-min", type=int, default=5)
+    render.set_defaults(func=cmd_render)
+
+    send = commands.add_parser("send", help="The full daily run (what run_notifier.py does)")
+    from run_notifier import add_run_arguments
+    add_run_arguments(send)
+    send.set_defaults(func=cmd_send)
+
+    history = commands.add_parser("history", help="Query the alert history")
+    history.add_argument("symbols", nargs="*", help="Only these symbols")
+    history.add_argument("--days", type=int, default=30, help="Look back this many calendar days (default: 30)")
+    history.add_argument("--type", action="append", help="Only this alert_type (repeatable)")
+    history.add_argument("--sector", action="append", help="Only this sector (repeatable)")
+    history.add_argument("--by-sector", action="store_true", help="Count alerts per sector and type")
+    history.add_argument("--limit", type=int, default=50, help="Rows to print (default: 50)")
+    history.set_defaults(func=cmd_history)
+
+    sectors = commands.add_parser("sectors", help="Look up the sectors of universe symbols not in the sector cache")
+    sectors.add_argument("--limit", type=int, help="At most this many lookups (default: all)")
+    sectors.set_defaults(func=cmd_sectors)
+
+    check = commands.add_parser("check", help="Show one ticker's metrics and the alerts it triggers")
+    check.add_argument("ticker")
+    check.add_argument("--period", default="1y")
+    check.add_argument("--offline", action="store_true", help="Use only the price cache")
+    check.set_defaults(func=cmd_check)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+# delivery.py
+import json
+import queue
+import smtplib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+import instrument
+from alerts import threshold_overrides
+from emailer import build_message, generate_html_email
+from executor import call_with_retry, is_transient
+from rules import default_ruleset
+
+SMTP_HOST = "smtp.gmail.com"
+SMTP_PORT = 465
+DEFAULT_SUBSCRIBERS_PATH = Path(__file__).resolve().parent / "subscribers.json"
+
+
+def load_subscribers(path=DEFAULT_SUBSCRIBERS_PATH, default_recipient=None):
+    """
+    Reads the subscriber list: a JSON array of objects such as
+        {"email": "a@example.com", "watchlist": ["AAPL", "MSFT"], "drop_threshold": -7, "streak_min": 6}
+    Only "email" is required; without a watchlist the subscriber gets every alert.
+
+    Returns [{"email": default_recipient}] if the file does not exist and a default is given.
+    """
+    path = Path(path)
+    if not path.exists():
+        return [{"email": default_recipient}] if default_recipient else []
+    subscribers = json.loads(path.read_text())
+    for subscriber in subscribers:
+        if not subscriber.get("email"):
+            raise ValueError(f"Subscriber without an email address in {path}: {subscriber}")
+    return subscribers
+
+
+def alert_thresholds(subscribers, rules=None):
+    """
+    Returns the rule threshold overrides at which the scan must select alert rows so
+    that every subscriber's report can be rendered from them: the loosest drop
+    threshold and the shortest streak any subscriber (or the default) uses.
+    """
+    thresholds = (rules or default_ruleset()).thresholds()
+    drops = [s.get("drop_threshold", -5) for s in subscribers] + [-5, thresholds.get("pct_drop_5plus")]
+    streaks = [s.get("streak_min", 5) for s in subscribers] + [5, thresholds.get("down_streak_5plus")]
+    return threshold_overrides(
+        drop_threshold=max(d for d in drops if d is not None),
+        streak_min=min(s for s in streaks if s is not None),
+    )
+
+
+def render_for_subscribers(alerts, subscribers, market_overview=None, history=None, log_dir=None, days_back=7,
+                           classified=None):
+    """
+    Renders each subscriber's report from the one shared alert table.
+
+    Subscribers with the same watchlist and thresholds share a single render, and those
+    on the default thresholds reuse `classified` instead of evaluating the rules again.
+
+    Parameters:
+        alerts (pd.DataFrame): Metrics rows with sector columns, as returned by `pipeline.run_scan`
+                               run with `overrides=alert_thresholds(subscribers)`; rows the
+                               scan did not select cannot show up in any report.
+        subscribers (list[dict]): See `load_subscribers`.
+        classified (pd.DataFrame or None): `alerts.classify_alerts(alerts)`, if already computed.
+
+    Returns:
+        dict: email -> HTML body
+    """
+    rendered, bodies = {}, {}
+    for subscriber in subscribers:
+        watchlist = subscriber.get("watchlist")
+        key = (
+            frozenset(watchlist) if watchlist is not None else None,
+            subscriber.get("drop_threshold", -5),
+            subscriber.get("streak_min", 5),
+        )
+        if key not in rendered:
+            source = classified if classified is not None and key[1:] == (-5, 5) else alerts
+            rows = source if watchlist is None else source[source["symbol"].isin(key[0])]
+            rendered[key] = generate_html_email(
+                rows, drop_threshold=key[1], streak_min=key[2], log_dir=log_dir,
+                days_back=days_back, market_overview=market_overview, history=history,
+            )
+        bodies[subscriber["email"]] = rendered[key]
+    instrument.incr("emails.rendered", len(rendered))
+    return bodies
+
+
+def is_transient_smtp(exc):
+    """
+    SMTP errors worth retrying: dropped connections and 4xx (temporary) replies.
+    """
+    if isinstance(exc, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return False
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return 400 <= exc.smtp_code < 500
+    return isinstance(exc, OSError) or is_transient(exc)
+
+
+class SMTPPool:
+    """
+    Up to `size` logged-in SMTP connections shared between threads.
+
+    Idle connections are checked with NOOP before reuse. A connection that failed while
+    sending is discarded and replaced on the next acquire, unless the server merely
+    rejected that one message.
+    """
+
+    def __init__(self, user, password, size=2, host=SMTP_HOST, port=SMTP_PORT, smtp_factory=None):
+        self.user = user
+        self.password = password
+        self.host = host
+        self.port = port
+        self.smtp_factory = smtp_factory or smtplib.SMTP_SSL
+        self.slots = threading.BoundedSemaphore(size)
+        self.idle = queue.LifoQueue()
+
+    def _connect(self):
+        server = self.smtp_factory(self.host, self.port)
+        try:
+            server.login(self.user, self.password)
+        except Exception:
+            _quietly_quit(server)
+            raise
+        instrument.incr("smtp.connections")
+        return server
+
+    def _acquire(self):
+        self.slots.acquire()
+        try:
+            while True:
+                try:
+                    server = self.idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                try:
+                    server.noop()
+                    return server
+                except Exception:
+                    _quietly_quit(server)
+        except Exception:
+            self.slots.release()
+            raise
+
+    def send(self, msg):
+        server = self._acquire()
+        try:
+            server.send_message(msg)
+        except Exception as e:
+            if not _session_intact(e):
+                _quietly_quit(server)
+                server = None
+            raise
+        finally:
+            if server is not None:
+                self.idle.put(server)
+            self.slots.release()
+
+    def close(self):
+        while True:
+            try:
+                _quietly_quit(self.idle.get_nowait())
+            except queue.Empty:
+                return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def _session_intact(exc):
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(exc, smtplib.SMTPResponseException) and exc.smtp_code >= 500
+
+
+def _quietly_quit(server):
+    try:
+        server.quit()
+    except Exception:
+        pass
+
+
+def deliver(bodies, subject, sender, password, html=True, pool=None, workers=2, retries=2, base_delay=1.0,
+            smtp_factory=None, on_sent=None):
+    """
+    Sends one message per recipient over pooled SMTP connections.
+
+    Parameters:
+        bodies (dict): recipient -> message body (see `render_for_subscribers`).
+        pool (SMTPPool or None): Connection pool (default: `workers` Gmail connections).
+        workers (int): Messages in flight at once.
+        retries (int): Retries per message for transient SMTP failures.
+        smtp_factory (callable or None): Passed to the default pool, e.g. fakes.FakeSMTP.
+        on_sent (callable or None): Called with each recipient as soon as its message is
+                                    accepted, e.g. `journal.RunJournal.mark_sent`.
+
+    Returns:
+        pd.DataFrame: One row per recipient with columns recipient, status ("sent" or
+                      "failed"), attempts and error.
+    """
+    own_pool = pool is None
+    pool = pool or SMTPPool(sender, password, size=workers, smtp_factory=smtp_factory)
+
+    def send_one(recipient):
+        msg = build_message(subject, bodies[recipient], sender, recipient, html=html)
+        attempts = 0
+
+        def attempt():
+            nonlocal attempts
+            attempts += 1
+            pool.send(msg)
+
+        try:
+            call_with_retry(attempt, retries=retries, base_delay=base_delay, retry_if=is_transient_smtp, name="smtp.send")
+        except Exception as e:
+            instrument.event("email_failed", recipient=recipient, error=str(e))
+            return {"recipient": recipient, "status": "failed", "attempts": attempts, "error": str(e)}
+        if on_sent is not None:
+            on_sent(recipient)
+        return {"recipient": recipient, "status": "sent", "attempts": attempts, "error": None}
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="smtp") as executor:
+            statuses = pd.DataFrame(
+                list(executor.map(send_one, list(bodies))),
+                columns=["recipient", "status", "attempts", "error"],
+            )
+    finally:
+        if own_pool:
+            pool.close()
+
+    sent = int((statuses["status"] == "sent").sum())
+    instrument.incr("emails.sent", sent)
+    instrument.incr("emails.failed", len(statuses) - sent)
+    print(f"✅ Sent {sent}/{len(statuses)} emails.")
+    for row in statuses[statuses["status"] == "failed"].itertuples():
+        print(f"❌ Failed to send email to {row.recipient}: {row.error}")
+    return statuses
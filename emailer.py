@@ -1,14 +1,229 @@
 from datetime import datetime
-from pandas.tseries.offsets import BDay
-import os
-import glob
 import pandas as pd
-from collections import defaultdict
 import smtplib
 from email.mime.text import MIMEText
+from string import Template
+import numpy as np
+from alerts import classify_alerts, section_labels
+from analytics import PRESSURE_DECILE
+from market import BENCHMARKS, SECTOR_ETFS, MarketContext
+from rules import default_ruleset
+from history import AlertHistory
+import instrument
 
 
-def generate_html_email(info_df, drop_threshold=-5, streak_min=5, log_dir='.', days_back=7, market_overview=None):
+SECTION_TEMPLATE = Template("<h3 style='margin-top:20px;'>$section</h3>")
+
+SECTOR_TEMPLATE = Template("""<h4 style='margin-bottom:5px;color:#555;'>$sector</h4>
+
+            <table style="width:100%; border-collapse:collapse; font-size:14px; table-layout:fixed;">
+            <tr>
+                <th align="left" style="border-bottom:1px solid #ccc; padding:4px;">Symbol</th>
+                <th align="left" style="border-bottom:1px solid #ccc; padding:4px;">Details</th>
+            </tr>
+            
+$rows
+</table>""")
+
+ROW_TEMPLATE = Template("""
+                <tr style="vertical-align: top;">
+                    <td style="padding:6px 4px; white-space:nowrap; font-family:Arial, sans-serif; font-size:14px; overflow:hidden; text-overflow:ellipsis;">$link</td>
+                    <td style="padding:6px 4px; white-space:nowrap; font-family:Arial, sans-serif; font-size:14px; overflow:hidden; text-overflow:ellipsis;">$details</td>
+                </tr>
+                """)
+
+# The row template split around its placeholders, so rows can be built with column-wise string concatenation
+_ROW_OPEN, _ROW_MID, _ROW_CLOSE = ROW_TEMPLATE.safe_substitute(link="\0", details="\0").split("\0")
+
+BADGE_TEMPLATE = "<span style='background-color:#eee; border-radius:6px; padding:2px 6px; font-size:12px; color:#555;'>{} alerts</span>"
+
+VS_SECTOR_TEMPLATE = "<span style='font-size:12px; color:#777;'>{:+.2f} vs sector</span>"
+
+SECTOR_Z_TEMPLATE = "<span style='font-size:12px; color:#777;'>z {:+.1f} in sector</span>"
+
+RANK_TEMPLATE = "<span style='font-size:12px; color:#777;'>weakest {:.0f}% of universe</span>"
+
+def _alert_details(alerts, rules=None):
+    """
+    Builds the Details cell for every alert row at once: streak length or % move (with,
+    where the cross-section has them, the move relative to the sector and the universe),
+    plus a badge when the symbol triggered two or more alerts.
+    """
+    trigger_count = alerts.groupby("symbol")["alert_type"].transform("size")
+    badge = np.where(trigger_count >= 2, trigger_count.map(BADGE_TEMPLATE.format), "")
+    badge = pd.Series(badge, index=alerts.index)
+
+    detail = alerts["detail"]
+    alert_type = alerts["alert_type"]
+    has_detail = detail.notna()
+    text = pd.Series("", index=alerts.index)
+
+    for rule in (rules or default_ruleset()).rules:
+        shown = has_detail & (alert_type == rule.name)
+        if rule.unit is None or not shown.any():
+            continue
+        if rule.unit == "days":
+            text[shown] = detail[shown].astype(int).astype(str) + " days"
+        else:
+            text[shown] = f"<span style='color:{rule.color or 'inherit'}'>(" + detail[shown].map("{:+.2f}".format) + "%)</span>"
+        if rule.detail == "pct_drop_from_prev_close" and "vs_sector" in alerts.columns:
+            # Next to the daily move, how far it is from the sector's own move
+            relative = shown & alerts["vs_sector"].notna()
+            text[relative] = text[relative] + " " + alerts.loc[relative, "vs_sector"].map(VS_SECTOR_TEMPLATE.format)
+            if "sector_z" in alerts.columns:
+                scored = shown & alerts["sector_z"].notna()
+                text[scored] = text[scored] + " " + alerts.loc[scored, "sector_z"].map(SECTOR_Z_TEMPLATE.format)
+        if "rank" in alerts.columns:
+            ranked = shown & alerts["rank"].notna()
+            text[ranked] = text[ranked] + " " + np.ceil(alerts.loc[ranked, "rank"]).map(RANK_TEMPLATE.format)
+
+    return (text + " " + badge).str.strip()
+
+
+def _change_color(change):
+    return "red" if change < 0 else "green"
+
+
+def render_market_overview(market_overview):
+    """
+    Renders benchmark changes, universe breadth and sector ETF changes.
+
+    Parameters:
+        market_overview (MarketContext or dict or None): Context from `pipeline.run_scan`,
+                                                         or a {"SPY": ..., "QQQ": ...} dict.
+
+    Returns:
+        list[str]: HTML fragments (empty when there is no data).
+    """
+    context = MarketContext.coerce(market_overview)
+    if context is None:
+        return []
+
+    html_lines = []
+    benchmarks = {symbol: change for symbol, change in context.benchmarks.items() if change is not None}
+    if benchmarks:
+        html_lines.append("<h3>📉 Market Overview</h3><ul>")
+        for symbol, change in benchmarks.items():
+            name = BENCHMARKS.get(symbol, symbol)
+            html_lines.append(f"<li>{name} ({symbol}): <span style='color:{_change_color(change)}'>{change:+.2f}%</span></li>")
+        html_lines.append("</ul>")
+
+    breadth = context.breadth
+    if breadth and breadth["symbols"]:
+        line = (
+            f"<p><b>Breadth</b>: {breadth['advancers']} advancing / {breadth['decliners']} declining "
+            f"({breadth['pct_down']}% of {breadth['symbols']} down), {breadth['down_5plus']} down 5%+, "
+            f"{breadth['new_52w_lows']} at 52W lows"
+        )
+        if breadth["pct_above_sma_200"] is not None:
+            line += f", {breadth['pct_above_sma_200']}% above the 200-day SMA"
+        html_lines.append(line + "</p>")
+
+    sectors = sorted(
+        ((change, sector) for sector, change in context.sectors.items() if change is not None),
+        key=lambda item: item[0],
+    )
+    if sectors:
+        html_lines.append("<h3>🏭 Sector ETFs</h3><ul>")
+        for change, sector in sectors:
+            html_lines.append(
+                f"<li>{sector} ({SECTOR_ETFS[sector]}): <span style='color:{_change_color(change)}'>{change:+.2f}%</span></li>"
+            )
+        html_lines.append("</ul>")
+    return html_lines
+
+
+def render_sector_pressure(market_overview, sector_totals, oversold_names=3):
+    """
+    Renders the sectors under pressure and the most oversold names per sector.
+
+    With the scan's cross-section (`analytics.CrossSection`), each sector lists the names
+    ranked weakest on the day's move and distance from the 52W high together, and once
+    most of the universe has a known sector (`CrossSection.covered`) a sector is under
+    pressure when it is over-represented among the universe's worst daily moves. Until
+    then, or without a cross-section (e.g. a plain dict overview), sectors with 3+ alert
+    rows are listed as before.
+
+    Parameters:
+        sector_totals (pd.Series): Alert rows per sector.
+        oversold_names (int): Names listed per sector.
+
+    Returns:
+        list[str]: HTML fragments (empty when there is nothing to show).
+    """
+    context = MarketContext.coerce(market_overview)
+    # getattr: contexts checkpointed before the cross-section existed lack the attribute
+    section = getattr(context, "cross_section", None)
+    html_lines = []
+    if section is not None and section.covered:
+        pressured = section.pressured()
+        if not pressured.empty:
+            html_lines.append(f"<h3>⚠️ Sectors Under Pressure (over-represented in the worst {PRESSURE_DECILE}% today)</h3><ul>")
+            rows = zip(pressured.index, pressured["worst_decile"].tolist(), pressured["members"].tolist(),
+                       pressured["pressure"].tolist(), pressured["mean_daily"].tolist())
+            for sector, worst, members, pressure, mean_daily in rows:
+                html_lines.append(
+                    f"<li><b>{sector}</b>: {worst} of {members} names ({pressure:.1f}x its share), "
+                    f"avg <span style='color:{_change_color(mean_daily)}'>{mean_daily:+.2f}%</span></li>"
+                )
+            html_lines.append("</ul>")
+    else:
+        pressured_sectors = sector_totals[sector_totals >= 3].sort_values(ascending=False, kind="stable")
+        if not pressured_sectors.empty:
+            html_lines.append("<h3>⚠️ Sectors Under Pressure (3+ alerts)</h3><ul>")
+            for sector, count in pressured_sectors.items():
+                html_lines.append(f"<li><b>{sector}</b>: {count} alerts</li>")
+            html_lines.append("</ul>")
+
+    if section is not None and section.oversold:
+        html_lines.append("<h3>🎯 Most Oversold by Sector</h3><ul>")
+        for sector in sorted(section.oversold):
+            top = section.oversold[sector].head(oversold_names)
+            names = ", ".join(
+                f"{symbol} ({daily:+.1f}%, {from_high:.0f}% from high)"
+                for symbol, daily, from_high in zip(top["symbol"].tolist(), top["pct_drop_from_prev_close"].tolist(),
+                                                    top["drop_from_52w_high"].tolist())
+            )
+            html_lines.append(f"<li><b>{sector}</b>: {names}</li>")
+        html_lines.append("</ul>")
+    return html_lines
+
+
+def render_alert_sections(alerts, labels, rules=None):
+    """
+    Renders the section -> sector -> symbol tables from the long alert table.
+
+    Returns:
+        list[str]: HTML fragments in report order.
+    """
+    if alerts.empty:
+        return []
+
+    symbols = alerts["symbol"].astype(str)
+    links = '<a href="https://finance.yahoo.com/quote/' + symbols + '" target="_blank" style="text-decoration:none;"><b>' + symbols + "</b></a>"
+    rows = _ROW_OPEN + links + _ROW_MID + _alert_details(alerts, rules) + _ROW_CLOSE
+
+    order = {alert_type: i for i, alert_type in enumerate(labels)}
+    grouped = (
+        pd.DataFrame({"order": alerts["alert_type"].map(order), "alert_type": alerts["alert_type"],
+                      "sector": alerts["sector"].astype(str), "row": rows})
+        .sort_values(["order", "sector"], kind="stable")
+        .groupby(["order", "alert_type", "sector"], sort=False)["row"]
+        .agg("\n".join)
+    )
+
+    html_lines = []
+    current = None
+    for (_, alert_type, sector), rows_html in grouped.items():
+        if alert_type != current:
+            html_lines.append(SECTION_TEMPLATE.substitute(section=labels[alert_type]))
+            current = alert_type
+        html_lines.append(SECTOR_TEMPLATE.substitute(sector=sector, rows=rows_html))
+    return html_lines
+
+
+def generate_html_email(info_df, drop_threshold=-5, streak_min=5, log_dir=None, days_back=7, market_overview=None, history=None,
+                        rules=None):
     """
     Generates a structured HTML email summarizing triggered stock alerts.
 
@@ -17,7 +232,9 @@ def generate_html_email(info_df, drop_threshold=-5, streak_min=5, log_dir='.', d
     embeds market overview and recent repeat drop statistics.
 
     Parameters:
-        info_df (pd.DataFrame): DataFrame containing alert flags, prices, and sectors for each stock.
+        info_df (pd.DataFrame): DataFrame containing alert flags, prices, and sectors for each stock,
+                                or the long table from `alerts.classify_alerts` if the rules have
+                                already been evaluated.
                                 Required columns include:
                                   - symbol
                                   - sector
@@ -26,22 +243,27 @@ def generate_html_email(info_df, drop_threshold=-5, streak_min=5, log_dir='.', d
                                   - pct_drop_from_prev_close
         drop_threshold (float): Percentage drop threshold for highlighting major declines (default: -5).
         streak_min (int): Minimum streak length (in days) to flag a down streak (default: 5).
-        log_dir (str): Directory containing historical trigger log CSVs (default: current directory).
+        log_dir (str or None): Directory containing the alert history database, read when
+                               `history` is not given (default: none).
         days_back (int): Number of business days to look back for repeat alert detection (default: 7).
-        market_overview (dict or None): Dictionary of market index % changes. Example:
+        market_overview (MarketContext or dict or None): Market context from `pipeline.run_scan`,
+            or a dictionary of market index % changes. Example:
             {
                 "SPY": -1.23,
                 "QQQ": 0.45
             }
+        history (AlertHistory or None): Alert store used for repeat counts (default: alert_history.db
+                                        in log_dir, or an empty in-memory store without a log_dir).
+        rules (RuleSet or None): Alert rules (default: `rules.default_ruleset()`).
 
     Returns:
         str: HTML-formatted string suitable for embedding in an email body.
              Includes:
                - summary stats
                - alert sections grouped by type and sector
-               - sector pressure highlights
+               - sector pressure highlights and the most oversold names per sector
                - repeat 5% droppers this week
-               - market index overview (SPY/QQQ)
+               - market overview (benchmarks, breadth, sector ETFs)
                - run timestamp footer
 
     Raises:
@@ -51,101 +273,27 @@ def generate_html_email(info_df, drop_threshold=-5, streak_min=5, log_dir='.', d
     today = datetime.today()
     today_str = today.strftime('%Y-%m-%d')
 
-    # Load recent logs to get repeat counts
-    log_files = sorted(glob.glob(os.path.join(log_dir, "trigger_log_*.csv")))
-    recent_logs = []
-
-    if today.weekday() < 5:
-        min_allowed_date = today - BDay(days_back - 1)
-    else:
-        min_allowed_date = today - BDay(days_back)
-
-    for file in log_files:
-        try:
-            date_str = os.path.basename(file).split("_")[-1].replace(".csv", "")
-            file_date = datetime.strptime(date_str, "%Y-%m-%d")
-            if file_date.weekday() < 5 and min_allowed_date.date() <= file_date.date() <= today.date():
-                df = pd.read_csv(file)
-                recent_logs.append(df)
-        except:
-            continue
+    # Repeat counts from the alert history
+    if history is None:
+        # Never create a database as a side effect of rendering from wherever the caller runs
+        history = AlertHistory.in_dir(log_dir) if log_dir else AlertHistory(":memory:")
+    recent_repeat_drops = history.repeat_counts("pct_drop_5plus", days_back=days_back, today=today)
 
-    if recent_logs:
-        all_recent = pd.concat(recent_logs)
-        repeat_counts = all_recent[all_recent["alert_type"] == "pct_drop_5plus"]["symbol"].value_counts().to_dict()
-        recent_repeat_drops = pd.Series(repeat_counts).sort_values(ascending=False)
+    # Long-format alert table: one row per (symbol, alert_type)
+    if "alert_type" in info_df.columns:
+        alerts = info_df
     else:
-        repeat_counts = {}
-        recent_repeat_drops = pd.Series(dtype=int)
-
-    # Grouped structure: section → sector → list of alert tuples
-    sections_by_sector = defaultdict(lambda: defaultdict(list))
-    sector_totals = defaultdict(int)  # For pressure flag
-
-    for _, row in info_df.iterrows():
-        symbol = row["symbol"]
-        sector = row.get("sector", "Unknown")
-        link = f'<a href="https://finance.yahoo.com/quote/{symbol}" target="_blank" style="text-decoration:none;"><b>{symbol}</b></a>'
-
-        drop_from_52w_high = row.get("drop_from_52w_high")
-        # Count how many alert flags triggered
-        trigger_count = sum([
-            row.get("below_3m_low", False),
-            row.get("below_6m_low", False),
-            row.get("below_52w_low", False),
-            row.get("pct_drop_from_prev_close", 0) <= drop_threshold,
-            row.get("down_streak", 0) >= streak_min,
-            row.get("drop_from_52w_high") is not None and row["drop_from_52w_high"] <= -50
-            # row.get("below_200sma") is True
-        ])
-
-        
-        badge = ""
-        if trigger_count >= 2:
-            badge = f"<span style='background-color:#eee; border-radius:6px; padding:2px 6px; font-size:12px; color:#555;'>{trigger_count} alerts</span>"
-
-        if row.get("below_3m_low", False):
-            tag = badge
-            sections_by_sector["📉 Below 3M Low"][sector].append((link, tag))
-            sector_totals[sector] += 1
-        if row.get("below_6m_low", False):
-            tag = badge
-            sections_by_sector["💔 Below 6M Low"][sector].append((link, tag))
-            sector_totals[sector] += 1
-        if row.get("below_52w_low", False):
-            tag = badge
-            sections_by_sector["☢️ Below 52W Low"][sector].append((link, tag))
-            sector_totals[sector] += 1
-        if row.get("down_streak", 0) >= streak_min:
-            days = int(row["down_streak"])
-            tag = f"{days} days {badge}".strip()
-            sections_by_sector[f"🔻 {streak_min}+ Day Down Streak"][sector].append((link, tag))
-            sector_totals[sector] += 1
-        if row.get("pct_drop_from_prev_close", 0) <= drop_threshold:
-            pct = round(row["pct_drop_from_prev_close"], 2)
-            pct_str = f"<span style='color:red'>({pct:+.2f}%)</span>"
-            tag = f"{pct_str} {badge}".strip()
-            sections_by_sector[f"⚠️ Drop ≥5% from Prev Close"][sector].append((link, tag))
-            sector_totals[sector] += 1
-        if drop_from_52w_high is not None and drop_from_52w_high <= -50:
-            pct = round(drop_from_52w_high, 2)
-            tag = f"<span style='color:#b33'>({pct:+.2f}%)</span> {badge}".strip()
-            sections_by_sector["💀 Down ≥50% from 52W High"][sector].append((link, tag))
-            sector_totals[sector] += 1
-        # if row.get("below_200sma", False):
-        #     tag = f"{badge}".strip()
-        #     sections_by_sector["📉 Below 200-Day SMA"][sector].append((link, tag))
-        #     sector_totals[sector] += 1
-            
-
+        alerts = classify_alerts(info_df, drop_threshold=drop_threshold, streak_min=streak_min, rules=rules)
+    labels = section_labels(streak_min, drop_threshold, rules=rules)
+    sector_totals = alerts["sector"].value_counts(sort=False)  # For pressure flag
 
     # Summary block
-    summary_lines = []
-    total_alerts = 0
-    for section, sector_dict in sections_by_sector.items():
-        count = sum(len(stocks) for stocks in sector_dict.values())
-        total_alerts += count
-        summary_lines.append(f"<li><b>{section}</b>: {count} stocks</li>")
+    section_counts = alerts["alert_type"].value_counts()
+    total_alerts = len(alerts)
+    summary_lines = [
+        f"<li><b>{label}</b>: {section_counts[alert_type]} stocks</li>"
+        for alert_type, label in labels.items() if alert_type in section_counts
+    ]
 
     summary_html = (
         f"<p><b>{total_alerts} total alerts</b> triggered today:</p>"
@@ -155,16 +303,7 @@ def generate_html_email(info_df, drop_threshold=-5, streak_min=5, log_dir='.', d
     html_lines = [f"<h2>📊 Stock Alert Summary — {today_str}</h2>"]
 
     # Market overview
-    if market_overview and market_overview.get("SPY") is not None:
-        spy = market_overview["SPY"]
-        qqq = market_overview["QQQ"]
-        spy_color = "red" if spy < 0 else "green"
-        qqq_color = "red" if qqq < 0 else "green"
-
-        html_lines.append("<h3>📉 Market Overview</h3><ul>")
-        html_lines.append(f"<li>S&P 500 (SPY): <span style='color:{spy_color}'>{spy:+.2f}%</span></li>")
-        html_lines.append(f"<li>Nasdaq 100 (QQQ): <span style='color:{qqq_color}'>{qqq:+.2f}%</span></li>")
-        html_lines.append("</ul>")
+    html_lines.extend(render_market_overview(market_overview))
 
     # Weekly repeaters (for 5% drop only)
     repeat_drops_filtered = recent_repeat_drops[recent_repeat_drops >= 2]
@@ -174,49 +313,13 @@ def generate_html_email(info_df, drop_threshold=-5, streak_min=5, log_dir='.', d
             html_lines.append(f"<li>{symbol} ({count}x)</li>")
         html_lines.append("</ul>")
 
-    # Sector pressure
-    pressured_sectors = {s: c for s, c in sector_totals.items() if c >= 3}
-    if pressured_sectors:
-        html_lines.append("<h3>⚠️ Sectors Under Pressure (3+ alerts)</h3><ul>")
-        for sector, count in sorted(pressured_sectors.items(), key=lambda x: -x[1]):
-            html_lines.append(f"<li><b>{sector}</b>: {count} alerts</li>")
-        html_lines.append("</ul>")
+    # Sector pressure and the most oversold names, from the universe's cross-section
+    html_lines.extend(render_sector_pressure(market_overview, sector_totals))
 
     html_lines.append(summary_html)
 
-    # Section-by-sector breakdown (enforce custom order)
-    section_order = [
-        "📉 Below 3M Low",
-        "💔 Below 6M Low",
-        "☢️ Below 52W Low",
-        f"🔻 {streak_min}+ Day Down Streak",
-        "⚠️ Drop ≥5% from Prev Close",
-        "💀 Down ≥50% from 52W High"
-        # "📉 Below 200-Day SMA"
-    ]
-
-    for section in section_order:
-        if section not in sections_by_sector:
-            continue
-        sector_dict = sections_by_sector[section]
-        html_lines.append(f"<h3 style='margin-top:20px;'>{section}</h3>")
-        for sector in sorted(sector_dict.keys()):
-            html_lines.append(f"<h4 style='margin-bottom:5px;color:#555;'>{sector}</h4>")
-            html_lines.append("""
-            <table style="width:100%; border-collapse:collapse; font-size:14px; table-layout:fixed;">
-            <tr>
-                <th align="left" style="border-bottom:1px solid #ccc; padding:4px;">Symbol</th>
-                <th align="left" style="border-bottom:1px solid #ccc; padding:4px;">Details</th>
-            </tr>
-            """)
-            for symbol_link, details in sector_dict[sector]:
-                html_lines.append(f"""
-                <tr style="vertical-align: top;">
-                    <td style="padding:6px 4px; white-space:nowrap; font-family:Arial, sans-serif; font-size:14px; overflow:hidden; text-overflow:ellipsis;">{symbol_link}</td>
-                    <td style="padding:6px 4px; white-space:nowrap; font-family:Arial, sans-serif; font-size:14px; overflow:hidden; text-overflow:ellipsis;">{details}</td>
-                </tr>
-                """)
-            html_lines.append("</table>")
+    # Section-by-sector breakdown (report order, sectors alphabetical)
+    html_lines.extend(render_alert_sections(alerts, labels, rules))
 
     if total_alerts == 0:
         html_lines.append("<p>No alerts triggered today.</p>")
@@ -227,10 +330,21 @@ def generate_html_email(info_df, drop_threshold=-5, streak_min=5, log_dir='.', d
     return "\n".join(html_lines)
 
 
-def send_email(subject, body, sender, recipient, password, html=False):
+def build_message(subject, body, sender, recipient, html=False):
+    msg = MIMEText(body, "html" if html else "plain", _charset="utf-8")
+    msg["Subject"] = subject
+    msg["From"] = sender
+    msg["To"] = recipient
+    return msg
+
+
+def send_email(subject, body, sender, recipient, password, html=False, smtp_factory=None):
     """
     Sends an email via Gmail SMTP.
 
+    Opens a connection for this one message; to send to many recipients over shared
+    connections use `delivery.deliver`.
+
     Parameters:
         subject (str): Email subject line.
         body (str): Email message content (HTML or plain text).
@@ -238,20 +352,23 @@ def send_email(subject, body, sender, recipient, password, html=False):
         recipient (str): Recipient email address.
         password (str): App-specific password or Gmail login password.
         html (bool): If True, sends HTML; otherwise sends plain text.
+        smtp_factory (callable or None): Returns an SMTP connection for (host, port);
+                                         defaults to smtplib.SMTP_SSL.
 
     Side Effect:
         Sends an email and prints success/failure status.
     """
-    msg = MIMEText(body, "html" if html else "plain", _charset="utf-8")
-    msg["Subject"] = subject
-    msg["From"] = sender
-    msg["To"] = recipient
+    msg = build_message(subject, body, sender, recipient, html=html)
 
     try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
+        smtp_factory = smtp_factory or smtplib.SMTP_SSL
+        with smtp_factory("smtp.gmail.com", 465) as server:
             server.login(sender, password)
             server.send_message(msg)
         print("✅ Email sent successfully.")
+        instrument.incr("emails.sent")
     except Exception as e:
         print(f"❌ Failed to send email: {e}")
+        instrument.incr("emails.failed")
+        instrument.event("email_failed", recipient=recipient, error=str(e))
 
@@ -0,0 +1,150 @@
+# executor.py
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import instrument
+
+MAX_WORKERS = 8
+
+# Requests per second / burst size shared by everything that talks to Yahoo Finance
+YAHOO_RATE = 8.0
+YAHOO_BURST = 16
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket: allows `burst` immediate calls, refilled at `rate` tokens per second.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until a token is available, then consumes it.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name, rate, burst=1):
+    """
+    Returns the process-wide RateLimiter registered under `name`, creating it on first use.
+
+    Modules that hit the same service share one bucket, so their combined request rate
+    stays under the service's limit.
+    """
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = RateLimiter(rate, burst)
+        return _limiters[name]
+
+
+def yahoo_limiter():
+    return get_limiter("yahoo", YAHOO_RATE, YAHOO_BURST)
+
+
+def is_transient(exc):
+    """
+    Best-effort check for errors worth retrying: network failures, timeouts and throttling.
+    """
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    name = type(exc).__name__
+    if "RateLimit" in name or "Timeout" in name or "Connection" in name:
+        return True
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status in (429, 500, 502, 503, 504)
+
+
+def call_with_retry(func, *args, retries=3, base_delay=0.5, max_delay=8.0, limiter=None,
+                    retry_if=is_transient, name=None, **kwargs):
+    """
+    Calls `func(*args, **kwargs)`, retrying transient errors with jittered exponential backoff.
+
+    Parameters:
+        func (callable): Function to call.
+        retries (int): Retries after the first attempt (default: 3).
+        base_delay (float): Backoff for the first retry in seconds; doubles on every retry.
+        max_delay (float): Upper bound on a single backoff.
+        limiter (RateLimiter or None): Token bucket to acquire before every attempt.
+        retry_if (callable): Predicate deciding whether an exception is retryable.
+        name (str or None): If set, records "<name>.seconds" per call and "<name>.retries"
+                            in the run metrics (see instrument.py).
+
+    Returns:
+        tuple: (result, attempts)
+
+    Raises:
+        The last exception if it is not retryable or retries are exhausted.
+    """
+    attempt = 0
+    started = time.perf_counter()
+    try:
+        while True:
+            attempt += 1
+            if limiter is not None:
+                limiter.acquire()
+            try:
+                return func(*args, **kwargs), attempt
+            except Exception as e:
+                if attempt > retries or not retry_if(e):
+                    raise
+                delay = min(max_delay, base_delay * 2 ** (attempt - 1))
+                time.sleep(random.uniform(0, delay))  # "full jitter"
+    finally:
+        if name:
+            instrument.observe(f"{name}.seconds", time.perf_counter() - started)
+            if attempt > 1:
+                instrument.incr(f"{name}.retries", attempt - 1)
+
+
+def run_concurrent(func, items, workers=MAX_WORKERS, limiter=None, retries=3, base_delay=0.5,
+                   retry_if=is_transient, name=None):
+    """
+    Applies `func` to every item on a thread pool, with rate limiting and retries.
+
+    `name` labels the pool's threads (so profilers such as py-spy show where time goes)
+    and the per-item metrics recorded by `call_with_retry`.
+
+    Returns:
+        tuple: (results, errors)
+            results (dict): item -> return value, for items that succeeded.
+            errors (dict): item -> exception, for items that failed after all retries.
+    """
+    items = list(items)
+    results, errors = {}, {}
+    if not items:
+        return results, errors
+
+    def task(item):
+        return call_with_retry(func, item, retries=retries, base_delay=base_delay,
+                               limiter=limiter, retry_if=retry_if, name=name)[0]
+
+    pool_size = max(1, min(workers, len(items)))
+    with ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix=name or "worker") as pool:
+        futures = {item: pool.submit(task, item) for item in items}
+        for item, future in futures.items():
+            try:
+                results[item] = future.result()
+            except Exception as e:
+                errors[item] = e
+    return results, errors
@@ -0,0 +1,177 @@
+# fakes.py
+# Offline stand-ins for the services the notifier talks to (stockanalysis.com, Yahoo
+# Finance prices and metadata, Gmail SMTP), used by the benchmark harness and for
+# running the pipeline without network access.
+import smtplib
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from providers import FIELDS, PriceProvider, period_to_offset
+
+SECTORS = [
+    "Technology", "Healthcare", "Financial Services", "Consumer Cyclical", "Industrials",
+    "Communication Services", "Consumer Defensive", "Energy", "Utilities", "Real Estate",
+    "Basic Materials",
+]
+
+
+def synthetic_symbols(n):
+    return [f"S{i:05d}" for i in range(n)]
+
+
+def fake_universe(n):
+    """
+    Returns a callable with the same contract as `Scraper.main` producing `n` symbols.
+    """
+    def scrape():
+        return pd.DataFrame({"Symbol": synthetic_symbols(n)})
+    return scrape
+
+
+def synthetic_ohlc(tickers, end=None, days=260, seed=0, selloff=0.0):
+    """
+    Generates a reproducible wide OHLC panel (geometric random walks) for `tickers`.
+
+    Parameters:
+        tickers (list[str]): Column labels.
+        end (Timestamp or None): Last business date (default: today).
+        days (int): Number of business days.
+        seed (int): Base seed; each ticker set gets its own deterministic stream.
+        selloff (float): Fraction of tickers that drop 6-12% on the last day, to simulate
+                         a market-wide selloff with many alerts.
+
+    Returns:
+        pd.DataFrame: Dates x (field, ticker) panel in the `providers` layout.
+    """
+    tickers = list(tickers)
+    n = len(tickers)
+    dates = pd.bdate_range(end=end or pd.Timestamp.today().normalize(), periods=days, name="Date")
+    rng = np.random.default_rng([seed, zlib.crc32(",".join(tickers).encode())])
+
+    returns = rng.normal(0.0003, 0.02, size=(days, n))
+    if selloff:
+        hit = rng.random(n) < selloff
+        returns[-1, hit] = rng.uniform(-0.12, -0.06, size=hit.sum())
+    close = 20 + 180 * rng.random(n) * np.exp(np.cumsum(returns, axis=0))
+    open_ = close * (1 + rng.normal(0, 0.01, size=(days, n)))
+    spread = np.abs(rng.normal(0, 0.01, size=(days, n)))
+    high = np.maximum(open_, close) * (1 + spread)
+    low = np.minimum(open_, close) * (1 - spread)
+
+    fields = {"Open": open_, "High": high, "Low": low, "Close": close}
+    columns = pd.MultiIndex.from_product([FIELDS, tickers], names=["Price", "Ticker"])
+    return pd.DataFrame(np.hstack([fields[f] for f in FIELDS]), index=dates, columns=columns)
+
+
+class SyntheticProvider(PriceProvider):
+    """
+    Price provider serving `synthetic_ohlc` data, with optional per-chunk latency.
+    """
+
+    def __init__(self, chunk_size=100, latency=0.0, workers=1, seed=0, selloff=0.0, days=260, end=None):
+        self.chunk_size = chunk_size
+        self.latency = latency
+        self.workers = workers
+        self.seed = seed
+        self.selloff = selloff
+        self.days = days
+        self.end = end
+
+    def fetch_chunk(self, tickers, period="1y", interval="1d", start=None):
+        if self.latency:
+            time.sleep(self.latency)
+        panel = synthetic_ohlc(tickers, end=self.end, days=self.days, seed=self.seed, selloff=self.selloff)
+        if start is not None:
+            return panel[panel.index >= pd.Timestamp(start)]
+        offset = period_to_offset(period)
+        if offset is not None and offset != "ytd":
+            panel = panel[panel.index >= panel.index[-1] - offset]
+        return panel
+
+
+def fake_sector_lookup(latency=0.0):
+    """
+    Returns a stand-in for `sectors._lookup_sector` that assigns sectors deterministically.
+    """
+    def lookup(symbol):
+        if latency:
+            time.sleep(latency)
+        sector = SECTORS[zlib.crc32(symbol.encode()) % len(SECTORS)]
+        return {"sector": sector, "industry": f"{sector} - General"}
+    return lookup
+
+
+def fake_subscribers(n, symbols, watchlist_size=50, seed=0):
+    """
+    Returns `n` subscribers in the `delivery.load_subscribers` format. The first gets
+    every alert; the rest watch a random sample of `symbols` with varied thresholds.
+    """
+    rng = np.random.default_rng(seed)
+    subscribers = [{"email": "subscriber0@example.com"}]
+    for i in range(1, n):
+        size = min(watchlist_size, len(symbols))
+        subscribers.append({
+            "email": f"subscriber{i}@example.com",
+            "watchlist": [str(s) for s in rng.choice(symbols, size=size, replace=False)],
+            "drop_threshold": int(rng.choice([-3, -5, -7])),
+            "streak_min": int(rng.choice([5, 6, 7])),
+        })
+    return subscribers
+
+
+class FakeSMTP:
+    """
+    In-memory stand-in for smtplib.SMTP / SMTP_SSL that records every message it is given.
+
+    Class-level `sent` collects (from, to, message) across instances; `fail_times` makes
+    the next N send_message calls raise smtplib.SMTPServerDisconnected.
+    """
+
+    sent = []
+    logins = 0
+    connections = 0
+    fail_times = 0
+
+    def __init__(self, host="localhost", port=0, latency=0.0, **kwargs):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.closed = False
+        FakeSMTP.connections += 1
+
+    @classmethod
+    def reset(cls):
+        cls.sent = []
+        cls.logins = 0
+        cls.connections = 0
+        cls.fail_times = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.quit()
+        return False
+
+    def login(self, user, password):
+        FakeSMTP.logins += 1
+
+    def noop(self):
+        if self.closed:
+            raise smtplib.SMTPServerDisconnected("connection closed")
+        return 250, b"OK"
+
+    def send_message(self, msg, from_addr=None, to_addrs=None):
+        if self.latency:
+            time.sleep(self.latency)
+        if FakeSMTP.fail_times > 0:
+            FakeSMTP.fail_times -= 1
+            raise smtplib.SMTPServerDisconnected("simulated disconnect")
+        FakeSMTP.sent.append((from_addr or msg["From"], to_addrs or msg["To"], msg))
+        return {}
+
+    def quit(self):
+        self.closed = True
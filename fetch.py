@@ -1,77 +1,83 @@
 # fetch.py
-import yfinance as yf
-import pandas as pd
-
-def get_price_data(tickers, period="1y", interval="1d") -> pd.DataFrame:
-    """
-    Fetch historical price data and compute alert metrics for each ticker.
-    """
-    info = []
-    EPS = 1e-9 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-    for ticker in tickers:
-        try:
-            symbol = yf.Ticker(ticker)
-            hist = symbol.history(period=period, interval=interval).dropna().sort_index()
+import pandas as pd
+from providers import YahooProvider
+from cache import CachedProvider
+from metrics import METRIC_COLUMNS, metrics_from_panel
+from panel import PricePanel
+import instrument
 
-            if hist.empty or len(hist) < 2:
-                print(f"{ticker}: no data")
-                continue
+def _fetch_batch(batch, period, interval, provider):
+    panel, failures = provider.download(batch, period=period, interval=interval)
+    # Counted here, on the outermost provider's result, so a wrapper's internal requests
+    # (e.g. CachedProvider refreshes) are not counted again
+    instrument.incr("fetch.requested_tickers", len(batch))
+    instrument.incr("fetch.failed_tickers", len(failures))
+    for ticker, reason in failures.items():
+        print(f"{ticker}: {reason}")
+        instrument.event("fetch_failed", ticker=ticker, reason=reason)
 
-            last_date = hist.index[-1]
-            today_row = hist.iloc[-1]
-            latest_price = float(today_row["Close"])
+    with instrument.timed("compute.seconds"):
+        # Pack into the compact float32 layout and let the downloaded frame go
+        panel = PricePanel.from_frame(panel, batch)
+        info, skipped = metrics_from_panel(panel)
+    for ticker in skipped:
+        if ticker not in failures:
+            print(f"{ticker}: no data")
+            instrument.event("fetch_failed", ticker=ticker, reason="fewer than 2 complete bars")
+    instrument.incr("rows", len(info))
+    return info
 
-            # Prior windows (exclude today)
-            prior = hist.iloc[:-1]
-            w3  = prior[prior.index >= last_date - pd.Timedelta(days=90)]
-            w6  = prior[prior.index >= last_date - pd.Timedelta(days=180)]
-            w52 = prior[prior.index >= last_date - pd.Timedelta(days=365)]
+def iter_price_data(tickers, period="1y", interval="1d", provider=None, batch_size=None, prefetch=None,
+                    with_batches=False):
+    """
+    Streams alert metrics batch by batch instead of building one panel for the whole universe.
 
-            # Prior lows/highs (None-safe)
-            prev_3m_low  = float(w3["Low"].min())  if not w3.empty  else None
-            prev_6m_low  = float(w6["Low"].min())  if not w6.empty  else None
-            prev_52w_low = float(w52["Low"].min()) if not w52.empty else None
+    Up to `prefetch` batches are downloaded and computed ahead on worker threads while the
+    caller consumes earlier ones, so only those in-flight batches' price panels are ever
+    held in memory. Batches are yielded in input order.
 
-            # 52w high can include today (for % drop display)
-            high_52w = float(hist["High"].max())
-            prev_3m_high = float(w3["High"].max()) if not w3.empty else None
-            prev_6m_high = float(w6["High"].max()) if not w6.empty else None
+    Parameters:
+        tickers (list[str]): Symbols to scan.
+        provider (PriceProvider or None): Defaults to CachedProvider(YahooProvider()).
+        batch_size (int or None): Tickers per batch (default: the provider's chunk size).
+        prefetch (int or None): Batches in flight (default: the provider's worker count).
+        with_batches (bool): Yield (batch tickers, metrics) pairs, e.g. to checkpoint progress.
 
-            # Day-over-day and intraday moves
-            yesterday_close = float(hist["Close"].iloc[-2])
-            pct_drop_from_prev_close  = (latest_price / yesterday_close - 1) * 100
-            pct_drop_from_open_to_close = (latest_price / float(today_row["Open"]) - 1) * 100
+    Yields:
+        pd.DataFrame: Metrics rows (see `get_price_data`) for one batch.
+    """
+    provider = provider or CachedProvider(YahooProvider())
+    tickers = list(dict.fromkeys(tickers))
+    batch_size = batch_size or provider.chunk_size
+    prefetch = max(1, prefetch or getattr(provider, "workers", 1))
+    batches = [tickers[i:i + batch_size] for i in range(0, len(tickers), batch_size)]
 
-            # Down-streak
-            tmp = hist.copy()
-            tmp["down"] = tmp["Close"] < tmp["Close"].shift(1)
-            tmp["streak"] = tmp["down"].astype(int).groupby((~tmp["down"]).cumsum()).cumsum()
-            latest_streak = int(tmp["streak"].iloc[-1]) if tmp["down"].iloc[-1] else 0
+    with ThreadPoolExecutor(max_workers=prefetch, thread_name_prefix="fetch-batch") as pool:
+        def result():
+            batch, future = pending.popleft()
+            return (batch, future.result()) if with_batches else future.result()
 
-            info.append({
-                "symbol": ticker,
-                "latest_price": latest_price,
-                "3m_high": prev_3m_high,
-                "3m_low":  prev_3m_low,
-                "6m_high": prev_6m_high,
-                "6m_low":  prev_6m_low,
-                "52w_high": high_52w,
-                "52w_low":  prev_52w_low,
-                "pct_drop_from_prev_close": pct_drop_from_prev_close,
-                "pct_drop_from_open_to_close": pct_drop_from_open_to_close,
-                "below_3m_low":  (prev_3m_low  is not None) and (latest_price <= prev_3m_low  + EPS),
-                "below_6m_low":  (prev_6m_low  is not None) and (latest_price <= prev_6m_low  + EPS),
-                "below_52w_low": (prev_52w_low is not None) and (latest_price <= prev_52w_low + EPS),
-                "below_5%_prev_close": pct_drop_from_prev_close <= -5,
-                "below_5%_open_to_close": pct_drop_from_open_to_close <= -5,
-                "down_streak": latest_streak if latest_streak >= 5 else None,
-                "drop_from_52w_high": (100.0 * (latest_price - high_52w) / high_52w) if high_52w > 0 else None
-            })
+        pending = deque()
+        for batch in batches:
+            pending.append((batch, pool.submit(_fetch_batch, batch, period, interval, provider)))
+            if len(pending) >= prefetch:
+                yield result()
+        while pending:
+            yield result()
 
-        except Exception as e:
-            print(f"{ticker} error: {e}")
-        
-    
-    return pd.DataFrame(info)
+def get_price_data(tickers, period="1y", interval="1d", provider=None) -> pd.DataFrame:
+    """
+    Fetch historical price data and compute alert metrics for each ticker.
 
+    Prices come from `provider` (by default batched Yahoo requests behind the local
+    OHLC cache, so a daily run only downloads the bars added since the last run) and the
+    alert metrics are computed for a whole batch at once by `metrics.compute_alert_metrics`.
+    Tickers the provider could not serve are reported and skipped.
+    """
+    parts = [info for info in iter_price_data(tickers, period=period, interval=interval, provider=provider) if not info.empty]
+    if not parts:
+        return pd.DataFrame(columns=METRIC_COLUMNS)
+    return pd.concat(parts, ignore_index=True)
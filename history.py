@@ -0,0 +1,198 @@
+# history.py
+import glob
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+from pandas.tseries.offsets import BDay
+
+import instrument
+
+DB_NAME = "alert_history.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    date       TEXT NOT NULL,
+    symbol     TEXT NOT NULL,
+    alert_type TEXT NOT NULL,
+    sector     TEXT,
+    PRIMARY KEY (date, symbol, alert_type)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_alerts_symbol ON alerts (symbol, date);
+CREATE INDEX IF NOT EXISTS idx_alerts_type   ON alerts (alert_type, date);
+CREATE INDEX IF NOT EXISTS idx_alerts_sector ON alerts (sector, date);
+"""
+
+
+def recent_business_window(days_back, today=None):
+    """
+    Returns (start, end) dates covering the last `days_back` business days up to `today`.
+
+    On a weekday today counts as one of the days; on a weekend the window is the
+    `days_back` business days before it.
+    """
+    today = pd.Timestamp(today or datetime.today()).normalize()
+    if today.weekday() < 5:
+        start = today - BDay(days_back - 1)
+    else:
+        start = today - BDay(days_back)
+    return start.date(), today.date()
+
+
+class AlertHistory:
+    """
+    Append-only store of triggered alerts in SQLite, indexed by date, symbol, alert type
+    and sector.
+
+    One row per (date, symbol, alert_type); re-logging the same day is a no-op apart from
+    filling in a sector that was previously unknown.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.executescript(SCHEMA)
+
+    @classmethod
+    def in_dir(cls, log_dir):
+        return cls(Path(log_dir) / DB_NAME)
+
+    def close(self):
+        self.conn.close()
+
+    def append(self, rows):
+        """
+        Records alerts.
+
+        Parameters:
+            rows (pd.DataFrame): Columns symbol, date (YYYY-MM-DD), alert_type and optionally sector.
+
+        Returns:
+            int: Number of rows written or updated.
+        """
+        if rows.empty:
+            return 0
+        if "sector" not in rows.columns:
+            rows = rows.assign(sector=None)
+        records = rows[["date", "symbol", "alert_type", "sector"]].astype(object)
+        records = records.where(records.notna(), None)
+        with self.conn:
+            cursor = self.conn.executemany(
+                """
+                INSERT INTO alerts (date, symbol, alert_type, sector) VALUES (?, ?, ?, ?)
+                ON CONFLICT (date, symbol, alert_type)
+                DO UPDATE SET sector = COALESCE(alerts.sector, excluded.sector)
+                """,
+                records.itertuples(index=False, name=None),
+            )
+        instrument.incr("history.rows_written", cursor.rowcount)
+        return cursor.rowcount
+
+    def query(self, start=None, end=None, symbols=None, alert_types=None, sectors=None):
+        """
+        Returns the alerts in the inclusive [start, end] date range, optionally filtered.
+
+        Returns:
+            pd.DataFrame: Columns date, symbol, alert_type, sector, ordered by date and symbol.
+        """
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("date >= ?")
+            params.append(str(pd.Timestamp(start).date()))
+        if end is not None:
+            clauses.append("date <= ?")
+            params.append(str(pd.Timestamp(end).date()))
+        for column, values in (("symbol", symbols), ("alert_type", alert_types), ("sector", sectors)):
+            if values is not None:
+                values = [values] if isinstance(values, str) else list(values)
+                clauses.append(f"{column} IN ({','.join('?' * len(values))})")
+                params.extend(values)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return pd.read_sql_query(
+            f"SELECT date, symbol, alert_type, sector FROM alerts {where} ORDER BY date, symbol",
+            self.conn, params=params,
+        )
+
+    def repeat_counts(self, alert_type="pct_drop_5plus", days_back=7, today=None):
+        """
+        Counts how often each symbol triggered `alert_type` on weekdays in the last
+        `days_back` business days.
+
+        Returns:
+            pd.Series: symbol -> count, most frequent first.
+        """
+        start, end = recent_business_window(days_back, today)
+        rows = self.conn.execute(
+            """
+            SELECT symbol, COUNT(*) AS n FROM alerts
+            WHERE alert_type = ? AND date BETWEEN ? AND ?
+              AND CAST(strftime('%w', date) AS INTEGER) BETWEEN 1 AND 5
+            GROUP BY symbol ORDER BY n DESC, symbol
+            """,
+            (alert_type, str(start), str(end)),
+        ).fetchall()
+        return pd.Series(dict(rows), dtype=int, name="count")
+
+    def symbol_history(self, symbol, start=None, end=None):
+        """
+        Returns every alert recorded for `symbol`, oldest first.
+        """
+        return self.query(start=start, end=end, symbols=[symbol])
+
+    def sector_trends(self, start=None, end=None, alert_types=None):
+        """
+        Returns alert counts per day and sector as a (date x sector) frame.
+        """
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("date >= ?")
+            params.append(str(pd.Timestamp(start).date()))
+        if end is not None:
+            clauses.append("date <= ?")
+            params.append(str(pd.Timestamp(end).date()))
+        if alert_types is not None:
+            clauses.append(f"alert_type IN ({','.join('?' * len(alert_types))})")
+            params.extend(alert_types)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        counts = pd.read_sql_query(
+            f"""
+            SELECT date, COALESCE(sector, 'Unknown') AS sector, COUNT(*) AS n
+            FROM alerts {where} GROUP BY date, sector
+            """,
+            self.conn, params=params,
+        )
+        return counts.pivot(index="date", columns="sector", values="n").fillna(0).astype(int)
+
+
+def import_csv_logs(log_dir, history=None):
+    """
+    One-shot import of existing trigger_log_<YYYY-MM-DD>.csv files into the alert history.
+
+    Safe to run more than once: rows that are already stored are skipped.
+
+    Returns:
+        int: Number of CSV rows read.
+    """
+    history = history or AlertHistory.in_dir(log_dir)
+    total = 0
+    for file in sorted(glob.glob(os.path.join(log_dir, "trigger_log_*.csv"))):
+        df = pd.read_csv(file)
+        if df.empty:
+            continue
+        if "date" not in df.columns:
+            df["date"] = os.path.basename(file).split("_")[-1].replace(".csv", "")
+        history.append(df)
+        total += len(df)
+    return total
+
+
+if __name__ == "__main__":
+    import sys
+
+    directory = sys.argv[1] if len(sys.argv) > 1 else "."
+    print(f"Imported {import_csv_logs(directory)} rows from {directory}")
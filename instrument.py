@@ -0,0 +1,161 @@
+# instrument.py
+import cProfile
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+
+class RunMetrics:
+    """
+    Thread-safe collector for one run: stage timings, counters, observed values
+    (e.g. per-request latency) and notable events such as per-ticker failures.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = datetime.now()
+            self.stages = {}
+            self.counters = {}
+            self.observations = {}
+            self.events = []
+
+    def add_stage(self, name, seconds, ok=True):
+        with self.lock:
+            entry = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0, "ok": True})
+            entry["seconds"] += seconds
+            entry["calls"] += 1
+            entry["ok"] = entry["ok"] and ok
+
+    def incr(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, value):
+        with self.lock:
+            self.observations.setdefault(name, []).append(value)
+
+    def event(self, kind, **fields):
+        with self.lock:
+            self.events.append({"time": datetime.now().isoformat(timespec="seconds"), "kind": kind, **fields})
+
+    def report(self):
+        """
+        Returns the run as a JSON-serializable dict.
+        """
+        with self.lock:
+            stages = {k: dict(v, seconds=round(v["seconds"], 4)) for k, v in self.stages.items()}
+            counters = dict(self.counters)
+            observations = {k: _summarize(v) for k, v in self.observations.items()}
+            events = list(self.events)
+
+        for prefix in {name.rsplit(".", 1)[0] for name in counters if name.endswith((".hits", ".misses"))}:
+            hits, misses = counters.get(f"{prefix}.hits", 0), counters.get(f"{prefix}.misses", 0)
+            if hits + misses:
+                counters[f"{prefix}.hit_ratio"] = round(hits / (hits + misses), 4)
+
+        return {
+            "started": self.started.isoformat(timespec="seconds"),
+            "finished": datetime.now().isoformat(timespec="seconds"),
+            "stages": stages,
+            "counters": counters,
+            "observations": observations,
+            "events": events,
+        }
+
+
+def _summarize(values):
+    values = sorted(values)
+    n = len(values)
+
+    def pct(p):
+        return values[min(n - 1, max(0, math.ceil(p * n) - 1))]
+
+    return {
+        "count": n,
+        "mean": round(sum(values) / n, 6),
+        "p50": round(pct(0.5), 6),
+        "p95": round(pct(0.95), 6),
+        "max": round(values[-1], 6),
+    }
+
+
+# Process-wide collector used by every module
+RUN = RunMetrics()
+
+
+def incr(name, n=1):
+    RUN.incr(name, n)
+
+
+def observe(name, value):
+    RUN.observe(name, value)
+
+
+def event(kind, **fields):
+    RUN.event(kind, **fields)
+
+
+@contextmanager
+def stage(name):
+    """
+    Times a pipeline stage; a stage that raises is recorded with ok=False.
+    """
+    started = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        RUN.add_stage(name, time.perf_counter() - started, ok=ok)
+
+
+@contextmanager
+def timed(name):
+    """
+    Records the duration of the enclosed block as an observation under `name`.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        RUN.observe(name, time.perf_counter() - started)
+
+
+def write_report(path):
+    """
+    Writes the current run report as JSON and returns the path.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(RUN.report(), indent=2, default=str))
+    return path
+
+
+@contextmanager
+def profiled(path=None):
+    """
+    Runs the enclosed block under cProfile and dumps the stats to `path` (no-op when None).
+
+    The .prof file can be opened with snakeviz or `python -m pstats`. For sampling with
+    py-spy instead, run `py-spy record -o profile.svg -- python run_notifier.py`; worker
+    threads are named after their pool so the flame graph stays readable.
+    """
+    if path is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(path)
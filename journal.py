@@ -0,0 +1,132 @@
+# journal.py
+# Crash-safe checkpoints for the daily run. Each trading day gets a directory holding
+# the output of every completed stage, the alert rows of every scanned batch and the
+# recipients already emailed, so a rerun after a crash resumes where the last one stopped
+# and never logs or emails twice for the same day.
+import json
+import os
+import pickle
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+from pandas.tseries.offsets import BDay
+
+import instrument
+
+STATE_FILE = "journal.json"
+
+# Journals of older trading days are removed when a new one is opened
+KEEP_DAYS = 7
+
+
+def trading_day(today=None):
+    """
+    Returns the trading day (YYYY-MM-DD) a run belongs to: today on a weekday, otherwise
+    the Friday before.
+    """
+    today = pd.Timestamp(today or datetime.today()).normalize()
+    return BDay().rollback(today).strftime("%Y-%m-%d")
+
+
+def _write_atomic(path, data):
+    # Write a sibling file and rename it over the target, so a crash mid-write leaves the old copy
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class RunJournal:
+    """
+    Checkpoints of one trading day's run, in <root>/<YYYY-MM-DD>/.
+
+    Stage outputs are pickled under their stage name (`save` / `load`), scan progress is
+    one file per fetched batch (`record_batch`), and sent recipients are kept in
+    journal.json (`mark_sent`). Every file is replaced atomically, so whatever is on disk
+    after a crash is a complete checkpoint.
+    """
+
+    def __init__(self, root, day=None, fresh=False):
+        self.day = day or trading_day()
+        self.root = Path(root)
+        self.dir = self.root / self.day
+        if fresh and self.dir.exists():
+            shutil.rmtree(self.dir)
+        (self.dir / "batches").mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+
+        state_path = self.dir / STATE_FILE
+        self.state = json.loads(state_path.read_text()) if state_path.exists() else {"stages": [], "sent": []}
+        self._batches = len(list((self.dir / "batches").glob("*.pkl")))
+        self._prune()
+
+    def _prune(self):
+        days = sorted(p for p in self.root.iterdir() if p.is_dir() and p.name != self.day)
+        for old in days[:max(0, len(days) - KEEP_DAYS + 1)]:
+            shutil.rmtree(old, ignore_errors=True)
+
+    def _write_state(self):
+        _write_atomic(self.dir / STATE_FILE, json.dumps(self.state, indent=2).encode())
+
+    # Stage checkpoints
+
+    def done(self, stage):
+        return stage in self.state["stages"]
+
+    def save(self, stage, value=None):
+        """
+        Stores a stage's output and marks the stage complete.
+        """
+        with self.lock:
+            if value is not None:
+                _write_atomic(self.dir / f"{stage}.pkl", pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+            if stage not in self.state["stages"]:
+                self.state["stages"].append(stage)
+            self._write_state()
+        instrument.event("checkpoint", stage=stage, day=self.day)
+
+    def load(self, stage):
+        """
+        Returns the output saved for a completed stage, or None.
+        """
+        path = self.dir / f"{stage}.pkl"
+        if not self.done(stage) or not path.exists():
+            return None
+        return pickle.loads(path.read_bytes())
+
+    # Scan progress
+
+    def record_batch(self, tickers, alerts, rows, market=None):
+        """
+        Checkpoints one scanned batch: the tickers that produced metrics (the rest are
+        scanned again on a resume), its alert rows, how many of its universe tickers had
+        metrics and its share of the market context.
+        """
+        with self.lock:
+            path = self.dir / "batches" / f"{self._batches:06d}.pkl"
+            self._batches += 1
+            record = {"tickers": list(tickers), "alerts": alerts, "rows": rows, "market": market}
+            _write_atomic(path, pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def batches(self):
+        """
+        Returns the checkpointed batches, in the order they were recorded.
+        """
+        return [pickle.loads(p.read_bytes()) for p in sorted((self.dir / "batches").glob("*.pkl"))]
+
+    # Delivery
+
+    @property
+    def sent(self):
+        return set(self.state["sent"])
+
+    def mark_sent(self, recipient):
+        with self.lock:
+            if recipient not in self.state["sent"]:
+                self.state["sent"].append(recipient)
+                self._write_state()
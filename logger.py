@@ -1,35 +1,42 @@
-import pandas as pd
 from datetime import datetime
 from pathlib import Path
+from alerts import classify_alerts
+from history import AlertHistory
+from rules import default_ruleset
 
+LOG_DIR = Path(r"C:\Users\Nancy Lonoff\OneDrive\Desktop\Misc\Stock Notifier\log_files")
 
-
-def log_alerts(df, log_dir = None):
+def log_alerts(df, log_dir = None, history = None, rules = None, date = None):
     """
-    Logs triggered alerts from the stock DataFrame to a dated CSV file.
+    Logs triggered alerts from the stock DataFrame to a dated CSV file and the alert history.
 
     Parameters:
-        df (pd.DataFrame): DataFrame containing stock alert flags and symbol column.
+        df (pd.DataFrame): DataFrame containing stock alert flags and symbol column
+                           (and optionally a sector column, which is stored with each alert),
+                           or the long table from `alerts.classify_alerts`.
         log_dir (str): Directory where logs should be saved. Default is 'log_files'.
+        history (AlertHistory or None): Store to append to. Default is alert_history.db in log_dir.
+        rules (RuleSet or None): Only rules marked `logged` are written (default: `rules.default_ruleset()`).
+        date (str or None): Trading day (YYYY-MM-DD) the alerts belong to. Default is today.
 
     Output:
         Writes a CSV log of triggered alert types to log_files/trigger_log_<YYYY-MM-DD>.csv
+        and appends the same rows to the indexed alert history. Logging the same day again
+        replaces the CSV and leaves the history unchanged, so a rerun never duplicates rows.
     """
-    today_str = datetime.today().strftime("%Y-%m-%d")
-    LOG_DIR = Path(r"C:\Users\Nancy Lonoff\OneDrive\Desktop\Misc\Stock Notifier\log_files")
-    LOG_DIR.mkdir(parents=True, exist_ok=True)  # create if missing
+    today_str = date or datetime.today().strftime("%Y-%m-%d")
+    LOG_DIR_PATH = Path(log_dir) if log_dir else LOG_DIR
+    LOG_DIR_PATH.mkdir(parents=True, exist_ok=True)  # create if missing
     
-    log_file = LOG_DIR / f"trigger_log_{today_str}.csv"
-
-    log_rows = []
-    for _,row in df.iterrows():
-        symbol = row["symbol"]
-
-        if row.get("below_3m_low"): log_rows.append((symbol, today_str, "below_3m_low"))
-        if row.get("below_6m_low"): log_rows.append((symbol, today_str, "below_6m_low"))
-        if row.get("below_52w_low"): log_rows.append((symbol, today_str, "below_52w_low"))
-        if row.get("down_streak", 0) >= 5: log_rows.append((symbol, today_str, "down_streak_5plus"))
-        if row.get("pct_drop_from_prev_close", 0) <= -5: log_rows.append((symbol, today_str, "pct_drop_5plus"))
-
-
-    pd.DataFrame(log_rows, columns = ["symbol", "date", "alert_type"]).to_csv(log_file, index = False)
+    log_file = LOG_DIR_PATH / f"trigger_log_{today_str}.csv"
+
+    rules = rules or default_ruleset()
+    alerts = df if "alert_type" in df.columns else classify_alerts(df, rules=rules)
+    alerts = alerts[alerts["alert_type"].isin(rules.logged_names)]
+    log_df = alerts.assign(date=today_str)[["symbol", "date", "alert_type", "sector"]]
+    if "sector" not in df.columns:
+        log_df = log_df.assign(sector=None)  # unknown until a sector-tagged run logs the same alert
+    log_df[["symbol", "date", "alert_type"]].to_csv(log_file, index = False)
+
+    history = history or AlertHistory.in_dir(LOG_DIR_PATH)
+    history.append(log_df)
@@ -1,33 +1,220 @@
-import yfinance as yf
+# market.py
+# Market context for the report: benchmark indices, the SPDR sector ETFs and breadth
+# across the scanned universe. The context symbols ride along in the scan's batched
+# price requests (see `pipeline.run_scan`), so the context costs no extra round trips.
+import numpy as np
+import pandas as pd
 
-def get_market_overview():
+import instrument
+from analytics import compact
+from metrics import EPS
+
+# Benchmark symbol -> display name, in report order
+BENCHMARKS = {
+    "SPY": "S&P 500",
+    "QQQ": "Nasdaq 100",
+    "DIA": "Dow 30",
+    "IWM": "Russell 2000",
+}
+
+# yfinance sector name -> Select Sector SPDR ETF
+SECTOR_ETFS = {
+    "Technology": "XLK",
+    "Healthcare": "XLV",
+    "Financial Services": "XLF",
+    "Consumer Cyclical": "XLY",
+    "Industrials": "XLI",
+    "Communication Services": "XLC",
+    "Consumer Defensive": "XLP",
+    "Energy": "XLE",
+    "Utilities": "XLU",
+    "Real Estate": "XLRE",
+    "Basic Materials": "XLB",
+}
+
+BREADTH_COUNTS = ["symbols", "advancers", "decliners", "unchanged", "down_5plus", "new_52w_lows",
+                  "above_sma_200", "with_sma_200"]
+
+
+def context_symbols(benchmarks=None):
+    """
+    Returns the benchmark and sector ETF symbols to fetch alongside the universe.
+    """
+    return list(dict.fromkeys(list(benchmarks or BENCHMARKS) + list(SECTOR_ETFS.values())))
+
+
+def breadth_counts(info):
     """
-    Retrieves the 1-day percent change in SPY and QQQ from Yahoo Finance.
+    Counts advancers, decliners, new lows etc. in one batch of metrics rows. Counts of
+    several batches add up, so breadth is accumulated while the universe streams past.
 
     Returns:
-        dict: {
-            "SPY": float or None,
-            "QQQ": float or None
+        dict: name (see BREADTH_COUNTS) -> int
+    """
+    change = pd.to_numeric(info["pct_drop_from_prev_close"], errors="coerce").to_numpy(dtype=float)
+    price = pd.to_numeric(info["latest_price"], errors="coerce").to_numpy(dtype=float)
+    low = pd.to_numeric(info["52w_low"], errors="coerce").to_numpy(dtype=float)
+    sma = pd.to_numeric(info["sma_200"], errors="coerce").to_numpy(dtype=float)
+    with np.errstate(invalid="ignore"):
+        return {
+            "symbols": len(info),
+            "advancers": int((change > 0).sum()),
+            "decliners": int((change < 0).sum()),
+            "unchanged": int((change == 0).sum()),
+            "down_5plus": int((change <= -5).sum()),
+            "new_52w_lows": int((price <= low + EPS).sum()),
+            "above_sma_200": int((price > sma).sum()),
+            "with_sma_200": int((~np.isnan(sma)).sum()),
         }
 
-        If data is unavailable or fails, returns None for each index.
+
+def split_context(info, symbols, extra=()):
     """
-    try:
-        spy = yf.Ticker("SPY").history(period = "2d")["Close"]
-        qqq = yf.Ticker("QQQ").history(period = "2d")["Close"]
+    Separates the market context rows from one batch of metrics rows. Breadth counts
+    and the cross-section slice (`analytics.compact`) are taken from the universe rows.
 
+    Parameters:
+        info (pd.DataFrame): Metrics rows of a batch.
+        symbols (list[str]): Context symbols (see `context_symbols`).
+        extra (list[str]): Context symbols that are not part of the scanned universe;
+                           their rows are dropped from the universe rows.
 
-        if len(spy) < 2 or len(qqq) < 2:
-            return {"SPY": None, "QQQ": None}
+    Returns:
+        tuple: (universe rows, (context rows, `breadth_counts`, cross-section slice))
+    """
+    context_rows = info[info["symbol"].isin(symbols)]
+    if len(extra):
+        info = info[~info["symbol"].isin(extra)]
+    return info, (context_rows, breadth_counts(info), compact(info))
 
-        spy_change = ((spy.iloc[-1] / spy.iloc[-2]) - 1) * 100
-        qqq_change = ((qqq.iloc[-1] / qqq.iloc[-2]) - 1) * 100
 
-        return {
-            "SPY": round(spy_change, 2), 
-            "QQQ": round(qqq_change, 2)
+def add_breadth(total, counts):
+    return {name: total.get(name, 0) + counts.get(name, 0) for name in BREADTH_COUNTS}
+
+
+def breadth_stats(counts):
+    """
+    Turns accumulated `breadth_counts` into the report figures.
+    """
+    counts = add_breadth({}, counts)
+    n = counts["symbols"]
+
+    def pct(part, whole):
+        return round(100 * part / whole, 1) if whole else None
+
+    return {
+        **counts,
+        "pct_down": pct(counts["decliners"], n),
+        "pct_down_5plus": pct(counts["down_5plus"], n),
+        "pct_new_52w_lows": pct(counts["new_52w_lows"], n),
+        "pct_above_sma_200": pct(counts["above_sma_200"], counts["with_sma_200"]),
+        "adv_decl_ratio": round(counts["advancers"] / counts["decliners"], 2) if counts["decliners"] else None,
+    }
+
+
+class MarketContext:
+    """
+    Benchmark and sector ETF 1-day % changes plus universe breadth.
+
+    Indexing by benchmark symbol (`context["SPY"]`, `context.get("QQQ")`) works like the
+    {"SPY": ..., "QQQ": ...} dict `get_market_overview` returns, and a plain dict of that
+    shape can be wrapped with `MarketContext.coerce`. `cross_section` holds the
+    `analytics.CrossSection` of the universe when the scan computed one.
+    """
+
+    def __init__(self, benchmarks=None, sectors=None, breadth=None, cross_section=None):
+        self.benchmarks = dict(benchmarks or {})
+        self.sectors = dict(sectors or {})
+        self.breadth = breadth
+        self.cross_section = cross_section
+
+    @classmethod
+    def coerce(cls, overview):
+        if overview is None or isinstance(overview, cls):
+            return overview
+        return cls(benchmarks=overview)
+
+    def __getitem__(self, symbol):
+        return self.benchmarks[symbol]
+
+    def get(self, symbol, default=None):
+        return self.benchmarks.get(symbol, default)
+
+    def sector_change(self, sector):
+        return self.sectors.get(sector)
+
+    def to_dict(self):
+        return {"benchmarks": self.benchmarks, "sectors": self.sectors, "breadth": self.breadth}
+
+    def __repr__(self):
+        return f"MarketContext(benchmarks={self.benchmarks!r})"
+
+
+def build_market_context(rows, breadth=None, benchmarks=None):
+    """
+    Builds the MarketContext from the metrics rows of the context symbols.
+
+    Parameters:
+        rows (pd.DataFrame): Metrics rows (see `fetch.get_price_data`) including the
+                             symbols from `context_symbols`; others are ignored.
+        breadth (dict or None): Accumulated `breadth_counts` of the universe.
+        benchmarks (iterable or None): Benchmark symbols (default: BENCHMARKS).
+
+    Returns:
+        MarketContext: Changes are rounded to 2 decimals; symbols without data are None.
+    """
+    change = (
+        pd.to_numeric(rows["pct_drop_from_prev_close"], errors="coerce").round(2)
+        .groupby(rows["symbol"]).last()
+    )
+
+    def lookup(symbol):
+        value = change.get(symbol)
+        return None if value is None or pd.isna(value) else float(value) + 0.0  # no -0.0
+
+    return MarketContext(
+        benchmarks={symbol: lookup(symbol) for symbol in (benchmarks or BENCHMARKS)},
+        sectors={sector: lookup(etf) for sector, etf in SECTOR_ETFS.items()},
+        breadth=breadth_stats(breadth) if breadth else None,
+    )
+
+
+def add_relative_to_sector(alerts, context):
+    """
+    Adds pct_drop_vs_sector: each symbol's 1-day % change minus its sector ETF's, so a
+    -6% day in a sector that fell 5% stands apart from one in a flat sector.
+    """
+    sector_change = {sector: change for sector, change in (context.sectors if context else {}).items() if change is not None}
+    if "sector" in alerts.columns:
+        etf = alerts["sector"].map(sector_change).astype(float)
+    else:
+        etf = pd.Series(np.nan, index=alerts.index)
+    change = pd.to_numeric(alerts["pct_drop_from_prev_close"], errors="coerce")
+    return alerts.assign(pct_drop_vs_sector=(change - etf).round(2))
+
+
+def get_market_overview(symbols=("SPY", "QQQ"), provider=None):
+    """
+    Retrieves the 1-day percent change of `symbols` (default SPY and QQQ) in one batched
+    request. The daily run gets this from `pipeline.run_scan` instead; this is for
+    one-off use.
+
+    Returns:
+        dict: {
+            "SPY": float or None,
+            "QQQ": float or None
         }
+
+        If data is unavailable or fails, returns None for each index.
+    """
+    from fetch import get_price_data
+    from providers import YahooProvider
+
+    symbols = list(symbols)
+    try:
+        rows = get_price_data(symbols, period="5d", provider=provider or YahooProvider())
+        return build_market_context(rows, benchmarks=symbols).benchmarks
     except Exception as e:
         print(f"Failed to fetch market overview: {e}")
-        return {"SPY": None, "QQQ": None}
-
+        instrument.event("market_overview_failed", error=str(e))
+        return {symbol: None for symbol in symbols}
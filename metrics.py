@@ -0,0 +1,175 @@
+# metrics.py
+import numpy as np
+import pandas as pd
+
+from panel import PricePanel
+
+EPS = 1e-9
+
+# Prior-window lengths in calendar days, measured back from each ticker's last bar
+WINDOWS = {"3m": 90, "6m": 180, "52w": 365}
+
+# Simple moving average length in complete bars
+SMA_BARS = 200
+
+METRIC_COLUMNS = [
+    "symbol",
+    "latest_price",
+    "3m_high",
+    "3m_low",
+    "6m_high",
+    "6m_low",
+    "52w_high",
+    "52w_low",
+    "pct_drop_from_prev_close",
+    "pct_drop_from_open_to_close",
+    "below_3m_low",
+    "below_6m_low",
+    "below_52w_low",
+    "below_5%_prev_close",
+    "below_5%_open_to_close",
+    "down_streak",
+    "drop_from_52w_high",
+    "sma_200",
+]
+
+
+def _window_reduce(values, mask, reducer, fill):
+    """
+    Reduces `values` down the date axis over the cells selected by `mask`; columns with
+    an empty window come back as NaN.
+    """
+    reduced = reducer(np.where(mask, values, fill), axis=0)
+    return np.where(mask.any(axis=0), reduced, np.nan)
+
+
+def _as_float(values):
+    values = np.asarray(values)
+    if values.dtype in (np.float32, np.float64):
+        return values
+    return values.astype(float)
+
+
+def compute_alert_metrics(dates, tickers, open_, high, low, close):
+    """
+    Computes the alert metrics for every ticker from aligned (dates x tickers) OHLC arrays.
+
+    Each ticker is evaluated on its own complete bars only (rows where any of OHLC is NaN
+    are ignored), so tickers that stopped trading early or have holes in their history are
+    handled exactly like the per-ticker `hist.dropna()` loop this replaces.
+
+    Parameters:
+        dates (array-like): Sorted trading dates, length T.
+        tickers (list[str]): Column labels, length N.
+        open_, high, low, close (np.ndarray): T x N float arrays. float32 input (e.g. views
+                                              of a `panel.PricePanel`) is used as is,
+                                              without a float64 copy.
+
+    Returns:
+        tuple: (metrics, skipped)
+            metrics (pd.DataFrame): One row per ticker with at least two complete bars, in
+                                    `tickers` order, with columns METRIC_COLUMNS.
+            skipped (list[str]): Tickers with fewer than two complete bars.
+    """
+    dates = pd.DatetimeIndex(dates).values
+    open_, high, low, close = (_as_float(a) for a in (open_, high, low, close))
+    n_dates, n_tickers = close.shape
+    rows = np.arange(n_dates)[:, None]
+    cols = np.arange(n_tickers)
+
+    valid = np.isfinite(open_) & np.isfinite(high) & np.isfinite(low) & np.isfinite(close)
+    counts = valid.sum(axis=0)
+    keep = counts >= 2
+    skipped = [t for t, k in zip(tickers, keep) if not k]
+
+    # Index of each ticker's last and second-to-last complete bar
+    valid_rows = np.where(valid, rows, -1)
+    last = valid_rows.max(axis=0)
+    prev = np.where(rows == last, -1, valid_rows).max(axis=0)
+    last_safe, prev_safe = np.maximum(last, 0), np.maximum(prev, 0)
+
+    # Per-ticker values are upcast so the % changes below do not lose float32 precision
+    latest_price = close[last_safe, cols].astype(float)
+    yesterday_close = close[prev_safe, cols].astype(float)
+    today_open = open_[last_safe, cols].astype(float)
+    last_date = dates[last_safe]
+
+    # Prior windows (exclude today)
+    prior = valid & (rows < last)
+    age = last_date[None, :] - dates[:, None]
+    result = {}
+    for name, days in WINDOWS.items():
+        mask = prior & (age <= np.timedelta64(days, "D"))
+        result[f"{name}_low"] = _window_reduce(low, mask, np.min, np.inf)
+        result[f"{name}_high"] = _window_reduce(high, mask, np.max, -np.inf)
+
+    # 52w high can include today (for % drop display)
+    high_52w = _window_reduce(high, valid, np.max, -np.inf).astype(float)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct_drop_from_prev_close = (latest_price / yesterday_close - 1) * 100
+        pct_drop_from_open_to_close = (latest_price / today_open - 1) * 100
+        drop_from_52w_high = np.where(high_52w > 0, 100.0 * (latest_price - high_52w) / high_52w, np.nan)
+
+    # Down-streak: consecutive complete bars closing below the previous complete bar
+    filled_rows = np.maximum.accumulate(np.where(valid, rows, 0), axis=0)
+    seen = np.maximum.accumulate(valid, axis=0)
+    prev_close = np.full_like(close, np.nan)
+    prev_close[1:] = np.where(seen[:-1], close[filled_rows[:-1], cols], np.nan)
+    down = valid & (close < prev_close)
+    breaks = np.where(valid & ~down, rows, -1).max(axis=0)
+    cum_valid = np.cumsum(valid, axis=0)
+    streak = cum_valid[last_safe, cols] - cum_valid[np.maximum(breaks, 0), cols]
+    # Raw lengths (0 when the last bar did not close lower); the alert rules apply streak_min
+    down_streak = streak.astype(float)
+
+    # Moving average over each ticker's last SMA_BARS complete bars
+    recent = valid & (cum_valid > (counts - SMA_BARS)[None, :])
+    sma = np.where(recent, close, 0).sum(axis=0, dtype=float) / SMA_BARS
+    sma_200 = np.where(counts >= SMA_BARS, sma, np.nan)
+
+    def below(level):
+        return ~np.isnan(level) & (latest_price <= level + EPS)
+
+    metrics = pd.DataFrame({
+        "symbol": np.asarray(tickers, dtype=object),
+        "latest_price": latest_price,
+        "3m_high": result["3m_high"],
+        "3m_low": result["3m_low"],
+        "6m_high": result["6m_high"],
+        "6m_low": result["6m_low"],
+        "52w_high": high_52w,
+        "52w_low": result["52w_low"],
+        "pct_drop_from_prev_close": pct_drop_from_prev_close,
+        "pct_drop_from_open_to_close": pct_drop_from_open_to_close,
+        "below_3m_low": below(result["3m_low"]),
+        "below_6m_low": below(result["6m_low"]),
+        "below_52w_low": below(result["52w_low"]),
+        "below_5%_prev_close": pct_drop_from_prev_close <= -5,
+        "below_5%_open_to_close": pct_drop_from_open_to_close <= -5,
+        "down_streak": down_streak,
+        "drop_from_52w_high": drop_from_52w_high,
+        "sma_200": sma_200,
+    }, columns=METRIC_COLUMNS)
+    floats = metrics.select_dtypes("floating").columns
+    metrics[floats] = metrics[floats].astype(float)
+    return metrics[keep].reset_index(drop=True), skipped
+
+
+def metrics_from_panel(panel, tickers=None):
+    """
+    Runs `compute_alert_metrics` over a `panel.PricePanel`, or over a wide
+    (date x field/ticker) OHLC frame as produced by `providers.PriceProvider.download`,
+    which is first packed into a float32 PricePanel.
+    """
+    if isinstance(panel, pd.DataFrame):
+        panel = PricePanel.from_frame(panel, tickers)
+    elif tickers is not None:
+        panel = panel.select(tickers)
+    if not panel.tickers:
+        return pd.DataFrame(columns=METRIC_COLUMNS), []
+
+    return compute_alert_metrics(
+        panel.dates, panel.tickers,
+        panel.field("Open"), panel.field("High"), panel.field("Low"), panel.field("Close"),
+    )
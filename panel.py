@@ -0,0 +1,181 @@
+# panel.py
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from providers import FIELDS
+
+DTYPE = np.float32
+
+
+class PricePanel:
+    """
+    Compact OHLC store: one contiguous float32 array of shape (ticker x date x field)
+    over a shared trading calendar, with missing bars as NaN.
+
+    A ticker's history (`ticker`), a range of tickers (`select`) and a date range
+    (`window`) are views into the same buffer, and `field` returns a (date x ticker)
+    view in the layout `metrics.compute_alert_metrics` works on, so the alert metrics
+    are computed without copying the prices. Panels can be saved to a directory and
+    reopened memory-mapped, in which case only the pages actually read are loaded.
+    """
+
+    def __init__(self, tickers, dates, data):
+        self.tickers = list(tickers)
+        self.dates = pd.DatetimeIndex(dates, name="Date")
+        self.data = data
+        self._positions = None
+
+    @property
+    def positions(self):
+        if self._positions is None:
+            self._positions = {t: i for i, t in enumerate(self.tickers)}
+        return self._positions
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    @property
+    def empty(self):
+        return self.data.size == 0
+
+    @classmethod
+    def from_frame(cls, frame, tickers=None):
+        """
+        Packs a wide (date x field/ticker) OHLC frame, as returned by
+        `providers.PriceProvider.download`, into a PricePanel.
+        """
+        available = list(dict.fromkeys(frame.columns.get_level_values(1)))
+        if tickers is None:
+            tickers = available
+        else:
+            present = set(available)
+            tickers = [t for t in dict.fromkeys(tickers) if t in present]
+
+        data = np.empty((len(tickers), len(frame.index), len(FIELDS)), dtype=DTYPE)
+        if not tickers:
+            # e.g. a batch where every download failed: the frame has no field columns at all
+            return cls(tickers, frame.index, data)
+        for k, field in enumerate(FIELDS):
+            data[:, :, k] = frame[field].reindex(columns=tickers).to_numpy(dtype=DTYPE).T
+        return cls(tickers, frame.index, data)
+
+    @classmethod
+    def from_cache(cls, cache, tickers, start=None, directory=None):
+        """
+        Builds a panel from the histories in a `cache.OHLCCache`, on the union of their dates.
+
+        With `directory`, the array is written straight into a memory-mapped file there
+        (see `save`) instead of being assembled in memory, so panels larger than RAM can
+        be built one ticker at a time.
+        """
+        def history(ticker):
+            hist, _ = cache.load(ticker)
+            if hist is None:
+                return None
+            return hist if start is None else hist[hist.index >= pd.Timestamp(start)]
+
+        # First pass: which tickers are cached and the calendar they span
+        present, dates = [], set()
+        for ticker in dict.fromkeys(tickers):
+            hist = history(ticker)
+            if hist is not None and len(hist):
+                present.append(ticker)
+                dates.update(hist.index)
+        dates = pd.DatetimeIndex(sorted(dates))
+
+        shape = (len(present), len(dates), len(FIELDS))
+        if directory is None:
+            data = np.empty(shape, dtype=DTYPE)
+        else:
+            directory = Path(directory)
+            directory.mkdir(parents=True, exist_ok=True)
+            data = np.lib.format.open_memmap(directory / "data.npy", mode="w+", dtype=DTYPE, shape=shape)
+
+        # Second pass: copy each history into its row of the array
+        for i, ticker in enumerate(present):
+            hist = history(ticker)
+            data[i] = np.nan
+            data[i, dates.get_indexer(hist.index), :] = hist[FIELDS].to_numpy(dtype=DTYPE)
+
+        panel = cls(present, dates, data)
+        if directory is None:
+            return panel
+        data.flush()
+        panel._write_index(directory)
+        return cls.open(directory)
+
+    def save(self, directory):
+        """
+        Writes the panel as data.npy (the raw array), dates.npy and tickers.json.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        out = np.lib.format.open_memmap(directory / "data.npy", mode="w+", dtype=DTYPE, shape=self.data.shape)
+        out[:] = self.data
+        out.flush()
+        del out
+        self._write_index(directory)
+        return directory
+
+    def _write_index(self, directory):
+        np.save(Path(directory) / "dates.npy", self.dates.values.astype("datetime64[D]"))
+        (Path(directory) / "tickers.json").write_text(json.dumps(self.tickers))
+
+    @classmethod
+    def open(cls, directory, mode="r"):
+        """
+        Opens a saved panel with its price array memory-mapped.
+        """
+        directory = Path(directory)
+        data = np.load(directory / "data.npy", mmap_mode=mode)
+        dates = np.load(directory / "dates.npy")
+        tickers = json.loads((directory / "tickers.json").read_text())
+        return cls(tickers, dates, data)
+
+    def ticker(self, symbol):
+        """
+        Returns a (date x field) view of one ticker's bars.
+        """
+        return self.data[self.positions[symbol]]
+
+    def field(self, name):
+        """
+        Returns a (date x ticker) view of one field.
+        """
+        return self.data[:, :, FIELDS.index(name)].T
+
+    def window(self, start=None, end=None):
+        """
+        Returns a view covering the dates in [start, end].
+        """
+        lo = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start), side="left")
+        hi = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), side="right")
+        return PricePanel(self.tickers, self.dates[lo:hi], self.data[:, lo:hi])
+
+    def slice(self, start, stop):
+        """
+        Returns a view of tickers[start:stop].
+        """
+        return PricePanel(self.tickers[start:stop], self.dates, self.data[start:stop])
+
+    def select(self, tickers):
+        """
+        Returns the panel restricted to `tickers` (those present, in the given order).
+        This is a copy unless the tickers form a contiguous run; prefer `slice` for batching.
+        """
+        positions = [self.positions[t] for t in dict.fromkeys(tickers) if t in self.positions]
+        if positions and positions == list(range(positions[0], positions[0] + len(positions))):
+            return self.slice(positions[0], positions[0] + len(positions))
+        return PricePanel([self.tickers[i] for i in positions], self.dates, self.data[positions])
+
+    def to_frame(self):
+        """
+        Expands the panel back into the wide (date x field/ticker) OHLC frame.
+        """
+        columns = pd.MultiIndex.from_product([FIELDS, self.tickers], names=["Price", "Ticker"])
+        values = np.concatenate([self.field(f) for f in FIELDS], axis=1).astype(float)
+        return pd.DataFrame(values, index=self.dates, columns=columns)
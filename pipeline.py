@@ -0,0 +1,212 @@
+# pipeline.py
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import instrument
+from alerts import select_alert_rows
+from analytics import ANALYTICS_COLUMNS, cross_section
+from fetch import iter_price_data
+from market import add_breadth, add_relative_to_sector, build_market_context, context_symbols, split_context
+from metrics import METRIC_COLUMNS
+from sectors import SectorCache, add_sector_column, _lookup_sector
+from shards import DEFAULT_SHARD_SIZE, default_provider, run_sharded
+
+ALERT_ROW_COLUMNS = METRIC_COLUMNS + ["sector", "industry", "pct_drop_vs_sector",
+                                     "pct_rank_daily", "pct_rank_from_high", "sector_z"]
+
+
+def run_scan(tickers, provider=None, period="1y", batch_size=None, prefetch=None,
+             sector_cache=None, fetch_sector=_lookup_sector, benchmarks=None, journal=None, overrides=None):
+    """
+    Fetches prices, evaluates alerts and tags sectors as one streaming pipeline.
+
+    Price batches come from `fetch.iter_price_data`; each batch's alert rows are handed to
+    a sector-tagging worker as soon as the batch is computed, while later batches are still
+    downloading. The benchmark and sector ETF symbols (`market.context_symbols`) are
+    fetched in the same batched requests as the universe, and breadth is counted batch by
+    batch, so the market context needs no separate downloads. Only alert rows and three
+    numbers per symbol for the cross-section (`analytics.compact`) are kept, so memory
+    stays far below the size of the prices fetched.
+
+    Parameters:
+        tickers (list[str]): Symbols to scan.
+        provider (PriceProvider or None): Price source (default: cached Yahoo).
+        batch_size, prefetch: Passed to `iter_price_data`.
+        sector_cache (SectorCache or None): Shared by every batch (default: sector_cache.json).
+        fetch_sector (callable): Single-symbol sector lookup (default: yfinance).
+        benchmarks (list[str] or None): Benchmark symbols (default: `market.BENCHMARKS`).
+        journal (RunJournal or None): Checkpoint each batch's alert rows there, and skip
+                                      the tickers of batches checkpointed by an earlier attempt.
+        overrides (dict or None): Rule thresholds at which alert rows are kept
+                                  (see `delivery.alert_thresholds`; default: the rules' own).
+
+    Returns:
+        tuple: (alerts DataFrame with sector/industry/pct_drop_vs_sector columns and
+                their `analytics.CrossSection.for_symbols` ranks, `market.MarketContext`
+                with the universe's cross-section, number of universe tickers with metrics)
+    """
+    sector_cache = sector_cache or SectorCache()
+    context = context_symbols(benchmarks)
+    extra = _extra_symbols(tickers, context)
+    tickers, resumed, rows, market = _resume(list(tickers) + extra, journal)
+    tagged = []
+
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="pipeline") as pool:
+        for alerts in resumed:
+            tagged.append(pool.submit(_tag_sectors, alerts, sector_cache, fetch_sector))
+
+        with instrument.stage("fetch_compute"):
+            for batch, info in iter_price_data(tickers, period=period, provider=provider, batch_size=batch_size,
+                                               prefetch=prefetch, with_batches=True):
+                info, batch_market = split_context(info, context, extra)
+                market.add(*batch_market)
+                rows += len(info)
+                alerts = select_alert_rows(info, overrides=overrides)
+                if journal is not None:
+                    journal.record_batch(_scanned(batch, batch_market), alerts, len(info), market=batch_market)
+                if not alerts.empty:
+                    tagged.append(pool.submit(_tag_sectors, alerts, sector_cache, fetch_sector))
+
+        with instrument.stage("sector_tagging"):
+            parts = [future.result() for future in tagged]
+
+    with instrument.stage("market_context"):
+        overview = market.result(benchmarks)
+        alerts = _finish_alerts(parts, overview)
+
+    with instrument.stage("cross_section"):
+        alerts = _add_cross_section(alerts, overview, market.universe(), sector_cache)
+    return alerts, overview, rows
+
+
+def run_sharded_scan(tickers, processes=None, shard_size=DEFAULT_SHARD_SIZE, provider_factory=default_provider,
+                     period="1y", sector_cache=None, fetch_sector=_lookup_sector, benchmarks=None, journal=None,
+                     overrides=None):
+    """
+    Multi-process counterpart of `run_scan` for very large universes (see `shards.run_sharded`).
+
+    Shards are fetched and evaluated in worker processes, each also returning its share
+    of the market context; the merged alert rows are then tagged with sectors in this
+    process, where the sector cache and the Yahoo rate limit are shared. With a
+    `journal`, every finished shard is checkpointed as it comes back, like a batch in
+    `run_scan`.
+
+    Returns:
+        tuple: Same as `run_scan`.
+    """
+    sector_cache = sector_cache or SectorCache()
+    context = context_symbols(benchmarks)
+    extra = _extra_symbols(tickers, context)
+    tickers, resumed, rows, market = _resume(list(tickers) + extra, journal)
+
+    def on_shard(shard, alerts, shard_rows, shard_market):
+        market.add(*shard_market)
+        if journal is not None:
+            journal.record_batch(_scanned(shard, shard_market), alerts, shard_rows, market=shard_market)
+
+    with instrument.stage("fetch_compute"):
+        alerts, scanned, _ = run_sharded(
+            tickers, shard_size=shard_size, processes=processes, period=period,
+            provider_factory=provider_factory, context=context, extra=extra, on_shard=on_shard, overrides=overrides,
+        )
+        rows += scanned
+
+    with instrument.stage("sector_tagging"):
+        parts = [part for part in resumed + [alerts] if not part.empty]
+        if parts:
+            parts = [add_sector_column(pd.concat(parts, ignore_index=True), cache=sector_cache, fetch_sector=fetch_sector)]
+
+    with instrument.stage("market_context"):
+        overview = market.result(benchmarks)
+        alerts = _finish_alerts(parts, overview)
+
+    with instrument.stage("cross_section"):
+        alerts = _add_cross_section(alerts, overview, market.universe(), sector_cache)
+    return alerts, overview, rows
+
+
+class _MarketParts:
+    # Context rows, breadth counts and cross-section rows gathered batch by batch
+    def __init__(self):
+        self.rows = []
+        self.breadth = {}
+        self.universe_rows = []
+
+    def add(self, context_rows, counts, universe_rows=None):
+        # universe_rows is None for batches journaled before the cross-section existed
+        if not context_rows.empty:
+            self.rows.append(context_rows)
+        self.breadth = add_breadth(self.breadth, counts)
+        if universe_rows is not None and not universe_rows.empty:
+            self.universe_rows.append(universe_rows)
+
+    def universe(self):
+        if not self.universe_rows:
+            return pd.DataFrame(columns=ANALYTICS_COLUMNS)
+        return pd.concat(self.universe_rows, ignore_index=True)
+
+    def result(self, benchmarks=None):
+        rows = pd.concat(self.rows, ignore_index=True) if self.rows else pd.DataFrame(columns=METRIC_COLUMNS)
+        return build_market_context(rows, self.breadth, benchmarks)
+
+
+def _extra_symbols(tickers, context):
+    # Context symbols that are not already part of the universe
+    universe = set(tickers)
+    return [s for s in context if s not in universe]
+
+
+def _scanned(batch, market):
+    # The batch's tickers that produced metrics; those that got no data (e.g. a throttled
+    # chunk) are left out of the journal so a resumed run fetches them again
+    context_rows, _, universe_rows = market
+    produced = set(context_rows["symbol"]) | set(universe_rows["symbol"])
+    return [t for t in batch if t in produced]
+
+
+def _resume(tickers, journal):
+    # Split off the tickers an earlier attempt already scanned, with their alert rows, row count and market data
+    market = _MarketParts()
+    if journal is None:
+        return tickers, [], 0, market
+    batches = journal.batches()
+    scanned = {t for batch in batches for t in batch["tickers"]}
+    if scanned:
+        print(f"Resuming scan: {len(scanned)} tickers already scanned for {journal.day}")
+        instrument.incr("resume.tickers_skipped", len(scanned))
+    for batch in batches:
+        if batch.get("market") is not None:
+            market.add(*batch["market"])
+    resumed = [batch["alerts"] for batch in batches if not batch["alerts"].empty]
+    rows = sum(batch["rows"] for batch in batches)
+    return [t for t in tickers if t not in scanned], resumed, rows, market
+
+
+def _finish_alerts(parts, overview):
+    if parts:
+        alerts = add_relative_to_sector(pd.concat(parts, ignore_index=True), overview)
+    else:
+        alerts = pd.DataFrame(columns=ALERT_ROW_COLUMNS)
+    instrument.incr("alert_rows", len(alerts))
+    return alerts
+
+
+def _add_cross_section(alerts, overview, universe, sector_cache):
+    # Rank the whole universe with the sectors already cached (tagging has added the alert
+    # rows'); no lookups here, `sectors.backfill_sectors` fills the cache after the run
+    sectors = sector_cache.sector_map(universe["symbol"])
+    overview.cross_section = cross_section(universe, sectors)
+    instrument.incr("cross_section.symbols", len(overview.cross_section.table))
+    instrument.observe("cross_section.sector_coverage", overview.cross_section.coverage)
+
+    ranks = overview.cross_section.for_symbols(alerts["symbol"])
+    alerts = alerts.copy()
+    for column in ranks.columns:
+        alerts[column] = ranks[column].to_numpy()
+    return alerts
+
+
+def _tag_sectors(alerts, cache, fetch_sector):
+    with instrument.timed("sector_tagging.batch_seconds"):
+        return add_sector_column(alerts, cache=cache, fetch_sector=fetch_sector)
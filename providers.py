@@ -0,0 +1,279 @@
+# providers.py
+import time
+from pathlib import Path
+
+import pandas as pd
+
+import instrument
+from executor import call_with_retry, run_concurrent, yahoo_limiter
+
+FIELDS = ["Open", "High", "Low", "Close"]
+
+
+def period_to_offset(period):
+    """
+    Converts a yfinance-style period string ("5d", "6mo", "1y", "ytd", "max") to a pandas offset.
+
+    Returns:
+        pd.DateOffset or None: None means "no lower bound" (period="max").
+    """
+    if period is None or period == "max":
+        return None
+    if period == "ytd":
+        return "ytd"
+    units = {"d": "days", "wk": "weeks", "mo": "months", "y": "years"}
+    for suffix, unit in units.items():
+        if period.endswith(suffix) and period[:-len(suffix)].isdigit():
+            return pd.DateOffset(**{unit: int(period[:-len(suffix)])})
+    raise ValueError(f"Unsupported period: {period}")
+
+
+def trim_to_period(panel, period):
+    """
+    Keeps only the rows of `panel` that fall inside `period`, measured back from its last date.
+    """
+    offset = period_to_offset(period)
+    if panel.empty or offset is None:
+        return panel
+    last_date = panel.index[-1]
+    if offset == "ytd":
+        start = pd.Timestamp(year=last_date.year, month=1, day=1)
+    else:
+        start = last_date - offset
+    return panel[panel.index >= start]
+
+
+def empty_panel():
+    columns = pd.MultiIndex.from_product([FIELDS, []], names=["Price", "Ticker"])
+    return pd.DataFrame(index=pd.DatetimeIndex([], name="Date"), columns=columns, dtype=float)
+
+
+def is_intraday(interval):
+    """
+    True for sub-daily bar sizes such as "1m", "15m" or "1h".
+    """
+    return interval.endswith(("m", "h")) and not interval.endswith("mo")
+
+
+def normalize_panel(panel, tickers, interval="1d"):
+    """
+    Coerces a downloaded frame into the standard wide OHLC panel.
+
+    The panel is indexed by tz-naive dates and has (field, ticker) MultiIndex columns
+    with field in FIELDS. Tickers missing from `panel` are simply absent from the result.
+    Intraday bars keep their timestamps, so a session's bars stay separate rows.
+    """
+    if panel is None or panel.empty:
+        return empty_panel()
+
+    panel = panel.copy()
+    if not isinstance(panel.columns, pd.MultiIndex):
+        # Single-ticker downloads come back with flat OHLC columns
+        panel.columns = pd.MultiIndex.from_product([panel.columns, [tickers[0]]])
+    panel.columns = panel.columns.set_names(["Price", "Ticker"])
+
+    index = pd.DatetimeIndex(panel.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    panel.index = (index if is_intraday(interval) else index.normalize()).rename("Date")
+
+    fields = [f for f in FIELDS if f in panel.columns.get_level_values(0)]
+    panel = panel.loc[:, fields].astype(float)
+    panel = panel[~panel.index.duplicated(keep="last")].sort_index()
+    return panel
+
+
+def split_failures(panel, tickers):
+    """
+    Returns the tickers in `tickers` that have no complete OHLC row in `panel`.
+    """
+    if panel.empty:
+        return list(tickers)
+    complete = panel["Close"].notna()
+    for field in FIELDS:
+        if field in panel.columns.get_level_values(0):
+            complete &= panel[field].notna()
+    present = set(complete.columns[complete.any(axis=0)])
+    return [t for t in tickers if t not in present]
+
+
+class PriceProvider:
+    """
+    Base class for price sources that return a wide OHLC panel for many tickers at once.
+
+    Subclasses implement `fetch_chunk`; `download` takes care of splitting the universe
+    into chunks, running up to `workers` chunk requests concurrently under `limiter`,
+    retrying transient errors `retries` times, falling back to one ticker at a time for a
+    chunk that still fails, and collecting per-ticker failures.
+    """
+
+    chunk_size = 100
+    workers = 1
+    limiter = None
+    retries = 0
+    # True for sources that never have new data, so a cache in front serves what it has
+    offline = False
+
+    def fetch_chunk(self, tickers, period="1y", interval="1d", start=None):
+        """
+        Downloads one chunk of tickers and returns the raw frame (any layout `normalize_panel` accepts).
+        """
+        raise NotImplementedError
+
+    def _fetch_normalized(self, tickers, period, interval, start):
+        raw, _ = call_with_retry(
+            self.fetch_chunk, tickers, period=period, interval=interval, start=start,
+            retries=self.retries, limiter=self.limiter,
+            name="fetch.chunk" if len(tickers) > 1 else "fetch.ticker",
+        )
+        return normalize_panel(raw, tickers, interval=interval)
+
+    def download_chunk(self, tickers, period="1y", interval="1d", start=None):
+        """
+        Downloads a single chunk, isolating per-ticker failures.
+
+        Returns:
+            tuple: (panel, failures) where failures maps ticker -> reason.
+        """
+        failures = {}
+        try:
+            panel = self._fetch_normalized(tickers, period, interval, start)
+        except Exception as e:
+            # One bad symbol must not sink the whole chunk; fall back to single-ticker requests
+            instrument.event("fetch_chunk_failed", tickers=len(tickers), error=str(e))
+            frames = []
+            for ticker in tickers:
+                try:
+                    frames.append(self._fetch_normalized([ticker], period, interval, start))
+                except Exception as ticker_error:
+                    failures[ticker] = f"error: {ticker_error}"
+            panel = pd.concat(frames, axis=1, sort=True) if frames else empty_panel()
+
+        for ticker in split_failures(panel, tickers):
+            failures.setdefault(ticker, "no data")
+        return panel, failures
+
+    def download(self, tickers, period="1y", interval="1d", start=None):
+        """
+        Downloads OHLC history for every ticker in chunked multi-ticker requests.
+
+        Parameters:
+            tickers (list[str]): Symbols to download.
+            period (str): yfinance-style lookback (ignored when `start` is given).
+            interval (str): Bar size, e.g. "1d".
+            start (str or Timestamp or None): First date to download.
+
+        Returns:
+            tuple: (panel, failures)
+                panel (pd.DataFrame): Dates x (field, ticker) OHLC panel.
+                failures (dict): ticker -> reason for every ticker that returned no data.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        chunks = [tuple(tickers[i:i + self.chunk_size]) for i in range(0, len(tickers), self.chunk_size)]
+        results, _ = run_concurrent(
+            lambda chunk: self.download_chunk(list(chunk), period=period, interval=interval, start=start),
+            chunks, workers=self.workers, retries=0, name="fetch",
+        )
+
+        frames, failures = [], {}
+        for chunk in chunks:
+            panel, chunk_failures = results[chunk]
+            frames.append(panel)
+            failures.update(chunk_failures)
+
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return empty_panel(), failures
+        panel = pd.concat(frames, axis=1, sort=True)
+        return panel.sort_index(axis=1, level=0, sort_remaining=False), failures
+
+
+class YahooProvider(PriceProvider):
+    """
+    Batched Yahoo Finance provider built on `yf.download`.
+
+    Chunk requests share the process-wide Yahoo rate limiter with `sectors.py`.
+    """
+
+    def __init__(self, chunk_size=100, workers=4, retries=3):
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.retries = retries
+        self.limiter = yahoo_limiter()
+
+    def fetch_chunk(self, tickers, period="1y", interval="1d", start=None):
+        import yfinance as yf  # heavy; only needed once something is actually downloaded
+
+        kwargs = {"start": start} if start is not None else {"period": period}
+        return yf.download(
+            tickers,
+            interval=interval,
+            group_by="column",
+            auto_adjust=True,
+            actions=False,
+            threads=False,
+            progress=False,
+            **kwargs,
+        )
+
+
+class OfflineProvider(PriceProvider):
+    """
+    Provider that never touches the network and has no data. Wrapped in
+    `cache.CachedProvider`, it turns the price cache into a read-only offline source:
+    cached histories are served as they are and anything else is reported as missing.
+    """
+
+    chunk_size = 500
+    offline = True
+
+    def fetch_chunk(self, tickers, period="1y", interval="1d", start=None):
+        return empty_panel()
+
+
+class FileProvider(PriceProvider):
+    """
+    Offline provider that reads one CSV of daily OHLC per ticker from `directory`.
+
+    Files are named <TICKER>.csv with a Date column plus Open/High/Low/Close, i.e. the
+    layout of `yf.Ticker(t).history().to_csv()` or `save_panel`. `delay` simulates the
+    round-trip latency of one chunk request so the fetch stage can be timed offline.
+    """
+
+    def __init__(self, directory, chunk_size=100, delay=0.0, workers=1):
+        self.directory = Path(directory)
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self.workers = workers
+
+    def fetch_chunk(self, tickers, period="1y", interval="1d", start=None):
+        if interval != "1d":
+            raise ValueError(f"FileProvider only serves daily bars, got interval={interval}")
+        if self.delay:
+            time.sleep(self.delay)
+
+        frames = {}
+        for ticker in tickers:
+            path = self.directory / f"{ticker}.csv"
+            if not path.exists():
+                continue
+            hist = pd.read_csv(path, index_col=0)
+            hist.index = pd.to_datetime(hist.index, utc=True).tz_localize(None)
+            hist = trim_to_period(hist.sort_index(), period) if start is None else hist[hist.index >= pd.Timestamp(start)]
+            frames[ticker] = hist[[f for f in FIELDS if f in hist.columns]]
+
+        if not frames:
+            return empty_panel()
+        panel = pd.concat(frames, axis=1, names=["Ticker", "Price"], sort=True)
+        return panel.swaplevel(axis=1)
+
+
+def save_panel(panel, directory):
+    """
+    Writes a wide OHLC panel to `directory` as one CSV per ticker (the FileProvider layout).
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for ticker in panel.columns.get_level_values(1).unique():
+        hist = panel.xs(ticker, axis=1, level=1).dropna(how="all")
+        hist.to_csv(directory / f"{ticker}.csv", index_label="Date")
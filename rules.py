@@ -0,0 +1,278 @@
+# rules.py
+# Declarative alert rules. Every stage (scan filter, logging, email, watch mode,
+# backtest) evaluates the same registry, so a rule is defined exactly once.
+import ast
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from metrics import EPS
+
+DEFAULT_RULES_PATH = Path(__file__).resolve().parent / "rules.json"
+
+SEVERITIES = ("info", "warning", "critical")
+
+
+class Rule:
+    """
+    One alert rule.
+
+    Parameters:
+        name (str): alert_type recorded in logs and the alert history.
+        expr (str): Boolean expression over metrics columns (see `compile_expression`);
+                    may refer to `threshold` and `eps`.
+        threshold (float or None): Value bound to `threshold`, overridable per run.
+        label (str): Report section heading; "{threshold}" is filled in with the
+                     threshold's absolute value (e.g. 5 for a -5% drop rule).
+        severity (str): One of SEVERITIES.
+        detail (str or None): Metrics column shown next to the symbol in the report.
+        unit (str or None): How the detail is shown: "days" or "%".
+        color (str or None): CSS color of a "%" detail.
+        logged (bool): Whether the alert is written to the daily log and history.
+        enabled (bool): Disabled rules are kept in the registry but never evaluated.
+    """
+
+    def __init__(self, name, expr, threshold=None, label=None, severity="info", detail=None, unit=None,
+                 color=None, logged=True, enabled=True):
+        if severity not in SEVERITIES:
+            raise ValueError(f"Rule {name}: unknown severity {severity!r}")
+        self.name = name
+        self.expr = expr
+        self.threshold = threshold
+        self.label = label or name
+        self.severity = severity
+        self.detail = detail
+        self.unit = unit
+        self.color = color
+        self.logged = logged
+        self.enabled = enabled
+        self.code, self.columns = compile_expression(expr)
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in (
+            "name", "expr", "threshold", "label", "severity", "detail", "unit", "color", "logged", "enabled",
+        )}
+
+    def __repr__(self):
+        return f"Rule({self.name!r}, {self.expr!r}, threshold={self.threshold!r})"
+
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Name, ast.Load, ast.Constant,
+    ast.And, ast.Or, ast.Not, ast.BitAnd, ast.BitOr, ast.Invert, ast.USub, ast.UAdd,
+    ast.Add, ast.Sub, ast.Mult, ast.Div,
+    ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq,
+)
+
+_RESERVED = {"threshold", "eps"}
+
+# Functions the compiled expressions call for and/or/not
+_LOGICAL = {"_and": np.logical_and, "_or": np.logical_or, "_not": np.logical_not}
+
+
+class _Vectorize(ast.NodeTransformer):
+    # `and` / `or` / `not` read naturally in rule files; on arrays they must be elementwise,
+    # and numpy's logical functions also accept float operands (where & | ~ do not)
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        func = "_and" if isinstance(node.op, ast.And) else "_or"
+        result = node.values[0]
+        for value in node.values[1:]:
+            result = ast.Call(func=ast.Name(id=func, ctx=ast.Load()), args=[result, value], keywords=[])
+        return result
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return ast.Call(func=ast.Name(id="_not", ctx=ast.Load()), args=[node.operand], keywords=[])
+        return node
+
+    def visit_Compare(self, node):
+        # A chain such as lo <= x <= hi becomes (lo <= x) & (x <= hi)
+        self.generic_visit(node)
+        if len(node.ops) == 1:
+            return node
+        parts = []
+        left = node.left
+        for op, right in zip(node.ops, node.comparators):
+            parts.append(ast.Compare(left=left, ops=[op], comparators=[right]))
+            left = right
+        result = parts[0]
+        for part in parts[1:]:
+            result = ast.BinOp(left=result, op=ast.BitAnd(), right=part)
+        return result
+
+
+def compile_expression(expr):
+    """
+    Compiles a rule expression into a code object evaluated over whole columns at once.
+
+    The language is a subset of Python: numbers, metrics column names (back-quoted when
+    they are not identifiers, e.g. `3m_low`), `threshold`, `eps`, arithmetic (+ - * /),
+    comparisons (chains allowed) and and/or/not (or & | ~ between comparisons).
+
+    Returns:
+        tuple: (code object, list of referenced metrics columns)
+    """
+    columns = []
+
+    def name_for(match):
+        column = match.group(1)
+        if column not in columns:
+            columns.append(column)
+        return f"_c{columns.index(column)}"
+
+    source = re.sub(r"`([^`]+)`", name_for, expr)
+    try:
+        tree = ast.parse(source, mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid rule expression {expr!r}: {e.msg}") from None
+
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"Unsupported syntax in rule expression {expr!r}: {type(node).__name__}")
+        if isinstance(node, ast.Name) and not node.id.startswith("_c") and node.id not in _RESERVED:
+            if node.id not in columns:
+                columns.append(node.id)
+
+    # Plain identifiers are renamed like back-quoted ones so every column goes through one namespace
+    class _Rename(ast.NodeTransformer):
+        def visit_Name(self, node):
+            if node.id in _RESERVED or node.id.startswith("_c"):
+                return node
+            return ast.copy_location(ast.Name(id=f"_c{columns.index(node.id)}", ctx=node.ctx), node)
+
+    tree = ast.fix_missing_locations(_Vectorize().visit(_Rename().visit(tree)))
+    return compile(tree, f"<rule {expr}>", "eval"), columns
+
+
+# Report order
+DEFAULT_RULES = [
+    Rule("below_3m_low", "latest_price <= `3m_low` + eps",
+         label="📉 Below 3M Low", severity="info"),
+    Rule("below_6m_low", "latest_price <= `6m_low` + eps",
+         label="💔 Below 6M Low", severity="warning"),
+    Rule("below_52w_low", "latest_price <= `52w_low` + eps",
+         label="☢️ Below 52W Low", severity="critical"),
+    Rule("down_streak_5plus", "down_streak >= threshold", threshold=5,
+         label="🔻 {threshold}+ Day Down Streak", severity="warning", detail="down_streak", unit="days"),
+    Rule("pct_drop_5plus", "pct_drop_from_prev_close <= threshold", threshold=-5,
+         label="⚠️ Drop ≥{threshold}% from Prev Close", severity="warning",
+         detail="pct_drop_from_prev_close", unit="%", color="red"),
+    Rule("open_to_close_drop_5plus", "pct_drop_from_open_to_close <= threshold", threshold=-5,
+         label="🕯️ Drop ≥{threshold}% from Open", severity="warning",
+         detail="pct_drop_from_open_to_close", unit="%", color="red"),
+    Rule("drop_50_from_52w_high", "drop_from_52w_high <= threshold", threshold=-50,
+         label="💀 Down ≥{threshold}% from 52W High", severity="critical",
+         detail="drop_from_52w_high", unit="%", color="#b33", logged=False),
+    Rule("below_200d_sma", "latest_price < sma_200",
+         label="📉 Below 200-Day SMA", severity="info", enabled=False),
+]
+
+
+def _label_value(threshold):
+    # -5 and -5.0 both read "5" in a heading
+    return f"{abs(threshold):g}" if threshold is not None else threshold
+
+
+class RuleSet:
+    """
+    An ordered registry of rules compiled for vectorized evaluation.
+
+    `evaluate` pulls each referenced metrics column out of the frame once, as a float
+    array, and runs every enabled rule over all rows with numpy; no rule does per-row
+    Python work, so adding one costs a few array operations per run.
+    """
+
+    def __init__(self, rules):
+        self.all_rules = list(rules)
+        names = [r.name for r in self.all_rules]
+        if len(names) != len(set(names)):
+            raise ValueError("Duplicate rule names")
+        self.rules = [r for r in self.all_rules if r.enabled]
+        self.by_name = {r.name: r for r in self.rules}
+        self.columns = list(dict.fromkeys(c for r in self.rules for c in r.columns))
+
+    @property
+    def names(self):
+        return [r.name for r in self.rules]
+
+    @property
+    def logged_names(self):
+        return [r.name for r in self.rules if r.logged]
+
+    def thresholds(self, overrides=None):
+        values = {r.name: r.threshold for r in self.rules}
+        for name, value in (overrides or {}).items():
+            if name in values and value is not None:
+                values[name] = value
+        return values
+
+    def labels(self, overrides=None):
+        thresholds = self.thresholds(overrides)
+        return {r.name: r.label.format(threshold=_label_value(thresholds[r.name])) for r in self.rules}
+
+    def evaluate(self, data, overrides=None):
+        """
+        Evaluates every enabled rule.
+
+        Parameters:
+            data (pd.DataFrame or dict): Metrics rows, or a mapping of column -> scalar/array.
+                                         Missing columns evaluate as NaN (the rule does not fire).
+            overrides (dict or None): rule name -> threshold for this evaluation.
+
+        Returns:
+            dict: rule name -> boolean np.ndarray aligned with the rows of `data`.
+        """
+        if isinstance(data, pd.DataFrame):
+            n = len(data)
+            arrays = {
+                c: pd.to_numeric(data[c], errors="coerce").to_numpy(dtype=float) if c in data.columns else np.full(n, np.nan)
+                for c in self.columns
+            }
+        else:
+            # Scalars (e.g. one watch-mode snapshot) evaluate as a single row; None is NaN
+            arrays = {c: np.atleast_1d(np.asarray(data.get(c), dtype=float)) for c in self.columns}
+            n = max((len(a) for a in arrays.values()), default=1)
+
+        thresholds = self.thresholds(overrides)
+        masks = {}
+        with np.errstate(invalid="ignore"):
+            for rule in self.rules:
+                namespace = {f"_c{i}": arrays[c] for i, c in enumerate(rule.columns)}
+                namespace.update(_LOGICAL)
+                namespace.update(threshold=np.nan if thresholds[rule.name] is None else thresholds[rule.name], eps=EPS)
+                result = eval(rule.code, {"__builtins__": {}}, namespace)
+                masks[rule.name] = np.broadcast_to(np.asarray(result, dtype=bool), (n,))
+        return masks
+
+
+def load_rules(path=DEFAULT_RULES_PATH):
+    """
+    Returns the RuleSet of DEFAULT_RULES adjusted by an optional JSON rule file.
+
+    The file holds a list of objects. An object whose "name" matches a built-in rule
+    overrides only the given fields, e.g. {"name": "below_200d_sma", "enabled": true} or
+    {"name": "pct_drop_5plus", "threshold": -4}; any other object defines a new rule
+    (appended in report order) and needs at least "name" and "expr".
+    """
+    specs = {r.name: r.to_dict() for r in DEFAULT_RULES}
+    path = Path(path)
+    if path.exists():
+        for entry in json.loads(path.read_text()):
+            if entry.get("name") in specs:
+                specs[entry["name"]].update(entry)
+            elif "name" in entry and "expr" in entry:
+                specs[entry["name"]] = entry
+            else:
+                raise ValueError(f"Rule in {path} needs a name and an expr: {entry}")
+    return RuleSet(Rule(**spec) for spec in specs.values())
+
+
+@lru_cache(maxsize=None)
+def default_ruleset():
+    return load_rules()
@@ -1,47 +1,180 @@
-from Scraper import main as get_symbols
-from fetch import get_price_data
-from sectors import add_sector_column
-from logger import log_alerts
-from market import get_market_overview
-from emailer import generate_html_email, send_email
-from config import EMAIL_ADDRESS, EMAIL_PASSWORD, TO_ADDRESS
+from instrument import RUN, incr, profiled, stage, write_report
+from datetime import datetime
 from pathlib import Path
+import argparse
 
 
 LOG_DIR = Path(r"C:\Users\Nancy Lonoff\OneDrive\Desktop\Misc\Stock Notifier\log_files")
+REPORT_DIR = LOG_DIR / "run_reports"
+JOURNAL_DIR = LOG_DIR / "journal"
+# Dry runs must not touch LOG_DIR, so their reports go next to the code instead
+DRY_RUN_DIR = Path(__file__).resolve().parent / "dry_run"
 
-if __name__ == "__main__":
-    tickers = get_symbols()["Symbol"].tolist()
-    tickers = [t.strip().upper().replace('.', '-') for t in tickers if isinstance(t, str) and t.strip().upper() != "SYMBOL"]
-
-    info = get_price_data(tickers)
-    alerts = info[
-        info["below_3m_low"] |
-        info["below_6m_low"] |
-        info["below_52w_low"] |
-        info["below_5%_prev_close"] |
-        info["below_5%_open_to_close"] |
-        info["down_streak"]
-    ]
-
-    alerts = add_sector_column(alerts)
-    log_alerts(info)
-
-    email_body = generate_html_email(
-        alerts,
-        drop_threshold=-5,
-        streak_min=5,
-        log_dir=LOG_DIR,
-        days_back=7,
-        market_overview=get_market_overview(), 
-    )
-
-    send_email(
-        subject="📊 Daily Stock Alert Summary",
-        body=email_body,
-        sender=EMAIL_ADDRESS,
-        recipient=TO_ADDRESS,
-        password=EMAIL_PASSWORD,
-        html=True
-    )
+def offline_universe():
+    # Offline runs scan whatever universe snapshot exists, however old
+    from universe import load_universe
+
+    def no_scrape():
+        raise RuntimeError("no universe snapshot to run offline from")
+    return load_universe(refresh_days=float("inf"), scrape=no_scrape)
+
+def offline_provider():
+    from cache import CachedProvider
+    from providers import OfflineProvider
+    return CachedProvider(OfflineProvider())
+
+def write_bodies(bodies, directory):
+    """
+    Writes each rendered report to <directory>/<recipient>.html instead of sending it.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for recipient, body in bodies.items():
+        (directory / f"{recipient}.html").write_text(body, encoding="utf-8")
+    print(f"📝 Wrote {len(bodies)} reports to {directory}")
+    return directory
+
+def run(processes=None, shard_size=500, fresh=False, dry_run=False, offline=False, out_dir=None):
+    """
+    The daily run: universe -> scan -> log -> render -> send.
+
+    Parameters:
+        processes (int or None): Scan in worker processes (see `pipeline.run_sharded_scan`).
+        fresh (bool): Discard today's checkpoints first.
+        dry_run (bool): Render the reports into `out_dir` without logging, checkpointing or
+                        sending anything.
+        offline (bool): Use only the universe snapshot, the price cache and the sector
+                        cache; implies `dry_run`.
+    """
+    # Imported here so `python cli.py --help` and the light subcommands stay fast
+    from alerts import classify_alerts
+    from delivery import alert_thresholds, deliver, load_subscribers, render_for_subscribers
+    from history import AlertHistory
+    from journal import RunJournal
+    from logger import log_alerts
+    from pipeline import run_scan, run_sharded_scan
+    from universe import load_universe
+
+    dry_run = dry_run or offline
+    if dry_run:
+        # Nothing is sent, so the credentials module is optional
+        try:
+            from config import TO_ADDRESS
+        except ImportError:
+            TO_ADDRESS = "you@example.com"
+    else:
+        from config import EMAIL_ADDRESS, EMAIL_PASSWORD, TO_ADDRESS
+
+    # Every stage checkpoints into today's journal; a rerun resumes after the last completed one.
+    # A dry run neither reads nor writes it.
+    journal = None if dry_run else RunJournal(JOURNAL_DIR, fresh=fresh)
+    subscribers = load_subscribers(default_recipient=TO_ADDRESS)
+
+    with stage("universe"):
+        tickers = journal.load("universe") if journal else None
+        if tickers is None:
+            tickers = offline_universe() if offline else load_universe()
+            if journal:
+                journal.save("universe", tickers)
+    incr("universe.symbols", len(tickers))
+
+    scan = journal.load("scan") if journal else None
+    if scan is not None:
+        alerts, market_overview = scan
+        print(f"Resuming after the scan for {journal.day} ({len(alerts)} alert rows)")
+    else:
+        # Keep every row some subscriber's looser thresholds could report
+        scan_options = {"journal": journal, "overrides": alert_thresholds(subscribers)}
+        if offline:
+            from sectors import offline_lookup
+            scan_options["fetch_sector"] = offline_lookup
+        # Fetching, alert evaluation, sector tagging and the market overview overlap
+        if processes:
+            if offline:
+                scan_options["provider_factory"] = offline_provider
+            alerts, market_overview, _ = run_sharded_scan(tickers, processes=processes, shard_size=shard_size, **scan_options)
+        else:
+            if offline:
+                scan_options["provider"] = offline_provider()
+            alerts, market_overview, _ = run_scan(tickers, **scan_options)
+        if journal:
+            journal.save("scan", (alerts, market_overview))
 
+    # Evaluate the alert rules once; logging and the default-threshold reports share the result
+    classified = classify_alerts(alerts)
+
+    with stage("logging"):
+        # A dry run leaves LOG_DIR alone; its repeat counts come from an empty in-memory history
+        history = AlertHistory(":memory:") if dry_run else AlertHistory.in_dir(LOG_DIR)
+        if journal and not journal.done("logging"):
+            log_alerts(classified, log_dir=LOG_DIR, history=history, date=journal.day)
+            journal.save("logging")
+
+    with stage("rendering"):
+        bodies = journal.load("rendering") if journal else None
+        if bodies is None:
+            bodies = render_for_subscribers(
+                alerts,
+                subscribers,
+                market_overview=market_overview,
+                history=history,
+                log_dir=LOG_DIR,
+                days_back=7,
+                classified=classified,
+            )
+            if journal:
+                journal.save("rendering", bodies)
+
+    with stage("sending"):
+        if dry_run:
+            return write_bodies(bodies, out_dir or DRY_RUN_DIR)
+
+        # Recipients are journaled as each message is accepted, so nobody is emailed twice a day
+        sent = journal.sent
+        pending = {recipient: body for recipient, body in bodies.items() if recipient not in sent}
+        if len(pending) < len(bodies):
+            print(f"Already emailed {len(bodies) - len(pending)} recipients for {journal.day}")
+        if pending:
+            deliver(
+                pending,
+                subject="📊 Daily Stock Alert Summary",
+                sender=EMAIL_ADDRESS,
+                password=EMAIL_PASSWORD,
+                html=True,
+                on_sent=journal.mark_sent,
+            )
+
+    # Off the critical path: grow the sector cache towards the whole universe for the
+    # cross-section's sector statistics (dry and offline runs skip this)
+    with stage("sector_backfill"):
+        from sectors import backfill_sectors
+        backfill_sectors(tickers)
+
+def add_run_arguments(parser):
+    parser.add_argument("--profile", metavar="PATH", help="Write cProfile stats for the whole run to PATH")
+    parser.add_argument("--report", metavar="PATH", help="Where to write the JSON run report (default: log_files/run_reports/; "
+                                                           "a dry run writes one only when this is given)")
+    parser.add_argument("--processes", type=int, metavar="N", help="Scan in N worker processes (for universes of thousands of symbols)")
+    parser.add_argument("--shard-size", type=int, default=500, help="Tickers per worker task with --processes (default: 500)")
+    parser.add_argument("--fresh", action="store_true", help="Discard today's checkpoints and redo every stage (may email again)")
+    parser.add_argument("--dry-run", action="store_true", help="Render the reports to files; log, checkpoint and send nothing")
+    parser.add_argument("--offline", action="store_true", help="Use only cached universe, prices and sectors (implies --dry-run)")
+    parser.add_argument("--out", metavar="DIR", help="Where --dry-run writes the reports (default: dry_run/ next to run_notifier.py)")
+
+def main(args):
+    RUN.reset()
+    try:
+        with stage("total"), profiled(args.profile):
+            run(
+                processes=args.processes, shard_size=args.shard_size, fresh=args.fresh,
+                dry_run=args.dry_run, offline=args.offline, out_dir=args.out,
+            )
+    finally:
+        if args.report or not (args.dry_run or args.offline):
+            report_path = args.report or REPORT_DIR / f"run_{datetime.now():%Y-%m-%d_%H%M%S}.json"
+            print(f"Run report: {write_report(report_path)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the daily stock alert scan and email the summary.")
+    add_run_arguments(parser)
+    main(parser.parse_args())
@@ -1,33 +1,159 @@
-import yfinance as yf
+import json
+import threading
 import time
+from pathlib import Path
 
-def add_sector_column(alert_df):
+import instrument
+from executor import run_concurrent, yahoo_limiter
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parent / "sector_cache.json"
+DEFAULT_TTL_DAYS = 30
+# yfinance sometimes returns a thin `info` without a sector; such "Unknown" entries are
+# retried after a day instead of hiding the symbol's sector for a whole TTL
+UNKNOWN_TTL_DAYS = 1
+
+# Lookups per daily run for universe symbols that have never been looked up
+DEFAULT_BACKFILL = 200
+
+
+class SectorCache:
     """
-    Adds a 'sector' column to the alert DataFrame using yfinance metadata.
+    Persistent symbol -> {sector, industry} map stored as a single JSON file.
 
-    Parameters:
-        alert_df (pd.DataFrame): DataFrame with a 'symbol' column.
+    Entries older than `ttl_days` (`unknown_ttl_days` for an "Unknown" sector) are
+    treated as misses and looked up again. Safe to share between threads.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_days=DEFAULT_TTL_DAYS, unknown_ttl_days=UNKNOWN_TTL_DAYS):
+        self.path = Path(path)
+        self.ttl = ttl_days * 86400
+        self.unknown_ttl = unknown_ttl_days * 86400
+        self.lock = threading.Lock()
+        try:
+            self.entries = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get_many(self, symbols):
+        """
+        Splits `symbols` into ({symbol: entry} for fresh hits, [misses]).
+        """
+        now = time.time()
+        hits, misses = {}, []
+        with self.lock:
+            entries = dict(self.entries)
+        for symbol in symbols:
+            entry = entries.get(symbol)
+            if entry is not None and now - entry["fetched_at"] <= self._ttl(entry):
+                hits[symbol] = entry
+            else:
+                misses.append(symbol)
+        return hits, misses
+
+    def _ttl(self, entry):
+        return self.unknown_ttl if entry["sector"] == "Unknown" else self.ttl
+
+    def sector_map(self, symbols):
+        """
+        Returns symbol -> sector for every cached symbol, expired or not. For statistics
+        over the whole universe, where looking up every uncached symbol would cost far
+        more than an occasionally outdated sector.
+        """
+        with self.lock:
+            return {s: self.entries[s]["sector"] for s in symbols if s in self.entries}
+
+    def update(self, found):
+        now = time.time()
+        with self.lock:
+            for symbol, entry in found.items():
+                self.entries[symbol] = dict(entry, fetched_at=now)
+
+    def save(self):
+        with self.lock:
+            tmp_path = self.path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(self.entries, indent=0, sort_keys=True))
+            tmp_path.replace(self.path)
+
+
+def _lookup_sector(symbol):
+    import yfinance as yf
+
+    info = yf.Ticker(symbol).info
+    return {"sector": info.get("sector") or "Unknown", "industry": info.get("industry") or "Unknown"}
+
+def offline_lookup(symbol):
+    # Stand-in for `_lookup_sector` in offline mode: cache misses stay "Unknown"
+    raise LookupError(f"{symbol}: not in the sector cache (offline)")
+
+def lookup_sectors(symbols, cache=None, workers=8, fetch_sector=_lookup_sector):
+    """
+    Resolves sector/industry metadata for `symbols`, serving fresh entries from `cache`.
+
+    Misses are fetched concurrently on `workers` threads, sharing the Yahoo rate limiter
+    with the price fetch, and written back to the cache. Symbols whose lookup failed are
+    left out of the result (and the cache) so they are retried on the next run.
+    `fetch_sector(symbol)` performs a single lookup and can be swapped for a stand-in.
 
     Returns:
-        pd.DataFrame: A copy of the original DataFrame with an additional 'sector' column.
-                      If sector data is unavailable, fills with 'Unknown'.
+        dict: symbol -> {"sector": str, "industry": str}
     """
-    sectors = []
+    cache = cache or SectorCache()
+    symbols = list(dict.fromkeys(symbols))
+    found, misses = cache.get_many(symbols)
+    instrument.incr("sector_cache.hits", len(found))
+    instrument.incr("sector_cache.misses", len(misses))
+    if misses:
+        # The shared Yahoo rate limit only applies to the real yfinance lookup
+        limiter = yahoo_limiter() if fetch_sector is _lookup_sector else None
+        fetched, errors = run_concurrent(fetch_sector, misses, workers=workers, limiter=limiter, name="sectors")
+        for symbol, error in errors.items():
+            instrument.event("sector_lookup_failed", symbol=symbol, error=repr(error))
+        instrument.incr("sectors.errors", len(errors))
+        if fetched:
+            cache.update(fetched)
+            cache.save()
+        found.update(fetched)
+    return found
 
-    for _, row in alert_df.iterrows():
-        symbol = row["symbol"]
+def backfill_sectors(symbols, limit=DEFAULT_BACKFILL, cache=None, workers=8, fetch_sector=_lookup_sector):
+    """
+    Looks up the sectors of up to `limit` symbols that are not in the cache at all, so
+    the cross-section's sector statistics (`analytics.cross_section`) reach the whole
+    universe over a few runs. Run after the report is out (or via `cli.py sectors`),
+    not during the scan. `limit=None` looks up every uncached symbol.
 
-        try:
-            info = yf.Ticker(symbol).info
-            sectors.append(info.get("sector", "Unknown"))
-            time.sleep(0.25)
+    Returns:
+        int: Number of symbols found.
+    """
+    cache = cache or SectorCache()
+    known = cache.sector_map(symbols)
+    missing = [s for s in dict.fromkeys(symbols) if s not in known][:limit]
+    if not missing:
+        return 0
+    found = lookup_sectors(missing, cache=cache, workers=workers, fetch_sector=fetch_sector)
+    instrument.incr("sectors.backfilled", len(found))
+    return len(found)
 
-        except:
-            sectors.append("Unknown")
-    if len(sectors) != len(alert_df):
-        raise ValueError(f"Sector list length ({len(sectors)}) doesn't match alerts length ({len(alert_df)})")
+def add_sector_column(alert_df, workers=8, cache=None, fetch_sector=_lookup_sector):
+    """
+    Adds 'sector' and 'industry' columns to the alert DataFrame using yfinance metadata.
+
+    Metadata comes from the on-disk SectorCache first; only missing or expired symbols
+    are looked up, so with a warm cache no network calls are made.
+
+    Parameters:
+        alert_df (pd.DataFrame): DataFrame with a 'symbol' column.
+        workers (int): Number of concurrent lookups for cache misses (default: 8).
+        cache (SectorCache or None): Cache to use (default: sector_cache.json, 30-day TTL).
+        fetch_sector (callable): Single-symbol lookup used for cache misses (default: yfinance).
+
+    Returns:
+        pd.DataFrame: A copy of the original DataFrame with additional 'sector' and 'industry' columns.
+                      If sector data is unavailable, fills with 'Unknown'.
+    """
+    found = lookup_sectors(alert_df["symbol"], cache=cache, workers=workers, fetch_sector=fetch_sector)
 
     alert_df = alert_df.copy()
-    alert_df["sector"] = sectors
+    alert_df["sector"] = alert_df["symbol"].map({s: e["sector"] for s, e in found.items()}).fillna("Unknown")
+    alert_df["industry"] = alert_df["symbol"].map({s: e["industry"] for s, e in found.items()}).fillna("Unknown")
     return alert_df
-    
\ No newline at end of file
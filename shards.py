@@ -0,0 +1,143 @@
+# shards.py
+# Multi-process scanning for universes too large for one process (the full US listing
+# and beyond). The ticker list is split into fixed-size shards; each worker process
+# fetches and evaluates one shard at a time and only sends back its alert rows.
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+import instrument
+from alerts import select_alert_rows
+from executor import YAHOO_BURST, YAHOO_RATE, get_limiter
+from market import split_context
+from metrics import METRIC_COLUMNS
+
+DEFAULT_SHARD_SIZE = 500
+
+# Worker processes are replaced after this many shards so memory fragmentation from
+# large pandas/numpy allocations cannot build up over a long scan
+TASKS_PER_CHILD = 4
+
+
+def default_provider():
+    from cache import CachedProvider
+    from providers import YahooProvider
+    return CachedProvider(YahooProvider())
+
+
+def split_shards(tickers, shard_size=DEFAULT_SHARD_SIZE):
+    tickers = list(dict.fromkeys(tickers))
+    return [tuple(tickers[i:i + shard_size]) for i in range(0, len(tickers), shard_size)]
+
+
+def _init_worker(processes):
+    # Each process gets an equal share of the Yahoo rate limit, so the whole pool stays under it
+    get_limiter("yahoo", YAHOO_RATE / processes, max(1, YAHOO_BURST // processes))
+
+
+def scan_shard(shard, period="1y", provider_factory=default_provider, context=(), extra=(), overrides=None):
+    """
+    Fetches and evaluates one shard. Runs inside a worker process. `overrides` is passed
+    to `alerts.select_alert_rows`.
+
+    Returns:
+        tuple: (alert rows, number of universe tickers with metrics, worker counters,
+                market data as from `market.split_context`)
+    """
+    from fetch import get_price_data
+
+    instrument.RUN.reset()
+    info = get_price_data(list(shard), period=period, provider=provider_factory())
+    info, market = split_context(info, context, extra)
+    return select_alert_rows(info, overrides=overrides), len(info), instrument.RUN.report()["counters"], market
+
+
+def run_sharded(tickers, shard_size=DEFAULT_SHARD_SIZE, processes=None, period="1y",
+                provider_factory=default_provider, retries=2, tasks_per_child=TASKS_PER_CHILD,
+                context=(), extra=(), on_shard=None, overrides=None):
+    """
+    Scans `tickers` across a process pool and merges the per-shard alert rows.
+
+    Each worker holds at most one shard's price panel at a time and is recycled after
+    `tasks_per_child` shards, so memory per process is bounded by `shard_size`. A shard
+    that raises, or whose worker dies (e.g. killed for running out of memory), is retried
+    on its own up to `retries` times; shards that still fail are reported and skipped.
+
+    Parameters:
+        tickers (list[str]): Symbols to scan.
+        shard_size (int): Tickers per shard (default: 500).
+        processes (int or None): Worker processes (default: all cores).
+        provider_factory (callable): Picklable zero-argument callable building the price
+                                     provider inside each worker (default: cached Yahoo).
+        context, extra: Market context symbols, and those of them that are not part of
+                        the universe (see `market.split_context`).
+        on_shard (callable or None): Called here as on_shard(shard, alert rows, rows,
+                                     market data) as each shard completes.
+        overrides (dict or None): Rule thresholds for selecting alert rows (see `scan_shard`).
+
+    Returns:
+        tuple: (alert rows in the `fetch.get_price_data` layout, number of tickers with
+                metrics, list of shards that failed)
+    """
+    shards = split_shards(tickers, shard_size)
+    processes = max(1, min(processes or os.cpu_count() or 1, len(shards) or 1))
+    attempts = {shard: 0 for shard in shards}
+    results, failed = {}, []
+    pending = list(shards)
+
+    while pending:
+        pool = ProcessPoolExecutor(
+            max_workers=processes, max_tasks_per_child=tasks_per_child,
+            initializer=_init_worker, initargs=(processes,),
+        )
+        futures = {}
+        broken = False
+        try:
+            for shard in pending:
+                attempts[shard] += 1
+                futures[pool.submit(scan_shard, shard, period, provider_factory, context, extra, overrides)] = shard
+            pending = []
+            outstanding = set(futures)
+            while outstanding:
+                done, outstanding = wait(outstanding, return_when=FIRST_COMPLETED)
+                for future in done:
+                    shard = futures[future]
+                    try:
+                        alerts, rows, counters, market = future.result()
+                    except Exception as e:
+                        broken = broken or isinstance(e, BrokenProcessPool)
+                        instrument.incr("shards.errors")
+                        instrument.event("shard_failed", first=shard[0], size=len(shard), error=repr(e))
+                        if attempts[shard] <= retries:
+                            instrument.incr("shards.retries")
+                            pending.append(shard)
+                        else:
+                            print(f"Shard starting at {shard[0]} failed after {attempts[shard]} attempts: {e}")
+                            failed.append(shard)
+                        continue
+                    results[shard] = alerts, rows
+                    if on_shard is not None:
+                        on_shard(shard, alerts, rows, market)
+                    for name, value in counters.items():
+                        if not name.endswith(".hit_ratio"):
+                            instrument.incr(name, value)
+                if broken:
+                    # A dead worker takes the whole pool down; resubmit what was still queued
+                    for future in outstanding:
+                        shard = futures[future]
+                        attempts[shard] -= 1
+                        pending.append(shard)
+                    break
+        finally:
+            pool.shutdown(wait=not broken, cancel_futures=True)
+
+    instrument.incr("shards.completed", len(results))
+    parts = [results[shard][0] for shard in shards if shard in results and not results[shard][0].empty]
+    rows = sum(results[shard][1] for shard in results)
+    if parts:
+        alerts = pd.concat(parts, ignore_index=True)
+    else:
+        alerts = pd.DataFrame(columns=METRIC_COLUMNS)
+    return alerts, rows, failed
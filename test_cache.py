@@ -0,0 +1,95 @@
+# test_cache.py
+# Tests for the incremental OHLC cache in front of a price provider. Run with `python -m pytest -q`.
+import pandas as pd
+import pytest
+
+import fakes
+from cache import CachedProvider, OHLCCache
+from providers import PriceProvider, trim_to_period
+
+TICKERS = ["AAA", "BBB", "CCC"]
+
+
+class CountingProvider(PriceProvider):
+    """
+    Serves slices of one fixed panel up to `end` and records every request as
+    (tickers, start), start being None for a full-period download.
+    """
+
+    chunk_size = 100
+
+    def __init__(self, panel):
+        self.panel = panel
+        self.end = panel.index[-2]
+        self.calls = []
+
+    def fetch_chunk(self, tickers, period="1y", interval="1d", start=None):
+        self.calls.append((sorted(tickers), start))
+        panel = self.panel[self.panel.index <= self.end]
+        panel = panel[panel.index >= pd.Timestamp(start)] if start is not None else trim_to_period(panel, period)
+        return panel.loc[:, panel.columns.get_level_values(1).isin(tickers)]
+
+
+@pytest.fixture
+def upstream():
+    end = pd.Timestamp.today().normalize() - pd.offsets.BDay(1)
+    return CountingProvider(fakes.synthetic_ohlc(TICKERS, end=end, days=600, seed=5))
+
+
+@pytest.mark.parametrize("period", ["1y", "ytd", "max"])
+def test_second_run_only_refreshes_the_new_bars(tmp_path, upstream, period):
+    provider = CachedProvider(upstream, cache=OHLCCache(tmp_path, max_history=period))
+    first, failures = provider.download(TICKERS, period=period)
+    assert failures == {}
+    assert upstream.calls == [(TICKERS, None)]
+
+    upstream.calls.clear()
+    upstream.end = upstream.panel.index[-1]
+    panel, failures = provider.download(TICKERS, period=period)
+
+    assert failures == {}
+    assert upstream.calls == [(TICKERS, first.index[-2])]
+    expected = trim_to_period(upstream.panel, period)
+    pd.testing.assert_frame_equal(panel.sort_index(axis=1), expected.sort_index(axis=1), check_names=False, check_freq=False)
+
+
+def test_moved_settled_bar_invalidates_and_redownloads(tmp_path, upstream):
+    provider = CachedProvider(upstream, cache=OHLCCache(tmp_path))
+    first, _ = provider.download(TICKERS, period="1y")
+
+    # A split: AAA's whole history is adjusted, so its settled bar no longer matches the cache
+    upstream.calls.clear()
+    upstream.panel = upstream.panel.copy()
+    upstream.panel.loc[:, upstream.panel.columns.get_level_values(1) == "AAA"] /= 2
+    panel, failures = provider.download(TICKERS, period="1y")
+
+    assert failures == {}
+    assert upstream.calls == [(TICKERS, first.index[-2]), (["AAA"], None)]
+    assert panel[("Close", "AAA")].iloc[-1] == pytest.approx(first[("Close", "AAA")].iloc[-1] / 2)
+
+
+def test_symbol_lagging_the_latest_session_is_reported_stale(tmp_path, upstream):
+    provider = CachedProvider(upstream, cache=OHLCCache(tmp_path))
+    provider.download(TICKERS, period="1y")
+
+    # CCC is halted: the new session has no bar for it
+    upstream.end = upstream.panel.index[-1]
+    upstream.panel = upstream.panel.copy()
+    upstream.panel.loc[upstream.end, upstream.panel.columns.get_level_values(1) == "CCC"] = float("nan")
+    panel, failures = provider.download(TICKERS, period="1y")
+
+    assert list(failures) == ["CCC"]
+    assert failures["CCC"].startswith("stale")
+    assert set(panel.columns.get_level_values(1)) == {"AAA", "BBB"}
+
+
+def test_failed_refresh_is_reported_instead_of_serving_the_cache(tmp_path, upstream):
+    provider = CachedProvider(upstream, cache=OHLCCache(tmp_path))
+    provider.download(TICKERS, period="1y")
+
+    upstream.end = upstream.panel.index[0] - pd.Timedelta(days=1)   # the upstream returns nothing
+    panel, failures = provider.download(TICKERS, period="1y")
+
+    assert panel.empty
+    assert sorted(failures) == TICKERS
+    assert all(reason.startswith("refresh failed") for reason in failures.values())
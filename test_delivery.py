@@ -0,0 +1,82 @@
+# test_delivery.py
+# Tests for per-subscriber rendering and pooled SMTP delivery, against fakes.FakeSMTP.
+# Run with `python -m pytest -q`.
+import pandas as pd
+import pytest
+
+import fakes
+from alerts import classify_alerts, select_alert_rows
+from delivery import alert_thresholds, deliver, render_for_subscribers
+from history import AlertHistory
+from metrics import metrics_from_panel
+
+
+@pytest.fixture
+def smtp():
+    fakes.FakeSMTP.reset()
+    yield fakes.FakeSMTP
+    fakes.FakeSMTP.reset()
+
+
+def test_transient_failure_is_retried_and_recipients_marked_sent_once(smtp):
+    smtp.fail_times = 1
+    sent = []
+    statuses = deliver(
+        {"a@example.com": "<p>a</p>", "b@example.com": "<p>b</p>"}, subject="Alerts",
+        sender="bot@example.com", password="secret", workers=1, base_delay=0, smtp_factory=smtp,
+        on_sent=sent.append,
+    )
+
+    assert list(statuses["status"]) == ["sent", "sent"]
+    assert sorted(statuses["attempts"]) == [1, 2]
+    assert sorted(sent) == ["a@example.com", "b@example.com"]
+    assert sorted(to for _, to, _ in smtp.sent) == ["a@example.com", "b@example.com"]
+    # The disconnected session is dropped and replaced, not reused
+    assert smtp.connections == 2
+
+
+def test_permanent_failure_is_reported_and_not_marked_sent(smtp):
+    smtp.fail_times = 10
+    sent = []
+    statuses = deliver(
+        {"a@example.com": "<p>a</p>"}, subject="Alerts", sender="bot@example.com", password="secret",
+        workers=1, retries=2, base_delay=0, smtp_factory=smtp, on_sent=sent.append,
+    )
+
+    assert statuses.loc[0, "status"] == "failed"
+    assert statuses.loc[0, "attempts"] == 3
+    assert sent == []
+
+
+def test_subscriber_with_looser_thresholds_gets_the_extra_alerts():
+    panel = fakes.synthetic_ohlc(fakes.synthetic_symbols(300), end=pd.Timestamp("2025-06-30"), seed=1)
+    metrics, _ = metrics_from_panel(panel)
+    metrics["sector"] = "Technology"
+    subscribers = [
+        {"email": "default@example.com"},
+        {"email": "loose@example.com", "drop_threshold": -3, "streak_min": 3},
+    ]
+    alerts = select_alert_rows(metrics, overrides=alert_thresholds(subscribers))
+
+    # Symbols only the looser thresholds report: a 3-5% drop and nothing else
+    default_symbols = set(classify_alerts(alerts)["symbol"])
+    extra = metrics[
+        metrics["pct_drop_from_prev_close"].between(-4.9, -3.1) & ~metrics["symbol"].isin(default_symbols)
+    ]["symbol"]
+    assert len(extra) > 0
+
+    bodies = render_for_subscribers(alerts, subscribers, history=AlertHistory(":memory:"))
+
+    assert all(symbol in bodies["loose@example.com"] for symbol in extra)
+    assert not any(symbol in bodies["default@example.com"] for symbol in extra)
+    assert "Drop ≥3% from Prev Close" in bodies["loose@example.com"]
+    assert "3+ Day Down Streak" in bodies["loose@example.com"]
+
+
+def test_rendering_without_a_history_creates_no_database(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    metrics, _ = metrics_from_panel(fakes.synthetic_ohlc(fakes.synthetic_symbols(50), seed=2, selloff=0.2))
+    body = render_for_subscribers(metrics.assign(sector="Energy"), [{"email": "a@example.com"}])["a@example.com"]
+
+    assert "Stock Alert Summary" in body
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,140 @@
+# test_journal.py
+# Crash-and-resume tests for the daily run: whichever stage a run dies in, the rerun
+# finishes the day with the same alerts and never logs or emails anything twice.
+# Run with `python -m pytest -q`.
+import functools
+import sys
+import types
+
+import pandas as pd
+import pytest
+
+import delivery
+import fakes
+import pipeline
+import run_notifier
+import sectors
+import universe
+from history import AlertHistory
+
+TICKERS = fakes.synthetic_symbols(120)
+SUBSCRIBERS = [{"email": f"user{i}@example.com"} for i in range(4)]
+
+
+class Crash(BaseException):
+    """
+    Stands in for the process dying; not an Exception, so no retry or fallback catches it.
+    """
+
+
+class CrashingProvider(fakes.SyntheticProvider):
+    def __init__(self, crash_on=None, **kwargs):
+        super().__init__(chunk_size=20, selloff=0.3, **kwargs)
+        self.crash_on = crash_on
+        self.downloads = 0
+
+    def download(self, tickers, **kwargs):
+        self.downloads += 1
+        if self.downloads == self.crash_on:
+            raise Crash("scan")
+        return super().download(tickers, **kwargs)
+
+
+class CrashingSMTP(fakes.FakeSMTP):
+    crash_after = None
+
+    def send_message(self, msg, from_addr=None, to_addrs=None):
+        if len(fakes.FakeSMTP.sent) == CrashingSMTP.crash_after:
+            raise Crash("sending")
+        return super().send_message(msg, from_addr, to_addrs)
+
+
+@pytest.fixture
+def daily_run(tmp_path, monkeypatch):
+    """
+    Returns run(provider, log_dir) performing the daily run against fakes.
+    """
+    config = types.SimpleNamespace(EMAIL_ADDRESS="bot@example.com", EMAIL_PASSWORD="secret", TO_ADDRESS="me@example.com")
+    monkeypatch.setitem(sys.modules, "config", config)
+    monkeypatch.setattr(universe, "load_universe", lambda: list(TICKERS))
+    monkeypatch.setattr(delivery, "load_subscribers", lambda default_recipient=None: SUBSCRIBERS)
+    monkeypatch.setattr(delivery, "deliver", functools.partial(
+        delivery.deliver, workers=1, base_delay=0, smtp_factory=CrashingSMTP,
+    ))
+
+    sector_cache = sectors.SectorCache(tmp_path / "sector_cache.json")
+    lookup = fakes.fake_sector_lookup()
+    monkeypatch.setattr(sectors, "backfill_sectors", functools.partial(
+        sectors.backfill_sectors, cache=sector_cache, fetch_sector=lookup,
+    ))
+    fakes.FakeSMTP.reset()
+    CrashingSMTP.crash_after = None
+
+    def run(provider, log_dir):
+        with monkeypatch.context() as m:
+            m.setattr(run_notifier, "LOG_DIR", log_dir)
+            m.setattr(run_notifier, "JOURNAL_DIR", log_dir / "journal")
+            m.setattr(pipeline, "run_scan", functools.partial(
+                pipeline.run_scan, provider=provider, sector_cache=sector_cache, fetch_sector=lookup,
+            ))
+            run_notifier.run()
+
+    yield run
+    fakes.FakeSMTP.reset()
+
+
+def logged_alerts(log_dir):
+    history = AlertHistory.in_dir(log_dir)
+    try:
+        return history.query().sort_values(["symbol", "alert_type"]).reset_index(drop=True)
+    finally:
+        history.close()
+
+
+def emailed():
+    return sorted(to for _, to, _ in fakes.FakeSMTP.sent)
+
+
+EVERYONE = sorted(s["email"] for s in SUBSCRIBERS)
+
+
+def test_crash_mid_scan_resumes_to_the_same_result(daily_run, tmp_path):
+    daily_run(CrashingProvider(), tmp_path / "clean")
+    expected = logged_alerts(tmp_path / "clean")
+    assert not expected.empty
+    fakes.FakeSMTP.reset()
+
+    with pytest.raises(Crash):
+        daily_run(CrashingProvider(crash_on=3), tmp_path / "crashed")
+    assert emailed() == []
+
+    resumed = CrashingProvider()
+    daily_run(resumed, tmp_path / "crashed")
+
+    # Only the batches the crashed attempt did not checkpoint are fetched again
+    assert 0 < resumed.downloads < len(TICKERS) // 20
+    assert emailed() == EVERYONE
+    pd.testing.assert_frame_equal(logged_alerts(tmp_path / "crashed"), expected)
+
+
+def test_crash_mid_send_logs_and_emails_nobody_twice(daily_run, tmp_path):
+    log_dir = tmp_path / "logs"
+    CrashingSMTP.crash_after = 2
+    with pytest.raises(Crash):
+        daily_run(CrashingProvider(), log_dir)
+    assert len(emailed()) == 2
+    logged = logged_alerts(log_dir)
+    assert not logged.empty
+
+    CrashingSMTP.crash_after = None
+    rerun = CrashingProvider()
+    daily_run(rerun, log_dir)
+
+    assert rerun.downloads == 0   # the scan is reused from the journal
+    assert emailed() == EVERYONE
+    pd.testing.assert_frame_equal(logged_alerts(log_dir), logged)
+
+    # Another run the same day sends and logs nothing
+    daily_run(CrashingProvider(), log_dir)
+    assert emailed() == EVERYONE
+    pd.testing.assert_frame_equal(logged_alerts(log_dir), logged)
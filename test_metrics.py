@@ -0,0 +1,123 @@
+# test_metrics.py
+# Regression tests for the vectorized alert metrics: they must keep matching the original
+# per-ticker `hist.dropna()` loop, whether computed on float64 arrays or on the float32
+# PricePanel, and the backtest's rolling metrics must agree with them on the last date.
+# Run with `python -m pytest -q`.
+import numpy as np
+import pandas as pd
+import pytest
+
+import fakes
+from backtest import rolling_alert_metrics
+from metrics import compute_alert_metrics, metrics_from_panel
+from providers import FIELDS
+
+EPS = 1e-9
+
+COMPARED = [
+    "latest_price", "3m_high", "3m_low", "6m_high", "6m_low", "52w_high", "52w_low",
+    "pct_drop_from_prev_close", "pct_drop_from_open_to_close", "below_3m_low", "below_6m_low",
+    "below_52w_low", "below_5%_prev_close", "below_5%_open_to_close", "down_streak", "drop_from_52w_high",
+]
+
+
+def reference_metrics(frame):
+    """
+    The original per-ticker loop (one `hist.dropna()` per symbol), with down_streak as the
+    raw streak length.
+    """
+    rows = []
+    for ticker in frame.columns.get_level_values(1).unique():
+        hist = frame.xs(ticker, axis=1, level=1)[FIELDS].dropna().sort_index()
+        if len(hist) < 2:
+            continue
+        last_date = hist.index[-1]
+        latest_price = float(hist["Close"].iloc[-1])
+        prior = hist.iloc[:-1]
+        windows = {
+            name: prior[prior.index >= last_date - pd.Timedelta(days=days)]
+            for name, days in {"3m": 90, "6m": 180, "52w": 365}.items()
+        }
+        lows = {name: float(w["Low"].min()) if not w.empty else np.nan for name, w in windows.items()}
+        highs = {name: float(w["High"].max()) if not w.empty else np.nan for name, w in windows.items()}
+        high_52w = float(hist["High"].max())
+        pct_prev = (latest_price / float(hist["Close"].iloc[-2]) - 1) * 100
+        pct_open = (latest_price / float(hist["Open"].iloc[-1]) - 1) * 100
+
+        down = hist["Close"] < hist["Close"].shift(1)
+        streak = down.astype(int).groupby((~down).cumsum()).cumsum()
+        rows.append({
+            "symbol": ticker,
+            "latest_price": latest_price,
+            "3m_high": highs["3m"], "3m_low": lows["3m"],
+            "6m_high": highs["6m"], "6m_low": lows["6m"],
+            "52w_high": high_52w, "52w_low": lows["52w"],
+            "pct_drop_from_prev_close": pct_prev,
+            "pct_drop_from_open_to_close": pct_open,
+            "below_3m_low": not np.isnan(lows["3m"]) and latest_price <= lows["3m"] + EPS,
+            "below_6m_low": not np.isnan(lows["6m"]) and latest_price <= lows["6m"] + EPS,
+            "below_52w_low": not np.isnan(lows["52w"]) and latest_price <= lows["52w"] + EPS,
+            "below_5%_prev_close": pct_prev <= -5,
+            "below_5%_open_to_close": pct_open <= -5,
+            "down_streak": float(streak.iloc[-1] if down.iloc[-1] else 0),
+            "drop_from_52w_high": 100.0 * (latest_price - high_52w) / high_52w if high_52w > 0 else np.nan,
+        })
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture(scope="module")
+def frame():
+    """
+    250 business days (under a calendar year) for 40 tickers, with random holes, two late
+    listings, one ticker that stopped trading, one with a single bar and a selloff.
+    """
+    tickers = fakes.synthetic_symbols(40)
+    frame = fakes.synthetic_ohlc(tickers, end=pd.Timestamp("2025-06-30"), days=250, seed=7, selloff=0.2)
+    rng = np.random.default_rng(7)
+    frame = frame.mask(rng.random(frame.shape) < 0.03)
+    for field in FIELDS:
+        frame.loc[frame.index[:180], (field, tickers[0])] = np.nan   # listed ~3 months ago
+        frame.loc[frame.index[:245], (field, tickers[1])] = np.nan   # listed last week
+        frame.loc[frame.index[-10:], (field, tickers[2])] = np.nan   # stopped trading
+        frame.loc[frame.index[:-1], (field, tickers[3])] = np.nan    # a single bar
+    return frame
+
+
+def _check(actual, expected, rtol):
+    actual = actual.set_index("symbol")[COMPARED]
+    expected = expected.set_index("symbol")[COMPARED]
+    assert list(actual.index) == list(expected.index)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, rtol=rtol, atol=1e-6)
+
+
+def test_float64_arrays_match_per_ticker_loop(frame):
+    tickers = list(frame["Close"].columns)
+    metrics, skipped = compute_alert_metrics(
+        frame.index, tickers, *(frame[f].to_numpy(dtype=float) for f in FIELDS)
+    )
+    assert skipped == [tickers[3]]
+    _check(metrics, reference_metrics(frame), rtol=1e-9)
+
+
+def test_float32_panel_matches_per_ticker_loop(frame):
+    # Prices are stored as float32, so levels agree to float32 precision
+    metrics, skipped = metrics_from_panel(frame)
+    assert len(skipped) == 1
+    _check(metrics, reference_metrics(frame.astype(np.float32).astype(float)), rtol=1e-5)
+
+
+def test_backtest_last_date_matches_daily_metrics(frame):
+    rolling = rolling_alert_metrics(frame)
+    daily, _ = compute_alert_metrics(frame.index, list(frame["Close"].columns),
+                                     *(frame[f].to_numpy(dtype=float) for f in FIELDS))
+    daily = daily.set_index("symbol")
+    on_last_date = rolling["valid"].iloc[-1]
+    symbols = [s for s in daily.index if on_last_date[s]]
+    assert len(symbols) > 30
+
+    for column in ["3m_low", "6m_low", "52w_low", "pct_drop_from_prev_close", "pct_drop_from_open_to_close",
+                   "drop_from_52w_high", "down_streak", "below_3m_low", "below_6m_low", "below_52w_low"]:
+        np.testing.assert_allclose(
+            rolling[column].iloc[-1][symbols].to_numpy(dtype=float), daily.loc[symbols, column].to_numpy(dtype=float),
+            rtol=1e-9, err_msg=column,
+        )
@@ -0,0 +1,65 @@
+# test_rules.py
+# Tests for the alert rule DSL and the rules.json overrides. Run with `python -m pytest -q`.
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rules import Rule, RuleSet, compile_expression, load_rules
+
+METRICS = pd.DataFrame({
+    "symbol": ["AAA", "BBB", "CCC"],
+    "latest_price": [9.0, 20.0, 30.0],
+    "3m_low": [10.0, 15.0, np.nan],
+    "down_streak": [0.0, 4.0, 7.0],
+    "pct_drop_from_prev_close": [-6.0, -1.0, -3.0],
+})
+
+
+def test_expression_with_keywords_chains_and_quoted_columns():
+    rule = Rule("test", "not down_streak and -5 < pct_drop_from_prev_close <= threshold or latest_price < `3m_low`",
+                threshold=-0.5)
+    masks = RuleSet([rule]).evaluate(METRICS)
+    assert masks["test"].tolist() == [True, False, False]
+    assert sorted(rule.columns) == ["3m_low", "down_streak", "latest_price", "pct_drop_from_prev_close"]
+
+
+def test_not_applies_to_float_columns():
+    masks = RuleSet([Rule("flat", "not down_streak")]).evaluate(METRICS)
+    assert masks["flat"].tolist() == [True, False, False]
+
+
+@pytest.mark.parametrize("expr", [
+    "latest_price.__class__", "abs(pct_drop_from_prev_close) > 5", "latest_price if down_streak else 0",
+    "[latest_price][0] > 1", "latest_price ** 2 > 1",
+])
+def test_disallowed_syntax_is_rejected(expr):
+    with pytest.raises(ValueError, match="Unsupported syntax"):
+        compile_expression(expr)
+
+
+def test_rules_file_overrides_and_adds_rules(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps([
+        {"name": "pct_drop_5plus", "threshold": -2},
+        {"name": "below_200d_sma", "enabled": True},
+        {"name": "long_streak_off_low", "expr": "down_streak >= threshold and not latest_price < `3m_low`",
+         "threshold": 6, "label": "{threshold}+ day streak above the 3M low"},
+    ]))
+    rules = load_rules(path)
+
+    assert rules.names[-2:] == ["below_200d_sma", "long_streak_off_low"]
+    assert rules.labels()["long_streak_off_low"] == "6+ day streak above the 3M low"
+    masks = rules.evaluate(METRICS)
+    assert masks["pct_drop_5plus"].tolist() == [True, False, True]
+    assert masks["long_streak_off_low"].tolist() == [False, False, True]
+    # No sma_200 column: the rule evaluates as NaN and never fires
+    assert not masks["below_200d_sma"].any()
+
+
+def test_rules_file_entry_without_expr_is_rejected(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps([{"name": "mystery", "threshold": 1}]))
+    with pytest.raises(ValueError, match="needs a name and an expr"):
+        load_rules(path)
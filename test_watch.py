@@ -0,0 +1,62 @@
+# test_watch.py
+# Tests for the intraday watch mode. Run with `python -m pytest -q`.
+import numpy as np
+import pandas as pd
+
+import fakes
+from alerts import classify_alerts
+from metrics import metrics_from_panel
+from providers import FIELDS, PriceProvider
+from watch import Watcher, poll_ticks, replay_ticks
+
+
+class MinuteProvider(PriceProvider):
+    """
+    Serves one fixed raw frame of one-minute bars, in the layout `yf.download` returns.
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def fetch_chunk(self, tickers, period="1y", interval="1d", start=None):
+        return self.raw
+
+
+def test_poll_ticks_keeps_symbols_without_a_print_in_the_last_minute():
+    minutes = pd.date_range("2025-06-30 09:30", periods=4, freq="min", tz="America/New_York")
+    columns = pd.MultiIndex.from_product([FIELDS, ["AAA", "BBB"]])
+    raw = pd.DataFrame(np.nan, index=minutes, columns=columns)
+    for field in FIELDS:
+        raw[(field, "AAA")] = [10.0, 10.1, 10.2, 10.3]
+        raw[(field, "BBB")] = [50.0, 49.0, np.nan, np.nan]   # no trade in the last two minutes
+
+    ticks = list(poll_ticks(["AAA", "BBB"], MinuteProvider(raw), interval_seconds=0, polls=1))
+
+    assert {symbol: price for _, symbol, price in ticks} == {"AAA": 10.3, "BBB": 49.0}
+
+
+def test_replayed_ticks_fire_the_daily_alerts(tmp_path):
+    # The last session falls from its open to its close, so every alert condition that
+    # holds at the close first became true on the way down and stays true until then
+    daily = fakes.synthetic_ohlc(fakes.synthetic_symbols(40), end=pd.Timestamp("2025-06-30"), days=200, seed=3, selloff=0.3)
+    last = daily.index[-1]
+    top = np.maximum(daily.loc[last, "Open"], daily.loc[last, "Close"])
+    bottom = np.minimum(daily.loc[last, "Open"], daily.loc[last, "Close"])
+    daily.loc[last, "Open"] = daily.loc[last, "High"] = top.to_numpy()
+    daily.loc[last, "Close"] = daily.loc[last, "Low"] = bottom.to_numpy()
+
+    path = tmp_path / "ticks.csv"
+    minutes = pd.date_range(last + pd.Timedelta(hours=9, minutes=30), periods=3, freq="min")
+    pd.DataFrame([
+        {"timestamp": minute, "symbol": symbol, "price": price}
+        for minute, prices in zip(minutes, [top, (top + bottom) / 2, bottom])
+        for symbol, price in prices.items()
+    ]).to_csv(path, index=False)
+
+    fired = Watcher(daily[daily.index < last]).run(replay_ticks(path))
+
+    metrics, _ = metrics_from_panel(daily)
+    expected = classify_alerts(metrics)
+    assert not expected.empty
+    assert set(zip(fired["symbol"], fired["alert_type"])) == set(zip(expected["symbol"], expected["alert_type"]))
+    assert not fired.duplicated(["symbol", "alert_type"]).any()
@@ -0,0 +1,86 @@
+# universe.py
+import json
+import time
+from pathlib import Path
+
+import instrument
+
+DEFAULT_SNAPSHOT_PATH = Path(__file__).resolve().parent / "universe_snapshot.json"
+DEFAULT_REFRESH_DAYS = 7
+
+
+def normalize_symbols(symbols):
+    """
+    Cleans scraped symbols into Yahoo tickers (upper-case, '.' -> '-'), dropping blanks,
+    stray header cells and duplicates while keeping first-seen order.
+    """
+    cleaned = []
+    for s in symbols:
+        if not isinstance(s, str):
+            continue
+        s = s.strip().upper()
+        if s and s != "SYMBOL":
+            cleaned.append(s.replace(".", "-"))
+    return list(dict.fromkeys(cleaned))
+
+
+def read_snapshot(path=DEFAULT_SNAPSHOT_PATH):
+    """
+    Returns (symbols, fetched_at) from the snapshot file, or (None, None) if there is none.
+    """
+    try:
+        snapshot = json.loads(Path(path).read_text())
+        return snapshot["symbols"], snapshot["fetched_at"]
+    except (OSError, ValueError, KeyError):
+        return None, None
+
+
+def write_snapshot(symbols, path=DEFAULT_SNAPSHOT_PATH):
+    path = Path(path)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps({"fetched_at": time.time(), "symbols": list(symbols)}, indent=0))
+    tmp_path.replace(path)
+
+
+def load_universe(refresh_days=DEFAULT_REFRESH_DAYS, path=DEFAULT_SNAPSHOT_PATH, force=False, scrape=None):
+    """
+    Returns the list of tickers to scan, re-scraping at most once per `refresh_days`.
+
+    The cap lists change slowly, so a daily run normally reuses the de-duplicated snapshot
+    saved by the last scrape. If a due refresh fails, the stale snapshot is used instead.
+
+    Parameters:
+        refresh_days (float): Maximum snapshot age before re-scraping (default: 7).
+        path (str or Path): Snapshot location (default: universe_snapshot.json).
+        force (bool): Re-scrape even if the snapshot is fresh.
+        scrape (callable or None): Returns a DataFrame with a 'Symbol' column (default: Scraper.main).
+
+    Returns:
+        list[str]: Normalized, de-duplicated tickers.
+    """
+    symbols, fetched_at = read_snapshot(path)
+    if symbols and not force and time.time() - fetched_at <= refresh_days * 86400:
+        instrument.incr("universe_snapshot.hits")
+        return symbols
+    instrument.incr("universe_snapshot.misses")
+
+    if scrape is None:
+        from Scraper import main as scrape
+
+    try:
+        fresh = normalize_symbols(scrape()["Symbol"].tolist())
+    except Exception as e:
+        if symbols:
+            print(f"Universe refresh failed ({e}); using snapshot from {time.ctime(fetched_at)}")
+            instrument.event("universe_refresh_failed", error=str(e))
+            return symbols
+        raise
+
+    if not fresh:
+        if symbols:
+            print("Universe refresh returned no symbols; using previous snapshot")
+            return symbols
+        raise ValueError("Universe scrape returned no symbols")
+
+    write_snapshot(fresh, path)
+    return fresh
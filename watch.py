@@ -0,0 +1,260 @@
+# watch.py
+import time
+from collections import deque
+from datetime import datetime
+
+import pandas as pd
+
+from alerts import section_labels, threshold_overrides
+from metrics import WINDOWS
+from rules import default_ruleset
+
+
+class RollingExtreme:
+    """
+    Monotonic deque holding the running min (or max) of daily values over a calendar-day window.
+
+    `push` and `evict` are amortized O(1) and `value` is O(1).
+    """
+
+    def __init__(self, days, mode="min"):
+        self.window = pd.Timedelta(days=days)
+        self.is_min = mode == "min"
+        self.items = deque()  # (date, value), values monotonic from the front
+
+    def push(self, date, value):
+        if self.is_min:
+            while self.items and self.items[-1][1] >= value:
+                self.items.pop()
+        else:
+            while self.items and self.items[-1][1] <= value:
+                self.items.pop()
+        self.items.append((date, value))
+
+    def evict(self, session_date):
+        """
+        Drops values older than the window measured back from `session_date`.
+        """
+        cutoff = session_date - self.window
+        while self.items and self.items[0][0] < cutoff:
+            self.items.popleft()
+
+    def value(self):
+        return self.items[0][1] if self.items else None
+
+
+class SymbolState:
+    """
+    Incremental alert state for one symbol: prior-window lows/highs, previous close,
+    running down streak and the current session's open/high/low/last.
+    """
+
+    def __init__(self, hist, session_date):
+        self.lows = {name: RollingExtreme(days, "min") for name, days in WINDOWS.items()}
+        self.highs = {name: RollingExtreme(days, "max") for name, days in WINDOWS.items()}
+        self.high_52w = RollingExtreme(WINDOWS["52w"], "max")
+        self.prev_close = None
+        self.streak = 0
+
+        prior = hist[hist.index < session_date].dropna()
+        for date, bar in prior.iterrows():
+            self._push_bar(date, bar["High"], bar["Low"], bar["Close"])
+        self._start_session(session_date)
+
+    def _push_bar(self, date, high, low, close):
+        for name in WINDOWS:
+            self.lows[name].push(date, low)
+            self.highs[name].push(date, high)
+        self.high_52w.push(date, high)
+        self.streak = self.streak + 1 if self.prev_close is not None and close < self.prev_close else 0
+        self.prev_close = close
+
+    def _start_session(self, session_date):
+        self.session_date = session_date
+        for name in WINDOWS:
+            self.lows[name].evict(session_date)
+            self.highs[name].evict(session_date)
+        self.high_52w.evict(session_date)
+        self.open = self.high = self.low = self.last = None
+
+    def roll(self, session_date):
+        """
+        Closes the current session into the daily windows and starts a new one.
+        """
+        if self.last is not None:
+            self._push_bar(self.session_date, self.high, self.low, self.last)
+        self._start_session(session_date)
+
+    def update(self, price):
+        if self.open is None:
+            self.open = self.high = self.low = price
+        self.high = max(self.high, price)
+        self.low = min(self.low, price)
+        self.last = price
+
+    def snapshot(self):
+        """
+        Current metrics, named like the columns of `fetch.get_price_data`.
+        """
+        price = self.last
+        high_52w = max(self.high_52w.value() or self.high, self.high)
+        metrics = {"latest_price": price}
+        for name in WINDOWS:
+            metrics[f"{name}_low"] = self.lows[name].value()
+            metrics[f"{name}_high"] = self.highs[name].value()
+        metrics["52w_high"] = high_52w
+        metrics["pct_drop_from_prev_close"] = (price / self.prev_close - 1) * 100 if self.prev_close else None
+        metrics["pct_drop_from_open_to_close"] = (price / self.open - 1) * 100
+        metrics["down_streak"] = self.streak + 1 if self.prev_close is not None and price < self.prev_close else 0
+        metrics["drop_from_52w_high"] = 100.0 * (price - high_52w) / high_52w if high_52w > 0 else None
+        return metrics
+
+
+class Watcher:
+    """
+    Evaluates the daily alert definitions against a stream of intraday quotes.
+
+    Each tick is O(1) per symbol. An alert fires the first time a symbol breaches its
+    level during a session; repeats are suppressed until the next session starts.
+
+    Parameters:
+        history (pd.DataFrame): Wide daily OHLC panel (see `providers.PriceProvider.download`).
+        drop_threshold (float): Daily % change that triggers pct_drop_5plus (default: -5).
+        streak_min (int): Down-streak length that triggers down_streak_5plus (default: 5).
+        on_alert (callable or None): Called with each alert dict as it fires.
+        rules (RuleSet or None): Rules to evaluate (default: `rules.default_ruleset()`); rules
+                                 on metrics the snapshot does not track never fire.
+    """
+
+    def __init__(self, history, drop_threshold=-5, streak_min=5, on_alert=None, rules=None):
+        self.history = history
+        self.rules = rules or default_ruleset()
+        self.overrides = threshold_overrides(drop_threshold, streak_min)
+        self.on_alert = on_alert
+        self.labels = section_labels(streak_min, drop_threshold, rules=self.rules)
+        self.states = {}
+        self.fired = set()
+        self.session_date = None
+        self.available = set(history.columns.get_level_values(1)) if not history.empty else set()
+
+    def _state(self, symbol, session_date):
+        state = self.states.get(symbol)
+        if state is None:
+            if symbol not in self.available:
+                return None
+            state = SymbolState(self.history.xs(symbol, axis=1, level=1), session_date)
+            self.states[symbol] = state
+        elif state.session_date != session_date:
+            state.roll(session_date)
+        return state
+
+    def _triggered(self, m):
+        masks = self.rules.evaluate(m, self.overrides)
+        for rule in self.rules.rules:
+            if masks[rule.name][0]:
+                yield rule, m.get(rule.detail) if rule.detail else None
+
+    def on_tick(self, timestamp, symbol, price):
+        """
+        Processes one quote and returns the list of newly fired alerts.
+        """
+        timestamp = pd.Timestamp(timestamp)
+        session_date = timestamp.normalize()
+        if session_date != self.session_date:
+            self.session_date = session_date
+            self.fired.clear()
+
+        state = self._state(symbol, session_date)
+        if state is None:
+            return []
+        state.update(float(price))
+
+        fired = []
+        for rule, detail in self._triggered(state.snapshot()):
+            alert_type = rule.name
+            key = (symbol, alert_type)
+            if key in self.fired:
+                continue
+            self.fired.add(key)
+            alert = {
+                "timestamp": timestamp,
+                "symbol": symbol,
+                "alert_type": alert_type,
+                "label": self.labels[alert_type],
+                "severity": rule.severity,
+                "price": float(price),
+                "detail": detail,
+            }
+            fired.append(alert)
+            if self.on_alert:
+                self.on_alert(alert)
+        return fired
+
+    def run(self, ticks):
+        """
+        Consumes an iterable of (timestamp, symbol, price) and returns every alert as a DataFrame.
+        """
+        alerts = []
+        for timestamp, symbol, price in ticks:
+            alerts.extend(self.on_tick(timestamp, symbol, price))
+        return pd.DataFrame(alerts, columns=["timestamp", "symbol", "alert_type", "label", "severity", "price", "detail"])
+
+
+def replay_ticks(path):
+    """
+    Yields (timestamp, symbol, price) from a CSV tick file with those three columns, in time order.
+    """
+    ticks = pd.read_csv(path, parse_dates=["timestamp"]).sort_values("timestamp", kind="stable")
+    yield from ticks[["timestamp", "symbol", "price"]].itertuples(index=False, name=None)
+
+
+def poll_ticks(symbols, provider, interval_seconds=60, polls=None):
+    """
+    Yields live (timestamp, symbol, price) quotes every `interval_seconds`, taking the last
+    one-minute close of each symbol from one batched provider request per poll.
+    """
+    count = 0
+    while polls is None or count < polls:
+        started = time.monotonic()
+        panel, _ = provider.download(symbols, period="1d", interval="1m")
+        if not panel.empty:
+            now = datetime.now()
+            last = panel["Close"].ffill().iloc[-1].dropna()
+            for symbol, price in last.items():
+                yield now, symbol, price
+        count += 1
+        time.sleep(max(0.0, interval_seconds - (time.monotonic() - started)))
+
+
+def print_alert(alert):
+    print(f"[{alert['timestamp']:%H:%M:%S}] {alert['severity'].upper()} {alert['symbol']}: {alert['label']} @ {alert['price']:.2f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Intraday watch mode for the daily alert rules.")
+    parser.add_argument("--replay", help="CSV tick file (timestamp,symbol,price) to replay instead of polling")
+    parser.add_argument("--history-dir", help="Read daily history from per-ticker CSVs instead of Yahoo")
+    parser.add_argument("--interval", type=int, default=60, help="Seconds between live polls (default: 60)")
+    parser.add_argument("symbols", nargs="*", help="Symbols to watch (default: the cached universe)")
+    args = parser.parse_args()
+
+    from cache import CachedProvider
+    from providers import FileProvider, YahooProvider
+    from universe import load_universe
+
+    if args.replay:
+        ticks = pd.read_csv(args.replay)
+        symbols = args.symbols or list(dict.fromkeys(ticks["symbol"]))
+    else:
+        symbols = args.symbols or load_universe()
+
+    daily = FileProvider(args.history_dir) if args.history_dir else CachedProvider(YahooProvider())
+    history, _ = daily.download(symbols, period="1y")
+    watcher = Watcher(history, on_alert=print_alert)
+
+    if args.replay:
+        watcher.run(replay_ticks(args.replay))
+    else:
+        watcher.run(poll_ticks(symbols, YahooProvider(), interval_seconds=args.interval))